@@ -16,8 +16,19 @@ from .models import (
     ProcessDocumentResponse,
     SearchRequest,
     SearchResponse,
+    SearchMode,
     ChunkType,
-    ProcessingStatus
+    ProcessingStatus,
+    ProcessingStage,
+    ConversionProfile,
+    EmbeddingStatus,
+    ConversionReport,
+    JobStatus,
+    IngestionJob,
+    ProcessDocumentJobResponse,
+    BulkIngestRequest,
+    BulkIngestResponse,
+    BulkIngestReport
 )
 
 __version__ = "1.0.0"
@@ -29,6 +40,17 @@ __all__ = [
     "ProcessDocumentResponse",
     "SearchRequest",
     "SearchResponse",
+    "SearchMode",
     "ChunkType",
-    "ProcessingStatus"
+    "ProcessingStatus",
+    "ProcessingStage",
+    "ConversionProfile",
+    "EmbeddingStatus",
+    "ConversionReport",
+    "JobStatus",
+    "IngestionJob",
+    "ProcessDocumentJobResponse",
+    "BulkIngestRequest",
+    "BulkIngestResponse",
+    "BulkIngestReport"
 ]
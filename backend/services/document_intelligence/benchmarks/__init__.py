@@ -0,0 +1,9 @@
+"""
+Offline benchmarks for the ingestion and search pipeline
+
+Runs the real conversion, chunking, embedding and storage code against local
+stand-ins for Gemini and Supabase, so results are reproducible and can be
+compared between commits (from backend/services):
+
+    python -m document_intelligence.benchmarks.run --output results.json
+"""
@@ -0,0 +1,154 @@
+"""
+Deterministic synthetic corpus of PDF and Markdown documents
+"""
+
+import os
+import random
+from typing import Dict, List, Tuple
+
+# Sections per document for each size
+SIZES: Dict[str, int] = {"small": 4, "medium": 24, "large": 120}
+
+VOCABULARY = (
+    "revenue expenses depreciation liability asset equity accrual invoice ledger reconciliation "
+    "quarter fiscal budget forecast variance audit compliance payroll superannuation dividend "
+    "capital receivable payable inventory amortisation provision lease covenant cashflow margin "
+    "the of and to in for on with by from at as is are was were be this that which"
+).split()
+
+_ACCOUNTS = ["Cash at bank", "Trade debtors", "Prepayments", "Plant and equipment", "Trade creditors", "GST payable"]
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+def _table(rng: random.Random) -> List[List[str]]:
+    rows = [["Account", "Current year", "Prior year"]]
+    for account in rng.sample(_ACCOUNTS, rng.randint(3, len(_ACCOUNTS))):
+        rows.append([account, f"{rng.randint(1000, 999999):,}", f"{rng.randint(1000, 999999):,}"])
+    return rows
+
+def _sections(rng: random.Random, count: int) -> List[Tuple[str, List[str], List[List[str]]]]:
+    sections = []
+    for i in range(count):
+        title = f"{i + 1}. {rng.choice(VOCABULARY).capitalize()} {rng.choice(VOCABULARY)}"
+        paragraphs = [_paragraph(rng) for _ in range(rng.randint(2, 4))]
+        table = _table(rng) if rng.random() < 0.3 else []
+        sections.append((title, paragraphs, table))
+    return sections
+
+def generate_markdown(section_count: int, seed: int) -> str:
+    """Markdown with headings, paragraphs and pipe tables"""
+    rng = random.Random(seed)
+    lines = [f"# Financial report {seed}", ""]
+    for title, paragraphs, table in _sections(rng, section_count):
+        lines.extend([f"## {title}", ""])
+        for paragraph in paragraphs:
+            lines.extend([paragraph, ""])
+        if table:
+            lines.append("| " + " | ".join(table[0]) + " |")
+            lines.append("|" + "---|" * len(table[0]))
+            for row in table[1:]:
+                lines.append("| " + " | ".join(row) + " |")
+            lines.append("")
+    return "\n".join(lines)
+
+def _wrap(text: str, width: int = 90) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def generate_pdf(section_count: int, seed: int) -> bytes:
+    """
+    A text-only PDF built without third-party libraries
+
+    Lines are placed with Helvetica on US Letter pages; tables are laid out
+    as aligned columns so the layout model sees them as tables.
+    """
+    rng = random.Random(seed)
+    # (font size, [(x offset, text), ...]) per line
+    lines: List[Tuple[int, List[Tuple[int, str]]]] = [(18, [(0, f"Financial report {seed}")])]
+    for title, paragraphs, table in _sections(rng, section_count):
+        lines.append((14, [(0, title)]))
+        for paragraph in paragraphs:
+            lines.extend((10, [(0, line)]) for line in _wrap(paragraph))
+            lines.append((10, []))
+        for row in table:
+            lines.append((10, list(zip((0, 220, 340), row))))
+        if table:
+            lines.append((10, []))
+
+    pages: List[List[str]] = []
+    commands: List[str] = []
+    y = 740
+    for size, cells in lines:
+        if y < 60:
+            pages.append(commands)
+            commands, y = [], 740
+        for x, text in cells:
+            commands.append(f"BT /F1 {size} Tf {72 + x} {y} Td ({_escape(text)}) Tj ET")
+        y -= size + 4
+    pages.append(commands)
+
+    objects: List[bytes] = []
+    page_count = len(pages)
+    font_id = 3
+    first_page_id = 4
+    kids = " ".join(f"{first_page_id + 2 * i} 0 R" for i in range(page_count))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, commands in enumerate(pages):
+        stream = "\n".join(commands).encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {first_page_id + 2 * i + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+def generate_corpus(directory: str, per_size: int = 2, seed: int = 0) -> List[str]:
+    """
+    Write per_size PDF and Markdown documents of each size to directory
+
+    The same seed always produces byte-identical files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for size, section_count in SIZES.items():
+        for i in range(per_size):
+            document_seed = seed * 1000 + section_count * 10 + i
+            for extension, content in (
+                ("pdf", generate_pdf(section_count, document_seed)),
+                ("md", generate_markdown(section_count, document_seed).encode("utf-8"))
+            ):
+                path = os.path.join(directory, f"{size}-{i}.{extension}")
+                with open(path, "wb") as f:
+                    f.write(content)
+                paths.append(path)
+    return paths
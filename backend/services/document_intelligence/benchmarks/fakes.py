@@ -0,0 +1,372 @@
+"""
+Local stand-ins for the Gemini embedding API and Supabase storage
+"""
+
+import os
+import re
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+import numpy as np
+
+from ..models import ConversionReport, DocumentChunk, DocumentMetadata, EmbeddingStatus, SearchResult
+from ..storage_service import CHUNK_FIELDS, DEFAULT_CHUNK_FIELDS, StorageService
+from ..vectors import decode_vector
+from .corpus import VOCABULARY
+
+_WORD = re.compile(r"\w+")
+
+@contextmanager
+def scoped_environ(**values: str) -> Iterator[None]:
+    """Set environment variables for the duration of a block, restoring the previous values after"""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _unit_vectors(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenAIClient"):
+        self.client = client
+
+    async def embed_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        if isinstance(contents, str):
+            contents = [contents]
+        client = self.client
+        client.requests += 1
+        await asyncio.sleep(client.latency_seconds + client.per_text_seconds * len(contents))
+
+        if client.failure_rate and client.rng.random() < client.failure_rate:
+            raise RuntimeError("Simulated embedding API failure")
+
+        dimension = getattr(config, "output_dimensionality", None) or client.dimension
+        return SimpleNamespace(embeddings=[
+            # Lists of floats, like the real client returns
+            SimpleNamespace(values=client.vector_for(text, dimension).tolist())
+            for text in contents
+        ])
+
+class FakeGenAIClient:
+    """
+    Embedding client with configurable latency and dimension
+
+    Vectors are derived from a hash of the text, so the same text always
+    gets the same embedding across runs.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 3072,
+        latency_ms: float = 50.0,
+        per_text_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.dimension = dimension
+        self.latency_seconds = latency_ms / 1000
+        self.per_text_seconds = per_text_ms / 1000
+        self.failure_rate = failure_rate
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.aio = SimpleNamespace(models=_FakeModels(self))
+        self.models = self.aio.models
+
+    def vector_for(self, text: str, dimension: int) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+class InMemoryStorageService(StorageService):
+    """
+    StorageService that keeps rows in process memory
+
+    store_chunks runs unchanged down to the upsert request, so row building
+    and vector encoding are measured. Search follows the semantics of the
+    SQL functions: candidates by reduced embedding, then filtered and ranked
+    on the full embedding, plus OR-of-terms full-text matching.
+    """
+
+    def __init__(self):
+        # The base class requires connection settings; nothing is ever contacted
+        with scoped_environ(SUPABASE_URL="http://localhost", SUPABASE_SERVICE_ROLE_KEY="offline"):
+            super().__init__()
+
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.rows: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        # Per-workspace search matrices and tokenized text, rebuilt after writes
+        self._matrices: Dict[str, Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]] = {}
+        self._words: Dict[str, List[List[str]]] = {}
+
+    async def get_client(self):
+        raise RuntimeError("InMemoryStorageService has no database client")
+
+    async def close(self) -> None:
+        return None
+
+    def _invalidate(self, workspace_id: str) -> None:
+        self._matrices.pop(workspace_id, None)
+        self._words.pop(workspace_id, None)
+
+    async def _upsert_batch(self, rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        now = datetime.now(timezone.utc).isoformat()
+        stored = []
+        for row in rows:
+            key = (row["document_id"], row["chunk_index"])
+            existing = self.rows.get(key)
+            record = dict(row)
+            record["id"] = existing["id"] if existing else str(uuid4())
+            record["created_at"] = existing["created_at"] if existing else now
+            record["updated_at"] = now
+            # The database parses the vector literals on insert
+            record["embedding"] = decode_vector(row.get("embedding"))
+            record["embedding_reduced"] = decode_vector(row.get("embedding_reduced"))
+            self.rows[key] = record
+            self._invalidate(record["workspace_id"])
+            stored.append({**record, "embedding": None, "embedding_reduced": None})
+        await asyncio.sleep(0)
+        return stored
+
+    def load_synthetic_chunks(
+        self,
+        workspace_id: str,
+        count: int,
+        dimension: int,
+        reduced_dimension: int,
+        seed: int = 0
+    ) -> None:
+        """Fill a workspace with random chunks, bypassing the ingestion path"""
+        rng = np.random.default_rng(seed)
+        document_id = str(uuid4())
+        full = _unit_vectors(rng.standard_normal((count, dimension)).astype(np.float32))
+        now = datetime.now(timezone.utc).isoformat()
+        for i in range(count):
+            chunk_text = " ".join(VOCABULARY[j] for j in rng.integers(0, len(VOCABULARY), 40))
+            self.rows[(document_id, i)] = {
+                "id": str(uuid4()),
+                "document_id": document_id,
+                "workspace_id": workspace_id,
+                "user_id": "benchmark",
+                "chunk_text": chunk_text,
+                "chunk_index": i,
+                "chunk_type": "paragraph",
+                "token_count": 40,
+                "character_count": len(chunk_text),
+                "embedding": full[i],
+                "embedding_reduced": _unit_vectors(full[i, :reduced_dimension]),
+                "embedding_model": "gemini-embedding-001",
+                "embedding_status": EmbeddingStatus.READY.value,
+                "embedding_attempts": 0,
+                "chunking_strategy": "synthetic",
+                "content_hash": None,
+                "created_at": now,
+                "updated_at": now
+            }
+        self._invalidate(workspace_id)
+
+    def _workspace_matrices(self, workspace_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        if workspace_id not in self._matrices:
+            rows = [
+                row for row in self.rows.values()
+                if row["workspace_id"] == workspace_id and row["embedding"] is not None
+            ]
+            if rows:
+                full = _unit_vectors(np.stack([row["embedding"] for row in rows]))
+                reduced = _unit_vectors(np.stack([row["embedding_reduced"] for row in rows]))
+            else:
+                full = reduced = np.zeros((0, 0), dtype=np.float32)
+            self._matrices[workspace_id] = (rows, full, reduced)
+        return self._matrices[workspace_id]
+
+    @staticmethod
+    def _result(row: Dict[str, Any], similarity: float) -> SearchResult:
+        return SearchResult(
+            id=row["id"],
+            document_id=row["document_id"],
+            chunk_text=row["chunk_text"],
+            chunk_type=row["chunk_type"],
+            similarity=similarity
+        )
+
+    async def upsert_documents(self, documents: List[DocumentMetadata]) -> Set[UUID]:
+        for metadata in documents:
+            self.documents[str(metadata.document_id)] = {
+                **metadata.model_dump(mode="json"),
+                "processing_status": "uploaded"
+            }
+        return {metadata.document_id for metadata in documents}
+
+    async def update_document_status(self, document_id: UUID, status: str, stage: Optional[str] = None) -> bool:
+        document = self.documents.setdefault(str(document_id), {"document_id": str(document_id)})
+        document.update(processing_status=status, processing_stage=stage)
+        return True
+
+    async def update_document_conversion(self, document_id: UUID, report: ConversionReport) -> bool:
+        document = self.documents.setdefault(str(document_id), {"document_id": str(document_id)})
+        document.update(conversion_profile=report.profile.value, conversion_report=report.model_dump(mode="json"))
+        return True
+
+    async def search_similar_chunks(
+        self,
+        query_embedding: np.ndarray,
+        workspace_id: str,
+        similarity_threshold: float = 0.7,
+        max_results: int = 10,
+        query_embedding_reduced: Optional[np.ndarray] = None
+    ) -> List[SearchResult]:
+        rows, full, reduced = self._workspace_matrices(workspace_id)
+        if not rows:
+            return []
+
+        query_full = _unit_vectors(np.asarray(query_embedding, dtype=np.float32))
+        if self.use_hybrid_search and query_embedding_reduced is not None:
+            query_reduced = _unit_vectors(np.asarray(query_embedding_reduced, dtype=np.float32))
+            candidate_count = min(len(rows), max_results * self.search_candidate_multiplier)
+            scores = reduced @ query_reduced
+            candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        else:
+            candidates = np.arange(len(rows))
+
+        similarities = full[candidates] @ query_full
+        order = np.argsort(-similarities)
+        return [
+            self._result(rows[candidates[i]], float(similarities[i]))
+            for i in order[:max_results]
+            if similarities[i] > similarity_threshold
+        ]
+
+    async def search_lexical_chunks(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        workspace_id: str,
+        max_results: int = 10
+    ) -> List[SearchResult]:
+        terms = set(_WORD.findall(query.lower()))
+        if not terms:
+            return []
+
+        rows, full, _ = self._workspace_matrices(workspace_id)
+        if workspace_id not in self._words:
+            self._words[workspace_id] = [_WORD.findall(row["chunk_text"].lower()) for row in rows]
+
+        query_full = _unit_vectors(np.asarray(query_embedding, dtype=np.float32))
+        matches = []
+        for i, words in enumerate(self._words[workspace_id]):
+            rank = sum(1 for word in words if word in terms)
+            if rank:
+                matches.append((rank / (1 + len(words)), i))
+
+        matches.sort(reverse=True)
+        return [self._result(rows[i], float(full[i] @ query_full)) for _, i in matches[:max_results]]
+
+    async def get_document_chunk_page(
+        self,
+        document_id: UUID,
+        after_index: int = -1,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        columns = list(fields or DEFAULT_CHUNK_FIELDS)
+        if "chunk_index" not in columns:
+            columns.append("chunk_index")
+
+        rows = sorted(
+            (row for (row_document_id, index), row in self.rows.items()
+             if row_document_id == str(document_id) and index > after_index),
+            key=lambda row: row["chunk_index"]
+        )[:limit or self.chunk_page_size]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    async def delete_chunks_from(self, document_id: UUID, from_index: int) -> int:
+        stale = [key for key in self.rows if key[0] == str(document_id) and key[1] >= from_index]
+        for key in stale:
+            self._invalidate(self.rows.pop(key)["workspace_id"])
+        return len(stale)
+
+    def _pending_rows(self) -> List[Dict[str, Any]]:
+        return [row for row in self.rows.values() if row.get("embedding_status") == EmbeddingStatus.PENDING.value]
+
+    async def get_pending_chunks(self, limit: int) -> List[DocumentChunk]:
+        rows = sorted(
+            self._pending_rows(), key=lambda row: (row["embedding_attempts"], row["created_at"])
+        )[:limit]
+        return [DocumentChunk(**{column: row.get(column) for column in DEFAULT_CHUNK_FIELDS}) for row in rows]
+
+    async def complete_chunk_embeddings(self, chunks: List[DocumentChunk]) -> Optional[List[DocumentChunk]]:
+        rows_by_id = {row["id"]: row for row in self.rows.values()}
+        now = datetime.now(timezone.utc).isoformat()
+        updated = []
+        for chunk in chunks:
+            row = rows_by_id.get(str(chunk.id))
+            if (
+                row is None
+                or row["embedding_status"] != EmbeddingStatus.PENDING.value
+                or row["content_hash"] != chunk.content_hash
+            ):
+                continue
+            row["embedding"] = chunk.embedding
+            row["embedding_reduced"] = chunk.embedding_reduced
+            row["embedding_model"] = chunk.embedding_model
+            row["embedding_status"] = EmbeddingStatus.READY.value
+            row["updated_at"] = now
+            self._invalidate(row["workspace_id"])
+            updated.append(chunk)
+        await asyncio.sleep(0)
+        self._notify_chunks_stored(updated)
+        return updated
+
+    async def record_chunk_embedding_failures(self, chunk_ids: List[UUID], max_attempts: int) -> int:
+        ids = {str(chunk_id) for chunk_id in chunk_ids}
+        marked_failed = 0
+        for row in self._pending_rows():
+            if row["id"] not in ids:
+                continue
+            row["embedding_attempts"] += 1
+            if row["embedding_attempts"] >= max_attempts:
+                row["embedding_status"] = EmbeddingStatus.FAILED.value
+                marked_failed += 1
+        return marked_failed
+
+    async def count_pending_chunks(self) -> Optional[int]:
+        return len(self._pending_rows())
+
+    async def get_chunk_watermark(self, workspace_id: str) -> Optional[Dict[str, Any]]:
+        updated_at = [row["updated_at"] for row in self.rows.values() if row["workspace_id"] == workspace_id]
+        return {"count": len(updated_at), "updated_at": max(updated_at, default=None)}
+
+    async def get_workspace_chunk_page(
+        self,
+        workspace_id: str,
+        after_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        rows = sorted(
+            (row for row in self.rows.values()
+             if row["workspace_id"] == workspace_id and (after_id is None or row["id"] > after_id)),
+            key=lambda row: row["id"]
+        )[:limit or self.chunk_page_size]
+        return [{column: row.get(column) for column in CHUNK_FIELDS} for row in rows]
+
+    def chunk_count(self) -> int:
+        return len(self.rows)
+
+    def to_chunks(self, document_id: UUID) -> List[DocumentChunk]:
+        return [
+            DocumentChunk(**row) for (row_document_id, _), row in sorted(self.rows.items())
+            if row_document_id == str(document_id)
+        ]
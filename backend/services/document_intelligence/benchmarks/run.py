@@ -0,0 +1,350 @@
+"""
+Offline benchmark for ingestion throughput, end-to-end latency and search
+
+Usage, from backend/services:
+    python -m document_intelligence.benchmarks.run [--output results.json] \
+        [--docs-per-size N] [--embed-latency-ms MS] [--dimension D] [--index-sizes 1000,10000] \
+        [--embedding-backend gemini|local]
+
+Conversion uses the real Docling pipeline; embeddings come from
+FakeGenAIClient (or the local CPU model with --embedding-backend local) and
+storage from InMemoryStorageService, so no network access or credentials
+are needed. Results are printed (or written) as JSON.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import numpy as np
+
+from ..models import (
+    DocumentChunk,
+    DocumentMetadata,
+    ProcessDocumentRequest,
+    ProcessingStatus,
+    SearchMode,
+    SearchRequest
+)
+from ..embedding_service import reduce_embedding
+from ..rag_service import content_hash
+from ..service import DocumentIntelligenceService
+from .corpus import VOCABULARY, generate_corpus
+from .fakes import FakeGenAIClient, InMemoryStorageService, scoped_environ
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ID = "benchmark"
+USER_ID = "benchmark"
+
+def _latency_summary(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {}
+    values = np.asarray(seconds) * 1000
+    return {
+        "count": len(seconds),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+def _rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux and bytes on macOS; children only count once reaped
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def _metadata(path: str) -> DocumentMetadata:
+    name = os.path.basename(path)
+    extension = os.path.splitext(name)[1].lstrip(".")
+    return DocumentMetadata(
+        document_id=uuid4(),
+        workspace_id=WORKSPACE_ID,
+        user_id=USER_ID,
+        original_name=name,
+        file_name=name,
+        file_path=path,
+        public_url=f"file://{path}",
+        file_size=os.path.getsize(path),
+        file_type="application/pdf" if extension == "pdf" else "text/markdown",
+        file_extension=extension
+    )
+
+# Every cache is disabled, so repeated runs measure the same work
+BENCHMARK_ENVIRONMENT = {
+    "CONVERSION_CACHE_ENABLED": "false",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "SEARCH_CACHE_ENABLED": "false",
+    "INCREMENTAL_REPROCESSING": "false"
+}
+
+async def benchmark_stages(service: DocumentIntelligenceService, paths: List[str]) -> Dict[str, Any]:
+    """Throughput of each ingestion stage run on its own, one document at a time"""
+    rag = service.rag_service
+    results: Dict[str, Any] = {}
+
+    # Convert
+    documents: List[tuple] = []
+    convert_seconds = []
+    total_bytes = 0
+    profiles: Dict[str, int] = {}
+    for path in paths:
+        report: Dict[str, Any] = {}
+        start = time.perf_counter()
+        blocks = await service.document_converter.convert_document_blocks(path, report=report)
+        convert_seconds.append(time.perf_counter() - start)
+        total_bytes += os.path.getsize(path)
+        profiles[report["profile"]] = profiles.get(report["profile"], 0) + 1
+        documents.append((_metadata(path), blocks))
+    results["convert"] = {
+        "documents": len(paths),
+        "profiles": profiles,
+        "documents_per_second": _rate(len(paths), sum(convert_seconds)),
+        "mb_per_second": _rate(total_bytes / (1024 * 1024), sum(convert_seconds)),
+        "latency": _latency_summary(convert_seconds)
+    }
+
+    # Chunk
+    chunked: List[tuple] = []
+    start = time.perf_counter()
+    for metadata, blocks in documents:
+        chunked.append((metadata, list(rag.structure_chunker.chunk(blocks))))
+    chunk_seconds = time.perf_counter() - start
+    chunk_count = sum(len(chunks) for _, chunks in chunked)
+    token_count = sum(
+        rag.chunker.tokenizer.count_tokens(chunk_text) for _, chunks in chunked for chunk_text, _ in chunks
+    )
+    results["chunk"] = {
+        "chunks": chunk_count,
+        "tokens": token_count,
+        "chunks_per_second": _rate(chunk_count, chunk_seconds),
+        "tokens_per_second": _rate(token_count, chunk_seconds)
+    }
+
+    # Embed
+    texts = [chunk_text for _, chunks in chunked for chunk_text, _ in chunks]
+    requests_before = rag.genai_client.requests
+    start = time.perf_counter()
+    embeddings = await rag.embedder.embed_texts(texts)
+    embed_seconds = time.perf_counter() - start
+    results["embed"] = {
+        "texts": len(texts),
+        "requests": rag.genai_client.requests - requests_before,
+        "texts_per_second": _rate(len(texts), embed_seconds)
+    }
+
+    # Store
+    embedding_iter = iter(embeddings)
+    document_chunks: List[DocumentChunk] = []
+    for metadata, chunks in chunked:
+        for chunk_index, (chunk_text, chunk_type) in enumerate(chunks):
+            embedding = next(embedding_iter)
+            document_chunks.append(DocumentChunk(
+                document_id=metadata.document_id,
+                workspace_id=metadata.workspace_id,
+                user_id=metadata.user_id,
+                chunk_text=chunk_text,
+                chunk_index=chunk_index,
+                chunk_type=chunk_type,
+                token_count=len(chunk_text.split()),
+                character_count=len(chunk_text),
+                embedding=embedding,
+                embedding_reduced=reduce_embedding(embedding, rag.embedder.reduced_dimension),
+                embedding_model=rag.embedding_model,
+                chunking_strategy="structure",
+                content_hash=content_hash(chunk_text)
+            ))
+
+    start = time.perf_counter()
+    for i in range(0, len(document_chunks), rag.store_batch_size):
+        if not await service.storage.store_chunks(document_chunks[i:i + rag.store_batch_size]):
+            raise RuntimeError("Storing benchmark chunks failed")
+    store_seconds = time.perf_counter() - start
+    results["store"] = {
+        "rows": len(document_chunks),
+        "rows_per_second": _rate(len(document_chunks), store_seconds)
+    }
+    return results
+
+async def benchmark_end_to_end(service: DocumentIntelligenceService, paths: List[str]) -> Dict[str, Any]:
+    """Latency of process_document, the full pipeline, per document"""
+    seconds = []
+    chunks = 0
+    for path in paths:
+        start = time.perf_counter()
+        response = await service.process_document(ProcessDocumentRequest(file_path=path, metadata=_metadata(path)))
+        seconds.append(time.perf_counter() - start)
+        if response.status != ProcessingStatus.PROCESSED:
+            raise RuntimeError(f"Processing {path} failed: {response.message}")
+        chunks += response.chunks_created
+    return {
+        "documents": len(paths),
+        "chunks": chunks,
+        "chunks_per_second": _rate(chunks, sum(seconds)),
+        "latency": _latency_summary(seconds)
+    }
+
+async def benchmark_search(
+    service: DocumentIntelligenceService,
+    storage: InMemoryStorageService,
+    index_sizes: List[int],
+    queries: int,
+    seed: int
+) -> List[Dict[str, Any]]:
+    """Search latency, overall and per stage, against workspaces of increasing size"""
+    rng = random.Random(seed)
+    rag = service.rag_service
+    results = []
+
+    for index_size in index_sizes:
+        workspace_id = f"search-{index_size}"
+        storage.load_synthetic_chunks(
+            workspace_id, index_size, rag.embedder.embedding_dimension, rag.embedder.reduced_dimension, seed
+        )
+
+        entry: Dict[str, Any] = {"index_size": index_size}
+        for mode in SearchMode:
+            totals: List[float] = []
+            stages: Dict[str, List[float]] = {}
+            for i in range(queries):
+                query = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 6))) + f" {i}"
+                response = await service.search_documents(SearchRequest(
+                    query=query,
+                    workspace_id=workspace_id,
+                    similarity_threshold=0.0,
+                    search_mode=mode,
+                    rerank=False
+                ))
+                totals.append(response.search_time_seconds)
+                for stage, stage_seconds in response.timings.items():
+                    stages.setdefault(stage, []).append(stage_seconds)
+
+            entry[mode.value] = {
+                "total": _latency_summary(totals),
+                "stages": {stage: _latency_summary(values) for stage, values in stages.items()}
+            }
+        results.append(entry)
+        logger.info(f"Searched index of {index_size} chunks")
+
+    return results
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every benchmark, with the benchmark settings applied only while it runs"""
+    with scoped_environ(**BENCHMARK_ENVIRONMENT, EMBEDDING_BACKEND=args.embedding_backend):
+        return await _run_benchmarks(args)
+
+async def _run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    client = FakeGenAIClient(
+        dimension=args.dimension,
+        latency_ms=args.embed_latency_ms,
+        per_text_ms=args.embed_per_text_ms,
+        seed=args.seed
+    )
+    storage = InMemoryStorageService()
+    # The synthetic index and local vectors match the fake client's dimension
+    service = DocumentIntelligenceService(storage=storage, genai_client=client, embedding_dimension=args.dimension)
+    await service.rag_service.warm_up()
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="di-benchmark-")
+    paths = generate_corpus(corpus_dir, args.docs_per_size, args.seed)
+    logger.info(f"Generated {len(paths)} documents in {corpus_dir}")
+
+    results: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "docs_per_size": args.docs_per_size,
+            "corpus_bytes": sum(os.path.getsize(path) for path in paths),
+            "seed": args.seed,
+            "embed_latency_ms": args.embed_latency_ms,
+            "embed_per_text_ms": args.embed_per_text_ms,
+            "dimension": args.dimension,
+            "embedding_backend": service.rag_service.embedding_backend,
+            "embedding_model": service.rag_service.embedding_model,
+            "reduced_dimension": service.rag_service.embedder.reduced_dimension,
+            "embedding_batch_size": service.rag_service.embedder.batch_size,
+            "embedding_max_concurrency": service.rag_service.embedder.max_concurrency,
+            "conversion_workers": service.document_converter.pool_size,
+            "chunking_strategy": service.chunking_strategy,
+            "vector_index": service.rag_service.vector_index.enabled
+        }
+    }
+
+    try:
+        start = time.perf_counter()
+        results["stages"] = await benchmark_stages(service, paths)
+        results["end_to_end"] = await benchmark_end_to_end(service, paths)
+        results["search"] = await benchmark_search(service, storage, args.index_sizes, args.queries, args.seed)
+        results["wall_seconds"] = round(time.perf_counter() - start, 2)
+    finally:
+        await service.shutdown()
+
+    # After shutdown, so the conversion workers have been reaped
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+async def _main(args: argparse.Namespace) -> int:
+    results = await run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        logger.info(f"Wrote results to {args.output}")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.setLevel(logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the offline ingestion and search benchmark")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--corpus-dir", help="Directory for the generated corpus (default: a temporary directory)")
+    parser.add_argument("--docs-per-size", type=int, default=2, help="PDF and Markdown documents per size")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus, queries and synthetic index")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="Fake embedding request latency")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.0, help="Extra fake latency per text")
+    parser.add_argument("--dimension", type=int, default=3072, help="Fake embedding dimension")
+    parser.add_argument(
+        "--index-sizes", type=lambda value: [int(size) for size in value.split(",")],
+        default=[1000, 5000, 20000], help="Comma-separated chunk counts for search benchmarks"
+    )
+    parser.add_argument("--queries", type=int, default=50, help="Queries per index size and search mode")
+    parser.add_argument(
+        "--embedding-backend", choices=["gemini", "local"], default="gemini",
+        help="Embed with the fake Gemini client or the local CPU model (needs the local extra)"
+    )
+
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,205 @@
+"""
+Bulk multi-document ingestion from a manifest (directory or JSONL)
+
+Usage, from backend/services:
+    python -m document_intelligence.bulk_ingest MANIFEST \
+        --workspace-id WORKSPACE --user-id USER [--checkpoint PATH] [--concurrency N]
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import mimetypes
+from typing import List, Optional, Set
+from uuid import NAMESPACE_URL, uuid5
+
+from .models import (
+    BulkIngestReport,
+    DocumentMetadata,
+    ProcessDocumentRequest,
+    ProcessingStatus
+)
+from .service import DocumentIntelligenceService
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".html", ".htm", ".md"}
+
+def _request_for_file(file_path: str, workspace_id: str, user_id: str) -> ProcessDocumentRequest:
+    """Build a request for a local file, with a document_id stable across runs"""
+    absolute_path = os.path.abspath(file_path)
+    file_name = os.path.basename(absolute_path)
+    extension = os.path.splitext(file_name)[1].lower()
+
+    metadata = DocumentMetadata(
+        document_id=uuid5(NAMESPACE_URL, f"{workspace_id}:{absolute_path}"),
+        workspace_id=workspace_id,
+        user_id=user_id,
+        original_name=file_name,
+        file_name=file_name,
+        file_path=absolute_path,
+        public_url=f"file://{absolute_path}",
+        file_size=os.path.getsize(absolute_path),
+        file_type=mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+        file_extension=extension
+    )
+    return ProcessDocumentRequest(file_path=absolute_path, metadata=metadata)
+
+def load_manifest(
+    manifest_path: str,
+    workspace_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> List[ProcessDocumentRequest]:
+    """
+    Load ingestion requests from a manifest
+
+    A directory is scanned recursively for supported files, which requires
+    workspace_id and user_id. A JSONL file holds one ProcessDocumentRequest
+    per line, or a bare DocumentMetadata whose file_path is a local path.
+    """
+    if os.path.isdir(manifest_path):
+        if not workspace_id or not user_id:
+            raise ValueError("workspace_id and user_id are required for directory manifests")
+
+        requests = []
+        for root, _, files in os.walk(manifest_path):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    requests.append(_request_for_file(os.path.join(root, name), workspace_id, user_id))
+        return requests
+
+    requests = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            try:
+                if "metadata" in record:
+                    requests.append(ProcessDocumentRequest(**record))
+                else:
+                    metadata = DocumentMetadata(**record)
+                    requests.append(ProcessDocumentRequest(file_path=metadata.file_path, metadata=metadata))
+            except Exception as e:
+                raise ValueError(f"Invalid manifest entry on line {line_number}: {str(e)}")
+    return requests
+
+class BulkIngestor:
+    """
+    Runs many documents through the pipeline concurrently
+
+    Conversion parallelism comes from the converter's process pool,
+    embedding requests from concurrent documents are coalesced into shared
+    batches, and completed document ids are appended to a checkpoint file so
+    an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, service: DocumentIntelligenceService, concurrency: Optional[int] = None):
+        self.service = service
+        default_concurrency = max(2, self.service.document_converter.pool_size * 2)
+        self.concurrency = concurrency or int(os.getenv("BULK_INGEST_CONCURRENCY", str(default_concurrency)))
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: Optional[str]) -> Set[str]:
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return set()
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    async def run(
+        self,
+        requests: List[ProcessDocumentRequest],
+        checkpoint_path: Optional[str] = None
+    ) -> BulkIngestReport:
+        """Ingest all requests, skipping documents already in the checkpoint"""
+        start_time = time.time()
+        completed = self._load_checkpoint(checkpoint_path)
+        pending = [r for r in requests if str(r.metadata.document_id) not in completed]
+        skipped = len(requests) - len(pending)
+        if skipped:
+            logger.info(f"Resuming bulk ingest: {skipped} documents already completed")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        checkpoint_lock = asyncio.Lock()
+        processed = 0
+        chunks_created = 0
+        failures = {}
+
+        # Chunks reference documents(document_id), so create the rows up front
+        written = await self.service.storage.upsert_documents([request.metadata for request in pending])
+        for request in pending:
+            if request.metadata.document_id not in written:
+                failures[str(request.metadata.document_id)] = "Failed to create document record"
+        pending = [request for request in pending if request.metadata.document_id in written]
+
+        async def ingest(request: ProcessDocumentRequest) -> None:
+            nonlocal processed, chunks_created
+            document_id = str(request.metadata.document_id)
+
+            async with semaphore:
+                result = await self.service.process_document(request)
+
+            if result.status != ProcessingStatus.PROCESSED:
+                failures[document_id] = result.message
+                return
+
+            processed += 1
+            chunks_created += result.chunks_created
+            if checkpoint_path:
+                async with checkpoint_lock:
+                    with open(checkpoint_path, "a", encoding="utf-8") as f:
+                        f.write(document_id + "\n")
+
+            if processed % 10 == 0:
+                logger.info(f"Bulk ingest progress: {processed}/{len(pending)} documents")
+
+        await asyncio.gather(*(ingest(request) for request in pending))
+
+        elapsed = max(time.time() - start_time, 1e-6)
+        report = BulkIngestReport(
+            total_documents=len(requests),
+            processed=processed,
+            skipped=skipped,
+            failed=len(failures),
+            chunks_created=chunks_created,
+            elapsed_seconds=round(elapsed, 2),
+            documents_per_minute=round(processed * 60 / elapsed, 2),
+            chunks_per_second=round(chunks_created / elapsed, 2),
+            failures=failures
+        )
+        logger.info(
+            f"Bulk ingest finished: {processed} processed, {skipped} skipped, {len(failures)} failed "
+            f"({report.documents_per_minute} docs/min, {report.chunks_per_second} chunks/s)"
+        )
+        return report
+
+async def _main(args: argparse.Namespace) -> int:
+    requests = load_manifest(args.manifest, args.workspace_id, args.user_id)
+    checkpoint_path = args.checkpoint or f"{args.manifest.rstrip(os.sep)}.checkpoint"
+
+    service = DocumentIntelligenceService()
+    try:
+        report = await BulkIngestor(service, args.concurrency).run(requests, checkpoint_path)
+    finally:
+        await service.shutdown()
+
+    print(report.model_dump_json(indent=2))
+    return 0 if report.failed == 0 else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Bulk-ingest documents into the Document Intelligence Service")
+    parser.add_argument("manifest", help="Directory of documents or JSONL manifest")
+    parser.add_argument("--workspace-id", help="Workspace for documents found in a directory")
+    parser.add_argument("--user-id", help="User for documents found in a directory")
+    parser.add_argument("--checkpoint", help="File recording completed documents (default: MANIFEST.checkpoint)")
+    parser.add_argument("--concurrency", type=int, help="Documents processed at once")
+
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,122 @@
+"""
+Content-addressed on-disk cache for document conversion output
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ConversionCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv("CONVERSION_CACHE_DIR", ".cache/conversions")
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("CONVERSION_CACHE_MAX_BYTES", str(512 * 1024 * 1024))
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # key -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU index from the files already on disk"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".md"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name[:-3], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        logger.info(f"Conversion cache loaded {len(self._entries)} entries ({self._total_bytes} bytes)")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.md")
+
+    @staticmethod
+    def make_key(file_path: str, options: Dict[str, Any]) -> str:
+        """Hash the file bytes together with the conversion options"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached Markdown for a key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                # File removed behind our back - treat as a miss
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+
+            # Mark as most recently used, on disk too so order survives restarts
+            self._entries.move_to_end(key)
+            os.utime(path)
+            self.hits += 1
+            return content
+
+    def put(self, key: str, content: str) -> None:
+        """Store Markdown for a key, evicting least recently used entries"""
+        data = content.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for health and monitoring"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -3,35 +3,600 @@ Document Converter using Docling for PDF to Markdown conversion
 """
 
 import os
+import re
+import json
+import time
+import asyncio
 import logging
-from typing import Optional
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import pypdfium2 as pdfium
 from docling.document_converter import DocumentConverter as DoclingConverter, PdfFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+from docling_core.types.doc import DoclingDocument, TableItem
+
+from . import metrics
+from .conversion_cache import ConversionCache
+from .models import ConversionProfile, DocumentBlock
 
 logger = logging.getLogger(__name__)
 
+# Per-process Docling converters by profile, created by each pool worker on first use
+_worker_converters: Dict[str, DoclingConverter] = {}
+_worker_profile_options: Dict[str, PdfPipelineOptions] = {}
+# Shared by the pool's workers so each takes exactly one warm-up job
+_worker_warm_barrier: Optional[Any] = None
+
+# Profiles that run the Docling PDF pipeline, cheapest first
+PDF_PROFILES = (ConversionProfile.TEXT, ConversionProfile.TABLES, ConversionProfile.FULL)
+
+# Formats converted by Docling's declarative backends, without the PDF models
+SIMPLE_FORMATS = {
+    "docx": InputFormat.DOCX,
+    "html": InputFormat.HTML,
+    "htm": InputFormat.HTML,
+    "md": InputFormat.MD,
+    "markdown": InputFormat.MD
+}
+SIMPLE_MIME_TYPES = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "text/html": "html",
+    "text/markdown": "md"
+}
+
+def build_pipeline_options(profile: ConversionProfile) -> PdfPipelineOptions:
+    """PDF pipeline settings for a conversion profile"""
+    if profile == ConversionProfile.TEXT:
+        # Text layer only - no OCR, no table structure model
+        return PdfPipelineOptions(do_ocr=False, do_table_structure=False)
+    
+    pipeline_options = PdfPipelineOptions(do_ocr=profile == ConversionProfile.FULL, do_table_structure=True)
+    pipeline_options.table_structure_options.mode = (
+        TableFormerMode.ACCURATE if profile == ConversionProfile.FULL else TableFormerMode.FAST
+    )
+    pipeline_options.table_structure_options.do_cell_matching = False
+    return pipeline_options
+
+def _build_docling_converter(pipeline_options: PdfPipelineOptions) -> DoclingConverter:
+    """Create a Docling converter and load its PDF pipeline models"""
+    converter = DoclingConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        }
+    )
+    # Load layout/TableFormer models up front instead of on the first convert
+    converter.initialize_pipeline(InputFormat.PDF)
+    return converter
+
+def _init_worker(profile_options: Dict[str, PdfPipelineOptions], warm_barrier: Any) -> None:
+    """Process pool initializer - records the PDF profiles this worker can convert with"""
+    global _worker_profile_options, _worker_warm_barrier
+    _worker_profile_options = profile_options
+    _worker_warm_barrier = warm_barrier
+    logger.info(f"Docling worker {os.getpid()} ready")
+
+def _worker_converter(profile: str) -> DoclingConverter:
+    """The worker's converter for a profile, loading its models on first use"""
+    converter = _worker_converters.get(profile)
+    if converter is None:
+        start_time = time.perf_counter()
+        converter = _build_docling_converter(_worker_profile_options[profile])
+        _worker_converters[profile] = converter
+        logger.info(
+            f"Docling worker {os.getpid()} loaded the {profile} pipeline in {time.perf_counter() - start_time:.1f}s"
+        )
+    return converter
+
+def _warm_worker(profiles: List[str], timeout: float) -> int:
+    """Load this worker's converters for profiles, returning its process id"""
+    try:
+        for profile in profiles:
+            _worker_converter(profile)
+    finally:
+        # Hold on to the job until every worker has one, so none takes two
+        try:
+            _worker_warm_barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass
+    return os.getpid()
+
+# Furniture and images carry no retrievable text
+SKIPPED_BLOCK_TYPES = {"page_header", "page_footer", "picture"}
+
+def extract_blocks(document: DoclingDocument) -> List[Dict[str, Any]]:
+    """Flatten the Docling document tree into typed blocks in reading order"""
+    blocks = []
+    for item, level in document.iterate_items():
+        block_type = getattr(item.label, "value", str(item.label))
+        if block_type in SKIPPED_BLOCK_TYPES:
+            continue
+        
+        if isinstance(item, TableItem):
+            text = item.export_to_markdown(doc=document)
+        else:
+            text = getattr(item, "text", "")
+        if not text or not text.strip():
+            continue
+        
+        blocks.append({
+            "block_type": block_type,
+            "text": text,
+            "level": getattr(item, "level", level),
+            "page_no": item.prov[0].page_no if item.prov else None
+        })
+    return blocks
+
+def _export(document: DoclingDocument, output: str) -> str:
+    """Serialize a converted document as Markdown or as JSON blocks"""
+    if output == "blocks":
+        return json.dumps(extract_blocks(document))
+    return document.export_to_markdown()
+
+def _convert_in_worker(
+    file_path: str, 
+    output: str, 
+    profile: str, 
+    page_range: Optional[Tuple[int, int]] = None
+) -> str:
+    """Convert a document, or an inclusive 1-based page range of it, inside a pool worker"""
+    converter = _worker_converter(profile)
+    if page_range is None:
+        result = converter.convert(file_path)
+    else:
+        result = converter.convert(file_path, page_range=page_range)
+    return _export(result.document, output)
+
+# A standalone figure: amount, year or percentage, optionally negative or bracketed
+_FIGURE = re.compile(r"(?<![\w.])[-(]?[$€£]?\d[\d,]*(?:\.\d+)?%?\)?(?!\w)")
+
+def inspect_pdf(file_path: str, sample_pages: int) -> Dict[str, Any]:
+    """
+    Cheap pre-pass over a PDF's text layer, without running any models
+    
+    Samples up to sample_pages pages spread across the document and returns
+    the page count, the average text-layer characters per sampled page and
+    the share of text lines holding two or more figures.
+    """
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page_count = len(pdf)
+        step = max(1, page_count // max(1, sample_pages))
+        sampled = list(range(0, page_count, step))[:sample_pages]
+        
+        characters = 0
+        lines = 0
+        figure_lines = 0
+        for index in sampled:
+            page = pdf[index]
+            text_page = page.get_textpage()
+            text = text_page.get_text_range()
+            text_page.close()
+            page.close()
+            
+            characters += len(text.strip())
+            for line in text.splitlines():
+                if line.strip():
+                    lines += 1
+                    if len(_FIGURE.findall(line)) >= 2:
+                        figure_lines += 1
+        
+        return {
+            "page_count": page_count,
+            "text_chars_per_page": round(characters / max(1, len(sampled)), 1),
+            "figure_line_ratio": round(figure_lines / max(1, lines), 3)
+        }
+    finally:
+        pdf.close()
+
+def split_page_range(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split pages 1..page_count into at most shards contiguous, near-equal ranges"""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 1
+    for i in range(shards):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+_TABLE_SEPARATOR = re.compile(r"^\|(\s*:?-+:?\s*\|)+$")
+
+def _table_lines(markdown: str) -> Optional[List[str]]:
+    """Lines of a Markdown pipe table, or None if the text is not one"""
+    lines = [line.strip() for line in markdown.strip().splitlines()]
+    if len(lines) < 2 or not all(line.startswith("|") for line in lines) or not _TABLE_SEPARATOR.match(lines[1]):
+        return None
+    return lines
+
+def _table_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip("|").split("|")]
+
+def _cell_kinds(cells: List[str]) -> Tuple[str, ...]:
+    """Shape of a table row: whether each cell is empty, a figure or text"""
+    return tuple(
+        "empty" if not cell else "figure" if _FIGURE.fullmatch(cell) else "text"
+        for cell in cells
+    )
+
+def join_continued_table(first: str, second: str) -> Optional[str]:
+    """
+    Join a table split across a page-range boundary
+    
+    Docling treats the first row of each fragment as a header. The second
+    fragment continues the first if that row repeats the first fragment's
+    header, which is then dropped, or if it is a data row rather than a
+    header: shaped like the first fragment's last row (empty, figure and
+    text cells in the same columns) and unlike its header. Returns None
+    otherwise, leaving two tables that happen to be adjacent apart.
+    """
+    first_lines = _table_lines(first)
+    second_lines = _table_lines(second)
+    if first_lines is None or second_lines is None:
+        return None
+    
+    header = _table_cells(first_lines[0])
+    continued_header = _table_cells(second_lines[0])
+    if len(header) != len(continued_header):
+        return None
+    
+    if continued_header == header:
+        return "\n".join(first_lines + second_lines[2:])
+    
+    if len(first_lines) < 3:
+        return None
+    row_kinds = _cell_kinds(continued_header)
+    if row_kinds != _cell_kinds(_table_cells(first_lines[-1])) or row_kinds == _cell_kinds(header):
+        return None
+    return "\n".join(first_lines + [second_lines[0]] + second_lines[2:])
+
+def merge_shards(parts: List[str], output: str) -> str:
+    """Merge the exports of consecutive page ranges into one, in page order"""
+    if output == "blocks":
+        blocks: List[Dict[str, Any]] = []
+        for part in parts:
+            shard_blocks = json.loads(part)
+            if blocks and shard_blocks and blocks[-1]["block_type"] == "table" and shard_blocks[0]["block_type"] == "table":
+                joined = join_continued_table(blocks[-1]["text"], shard_blocks[0]["text"])
+                if joined is not None:
+                    blocks[-1] = {**blocks[-1], "text": joined}
+                    shard_blocks = shard_blocks[1:]
+            blocks.extend(shard_blocks)
+        return json.dumps(blocks)
+    
+    # Markdown: paragraphs (and tables) are separated by blank lines
+    paragraphs: List[str] = []
+    for part in parts:
+        shard_paragraphs = [paragraph for paragraph in part.strip().split("\n\n") if paragraph.strip()]
+        if paragraphs and shard_paragraphs:
+            joined = join_continued_table(paragraphs[-1], shard_paragraphs[0])
+            if joined is not None:
+                paragraphs[-1] = joined
+                shard_paragraphs = shard_paragraphs[1:]
+        paragraphs.extend(shard_paragraphs)
+    return "\n\n".join(paragraphs)
+
 class DocumentConverter:
     def __init__(self):
         """Initialize the document converter with optimized settings"""
-        # Configure for better table processing
-        self.pipeline_options = PdfPipelineOptions(do_table_structure=True)
-        self.pipeline_options.table_structure_options.mode = TableFormerMode.ACCURATE
-        self.pipeline_options.table_structure_options.do_cell_matching = False
-        
-        # Initialize the Docling converter
-        self.converter = DoclingConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=self.pipeline_options)
-            }
+        # One PDF pipeline per profile, from text-layer-only to OCR with ACCURATE tables
+        self.profile_options = {profile.value: build_pipeline_options(profile) for profile in PDF_PROFILES}
+        
+        # "auto" picks a PDF profile per document from a pre-pass; text, tables or full forces one
+        profile = os.getenv("CONVERSION_PROFILE", "auto").lower()
+        pdf_profiles = [pdf_profile.value for pdf_profile in PDF_PROFILES]
+        if profile != "auto" and profile not in pdf_profiles:
+            raise ValueError(f"CONVERSION_PROFILE must be auto or one of {', '.join(pdf_profiles)}, got {profile}")
+        self.forced_profile: Optional[ConversionProfile] = None if profile == "auto" else ConversionProfile(profile)
+        self.inspect_pages = int(os.getenv("CONVERSION_INSPECT_PAGES", "5"))
+        # Below this many text-layer characters per page a PDF is treated as scanned
+        self.min_text_chars_per_page = int(os.getenv("CONVERSION_MIN_TEXT_CHARS_PER_PAGE", "100"))
+        # Share of lines holding two or more figures from which tables are assumed
+        self.table_line_ratio = float(os.getenv("CONVERSION_TABLE_LINE_RATIO", "0.15"))
+        
+        # Worker pool configuration - 0 workers converts in-process on a thread
+        self.pool_size = int(os.getenv("CONVERSION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+        self.max_pending = int(os.getenv("CONVERSION_MAX_PENDING", str(self.pool_size * 2)))
+        
+        # PDFs longer than this are split into page ranges converted in parallel by the pool
+        self.shard_min_pages = int(os.getenv("CONVERSION_SHARD_MIN_PAGES", "40"))
+        self.max_shards = int(os.getenv("CONVERSION_MAX_SHARDS", str(self.pool_size)))
+        
+        # Profiles every pool worker loads at start-up; the rest load on first use
+        default_warm = self.forced_profile.value if self.forced_profile is not None else ConversionProfile.TABLES.value
+        self.warm_profiles = [
+            warm_profile.strip().lower()
+            for warm_profile in os.getenv("CONVERSION_WARM_PROFILES", default_warm).split(",")
+            if warm_profile.strip()
+        ]
+        unknown = [warm_profile for warm_profile in self.warm_profiles if warm_profile not in pdf_profiles]
+        if unknown:
+            raise ValueError(f"CONVERSION_WARM_PROFILES must list profiles from {', '.join(pdf_profiles)}, got {', '.join(unknown)}")
+        self.warm_timeout_seconds = float(os.getenv("CONVERSION_WARM_TIMEOUT_SECONDS", "600"))
+        
+        # Backpressure: one slot per job submitted to the pool, so callers
+        # wait here once the pool and its queue are full
+        self._slots = asyncio.Semaphore(max(1, self.pool_size + self.max_pending))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # In-process converters by profile when there is no pool, created on first use
+        self.converters: Dict[str, DoclingConverter] = {}
+        self._converters_lock = threading.Lock()
+        # DOCX/HTML/Markdown converter, created on first use; it loads no models
+        self._simple_converter: Optional[DoclingConverter] = None
+        
+        # Content-addressed cache of Markdown output
+        cache_enabled = os.getenv("CONVERSION_CACHE_ENABLED", "true").lower() == "true"
+        self.cache: Optional[ConversionCache] = ConversionCache() if cache_enabled else None
+        
+        if self.pool_size > 0:
+            self._start_pool()
+    
+    def _start_pool(self) -> None:
+        """Start the pool of Docling workers"""
+        # spawn avoids forking a process that already holds threads and model state
+        context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.profile_options, context.Barrier(self.pool_size))
+        )
+        logger.info(f"Started Docling conversion pool with {self.pool_size} workers")
+    
+    async def warm_up(self) -> None:
+        """
+        Start every pool worker and load its converters for the warm-up profiles
+        
+        The pool only spawns a worker, and a worker only loads a profile's
+        models, when a job needs them, so without this the first conversions
+        (and every page range of the first large PDF) pay for both. Logs
+        rather than raises on failure.
+        """
+        if self._pool is None or not self.warm_profiles:
+            return
+        
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            pids = await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _warm_worker, self.warm_profiles, self.warm_timeout_seconds)
+                for _ in range(self.pool_size)
+            ))
+        except Exception as e:
+            logger.warning(f"Docling worker warm-up failed: {str(e)}")
+            return
+        logger.info(
+            f"Warmed {len(set(pids))} Docling workers with the {', '.join(self.warm_profiles)} pipelines "
+            f"in {time.perf_counter() - start_time:.1f}s"
         )
     
-    async def convert_document(self, file_path: str) -> str:
+    def _options_fingerprint(self, profile: ConversionProfile) -> Dict[str, Any]:
+        """Pipeline settings that affect conversion output"""
+        if profile == ConversionProfile.SIMPLE:
+            return {"profile": profile.value}
+        
+        pipeline_options = self.profile_options[profile.value]
+        table_options = pipeline_options.table_structure_options
+        return {
+            "profile": profile.value,
+            "do_ocr": pipeline_options.do_ocr,
+            "do_table_structure": pipeline_options.do_table_structure,
+            "table_mode": table_options.mode.value,
+            "do_cell_matching": table_options.do_cell_matching
+        }
+    
+    async def _choose_profile(
+        self, 
+        file_path: str, 
+        file_type: Optional[str] = None, 
+        file_extension: Optional[str] = None
+    ) -> Tuple[ConversionProfile, Dict[str, Any]]:
+        """
+        Pick a conversion profile for a file, returning it with the pre-pass findings
+        
+        DOCX, HTML and Markdown go to the lightweight converter. PDFs with
+        no usable text layer get OCR and ACCURATE tables, born-digital PDFs
+        with many lines of figures get FAST tables, and the rest are
+        extracted from the text layer alone.
         """
-        Convert a document (PDF) to Markdown format
+        extension = (file_extension or os.path.splitext(file_path)[1]).lower().lstrip(".")
+        if extension not in SIMPLE_FORMATS and file_type:
+            extension = SIMPLE_MIME_TYPES.get(file_type.lower(), extension)
+        if extension in SIMPLE_FORMATS:
+            return ConversionProfile.SIMPLE, {}
+        
+        inspection: Dict[str, Any] = {}
+        try:
+            inspection = await asyncio.to_thread(inspect_pdf, file_path, self.inspect_pages)
+        except Exception as e:
+            # Let Docling report unreadable files
+            logger.warning(f"Could not inspect {file_path}, using the full pipeline: {str(e)}")
+            return self.forced_profile or ConversionProfile.FULL, inspection
+        
+        inspection["has_text_layer"] = inspection["text_chars_per_page"] >= self.min_text_chars_per_page
+        inspection["tables_likely"] = inspection["figure_line_ratio"] >= self.table_line_ratio
+        
+        if self.forced_profile is not None:
+            profile = self.forced_profile
+        elif not inspection["has_text_layer"]:
+            profile = ConversionProfile.FULL
+        elif inspection["tables_likely"]:
+            profile = ConversionProfile.TABLES
+        else:
+            profile = ConversionProfile.TEXT
+        return profile, inspection
+    
+    def _get_pdf_converter(self, profile: ConversionProfile) -> DoclingConverter:
+        """In-process converter for a PDF profile - loads models, so call off the event loop"""
+        with self._converters_lock:
+            if profile.value not in self.converters:
+                self.converters[profile.value] = _build_docling_converter(self.profile_options[profile.value])
+            return self.converters[profile.value]
+    
+    def _get_simple_converter(self) -> DoclingConverter:
+        if self._simple_converter is None:
+            self._simple_converter = DoclingConverter(allowed_formats=[InputFormat.DOCX, InputFormat.HTML, InputFormat.MD])
+        return self._simple_converter
+    
+    def shutdown(self) -> None:
+        """Stop the conversion worker pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    async def _run_conversion(
+        self, 
+        file_path: str, 
+        output: str, 
+        profile: ConversionProfile, 
+        page_count: Optional[int] = None,
+        shards: int = 1
+    ) -> str:
+        """Run a conversion off the event loop, in the pool or on a thread, in up to shards page ranges"""
+        if profile == ConversionProfile.SIMPLE:
+            # No models involved, so no need to queue behind PDFs for a worker
+            return await asyncio.to_thread(
+                lambda: _export(self._get_simple_converter().convert(file_path).document, output)
+            )
+        
+        if self._pool is None:
+            return await asyncio.to_thread(
+                lambda: _export(self._get_pdf_converter(profile).convert(file_path).document, output)
+            )
+        
+        page_ranges = self._plan_shards(page_count, shards)
+        try:
+            return await self._run_in_pool(file_path, output, profile, page_ranges)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory) - replace the pool and retry once
+            logger.warning("Docling conversion pool broken, restarting workers")
+            self.shutdown()
+            self._start_pool()
+            return await self._run_in_pool(file_path, output, profile, page_ranges)
+    
+    def _plan_shards(self, page_count: Optional[int], shards: int) -> Optional[List[Tuple[int, int]]]:
+        """Page ranges to convert in parallel, or None to convert the file whole"""
+        if shards < 2 or page_count is None or page_count < self.shard_min_pages:
+            return None
+        return split_page_range(page_count, shards)
+    
+    def _wanted_slots(self, profile: ConversionProfile, page_count: Optional[int]) -> int:
+        """Pool jobs a conversion would submit with the pool to itself"""
+        if self._pool is None or profile == ConversionProfile.SIMPLE:
+            return 1
+        page_ranges = self._plan_shards(page_count, self.max_shards)
+        return len(page_ranges) if page_ranges is not None else 1
+    
+    async def _acquire_slots(self, wanted: int) -> int:
+        """
+        Wait for one conversion slot, then take up to wanted in total from those free
+        
+        Taking the extra slots without waiting means two large PDFs can't
+        deadlock each holding part of what they asked for; a PDF converted
+        while the pool is busy is just split into fewer page ranges.
+        """
+        await self._slots.acquire()
+        held = 1
+        while held < wanted and not self._slots.locked():
+            await self._slots.acquire()
+            held += 1
+        return held
+    
+    async def _run_in_pool(
+        self, 
+        file_path: str, 
+        output: str, 
+        profile: ConversionProfile, 
+        page_ranges: Optional[List[Tuple[int, int]]]
+    ) -> str:
+        """Convert a file in the pool, as one job or as parallel page-range jobs"""
+        loop = asyncio.get_running_loop()
+        if page_ranges is None:
+            return await loop.run_in_executor(self._pool, _convert_in_worker, file_path, output, profile.value)
+        
+        logger.info(f"Converting {file_path} as {len(page_ranges)} page ranges: {page_ranges}")
+        metrics.CONVERSION_SHARDS.inc(len(page_ranges))
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, _convert_in_worker, file_path, output, profile.value, page_range)
+            for page_range in page_ranges
+        ))
+        return merge_shards(parts, output)
+    
+    async def _convert(
+        self, 
+        file_path: str, 
+        output: str, 
+        file_type: Optional[str] = None, 
+        file_extension: Optional[str] = None, 
+        report: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Convert a document to the given output format, using the cache
+        
+        The chosen profile, pre-pass findings and timings are recorded in
+        report when it is given.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        report = report if report is not None else {}
+        
+        start_time = time.perf_counter()
+        profile, inspection = await self._choose_profile(file_path, file_type, file_extension)
+        report.update(inspection, profile=profile.value, inspection_seconds=round(time.perf_counter() - start_time, 4))
+        logger.info(f"Conversion profile for {file_path}: {profile.value} {inspection}")
+        
+        start_time = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            options = {**self._options_fingerprint(profile), "output": output}
+            cache_key = await asyncio.to_thread(ConversionCache.make_key, file_path, options)
+            cached_content = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached_content is not None:
+                logger.info(f"Conversion cache hit for {file_path}")
+                metrics.CONVERSION_CACHE.inc(result="hit")
+                report.update(cached=True, conversion_seconds=round(time.perf_counter() - start_time, 4))
+                return cached_content
+            metrics.CONVERSION_CACHE.inc(result="miss")
+        
+        page_count = inspection.get("page_count")
+        slots = await self._acquire_slots(self._wanted_slots(profile, page_count))
+        try:
+            logger.info(f"Converting document: {file_path}")
+            
+            # Convert the document without blocking the event loop
+            with metrics.CONVERSIONS_IN_PROGRESS.track_in_progress():
+                with metrics.CONVERSION_DURATION.time(profile=profile.value):
+                    content = await self._run_conversion(file_path, output, profile, page_count, shards=slots)
+        finally:
+            for _ in range(slots):
+                self._slots.release()
+        
+        report.update(cached=False, conversion_seconds=round(time.perf_counter() - start_time, 4))
+        
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, content)
+        
+        return content
+    
+    async def convert_document(
+        self, 
+        file_path: str, 
+        file_type: Optional[str] = None, 
+        file_extension: Optional[str] = None, 
+        report: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Convert a document (PDF, DOCX, HTML or Markdown) to Markdown format
         
         Args:
             file_path: Path to the input document
+            file_type: MIME type, used with the extension to pick a profile
+            file_extension: Extension, when the path does not carry one
+            report: Optional dict receiving the chosen profile and timings
             
         Returns:
             Markdown content as string
@@ -40,19 +605,43 @@ class DocumentConverter:
             Exception: If conversion fails
         """
         try:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
+            markdown_content = await self._convert(file_path, "markdown", file_type, file_extension, report)
             
-            logger.info(f"Converting document: {file_path}")
+            logger.info(f"Successfully converted document to markdown ({len(markdown_content)} characters)")
+            return markdown_content
             
-            # Convert the document
-            result = self.converter.convert(file_path)
+        except Exception as e:
+            logger.error(f"Error converting document {file_path}: {str(e)}")
+            raise
+    
+    async def convert_document_blocks(
+        self, 
+        file_path: str, 
+        file_type: Optional[str] = None, 
+        file_extension: Optional[str] = None, 
+        report: Optional[Dict[str, Any]] = None
+    ) -> List[DocumentBlock]:
+        """
+        Convert a document to typed blocks (headings, paragraphs, tables, ...)
+        
+        Args:
+            file_path: Path to the input document
+            file_type: MIME type, used with the extension to pick a profile
+            file_extension: Extension, when the path does not carry one
+            report: Optional dict receiving the chosen profile and timings
             
-            # Extract markdown content
-            markdown_content = result.document.export_to_markdown()
+        Returns:
+            DocumentBlock list in reading order
             
-            logger.info(f"Successfully converted document to markdown ({len(markdown_content)} characters)")
-            return markdown_content
+        Raises:
+            Exception: If conversion fails
+        """
+        try:
+            blocks_json = await self._convert(file_path, "blocks", file_type, file_extension, report)
+            blocks = [DocumentBlock(**block) for block in json.loads(blocks_json)]
+            
+            logger.info(f"Successfully converted document to {len(blocks)} blocks")
+            return blocks
             
         except Exception as e:
             logger.error(f"Error converting document {file_path}: {str(e)}")
@@ -87,8 +676,6 @@ class DocumentConverter:
 
 # Legacy support - keep this for backward compatibility
 if __name__ == "__main__":
-    import asyncio
-    
     async def main():
         source = "E:\\dev\\veriet-f\\Amplified_Intelligence_IP_Pty_Ltd_-_Balance_Sheet_vF.pdf"
         output_filename = "output_document.md"
@@ -99,5 +686,7 @@ if __name__ == "__main__":
             print("Conversion complete.")
         except Exception as e:
             print(f"Error: {e}")
+        finally:
+            converter.shutdown()
     
     asyncio.run(main())
\ No newline at end of file
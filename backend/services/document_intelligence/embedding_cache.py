@@ -0,0 +1,263 @@
+"""
+Persistent embedding cache backed by a memory-mapped float32 array
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from .vectors import is_zero_vector
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Bytes of the sha256 key digest stored with each row
+_KEY_BYTES = 32
+
+def _try_lock(path: str) -> Optional[int]:
+    """Lock a file exclusively without waiting, returning its descriptor, or None if it is held elsewhere"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+class EmbeddingCache:
+    """
+    Cache of embeddings keyed by (embedding_model, normalized text hash)
+
+    Vectors live in a fixed-capacity float32 memmap ({model}-{dim}.f32),
+    each row's key digest in a second memmap ({model}-{dim}.keys), and a
+    JSON sidecar ({model}-{dim}.json) maps keys to rows in LRU order. When
+    the cache is full the least recently used row is overwritten.
+
+    Writes reach disk on flush(), which callers run once flush_due() says
+    enough entries or time have accumulated, and at shutdown; entries put
+    since the last flush are lost if the process dies. A sidecar saved
+    before such a crash may map an evicted key to a row since reused, so
+    on load entries whose row holds another key's digest are dropped.
+
+    Each process holds an exclusive lock on its store for as long as it
+    runs. A process finding {model}-{dim} locked by another uses
+    {model}-{dim}.1, then .2 and so on, so concurrent workers sharing
+    EMBEDDING_CACHE_DIR keep separate stores instead of overwriting each
+    other's rows.
+    """
+
+    def __init__(
+        self,
+        embedding_model: str,
+        embedding_dimension: int,
+        cache_dir: Optional[str] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.embedding_model = embedding_model
+        self.embedding_dimension = embedding_dimension
+        self.cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000")
+        )
+
+        # Flush after this many new entries, or this long after the first unflushed one
+        self.flush_every = int(os.getenv("EMBEDDING_CACHE_FLUSH_EVERY", "1000"))
+        self.flush_interval_seconds = float(os.getenv("EMBEDDING_CACHE_FLUSH_SECONDS", "30"))
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._unflushed = 0
+        self._unflushed_since: Optional[float] = None
+
+        # key -> row in the memmap, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._free_rows: List[int] = []
+        self._lock = threading.Lock()
+        # Serializes index writes, which happen outside the main lock
+        self._flush_lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock_fd: Optional[int] = None
+        base_name = self._lock_store(f"{embedding_model.replace('/', '_')}-{embedding_dimension}")
+        self._vectors_path = os.path.join(self.cache_dir, f"{base_name}.f32")
+        self._keys_path = os.path.join(self.cache_dir, f"{base_name}.keys")
+        self._index_path = os.path.join(self.cache_dir, f"{base_name}.json")
+        self._open()
+
+    def _lock_store(self, base_name: str) -> str:
+        """Lock the first store not held by another process, returning its file name stem"""
+        slot = 0
+        while True:
+            name = base_name if slot == 0 else f"{base_name}.{slot}"
+            self._lock_fd = _try_lock(os.path.join(self.cache_dir, f"{name}.lock"))
+            if self._lock_fd is not None:
+                if slot:
+                    logger.info(f"Embedding cache {base_name} is in use by another process, using {name}")
+                return name
+            slot += 1
+
+    def _open(self) -> None:
+        """Open (or create) the vector store and load its index"""
+        shape = (self.max_entries, self.embedding_dimension)
+        keys_shape = (self.max_entries, _KEY_BYTES)
+
+        reuse = (
+            os.path.exists(self._vectors_path)
+            and os.path.getsize(self._vectors_path) == self.max_entries * self.embedding_dimension * 4
+            and os.path.exists(self._keys_path)
+            and os.path.getsize(self._keys_path) == self.max_entries * _KEY_BYTES
+            and os.path.exists(self._index_path)
+        )
+
+        if reuse:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=shape)
+            self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode="r+", shape=keys_shape)
+            try:
+                with open(self._index_path, "r", encoding="utf-8") as f:
+                    for key, row in json.load(f):
+                        self._index[key] = row
+                self._drop_reused_rows()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Embedding cache index unreadable, starting empty: {str(e)}")
+                self._index.clear()
+        else:
+            # Capacity or dimension changed, or a store from before key digests - start a fresh one
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="w+", shape=shape)
+            self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode="w+", shape=keys_shape)
+
+        used_rows = set(self._index.values())
+        self._free_rows = [row for row in range(self.max_entries - 1, -1, -1) if row not in used_rows]
+
+        logger.info(f"Embedding cache loaded {len(self._index)} entries for {self.embedding_model}")
+
+    def _drop_reused_rows(self) -> None:
+        """Drop index entries whose row was overwritten for another key after the index was saved"""
+        if not self._index:
+            return
+        keys = list(self._index)
+        rows = np.fromiter(self._index.values(), dtype=np.int64, count=len(keys))
+        expected = np.frombuffer(b"".join(bytes.fromhex(key) for key in keys), dtype=np.uint8)
+        matches = (self._keys[rows] == expected.reshape(len(keys), _KEY_BYTES)).all(axis=1)
+        stale = [key for key, match in zip(keys, matches) if not match]
+        for key in stale:
+            del self._index[key]
+        if stale:
+            logger.warning(f"Embedding cache dropped {len(stale)} entries whose rows were reused before a crash")
+
+    def make_key(self, text: str) -> str:
+        """Hash normalized text together with the embedding model"""
+        normalized = _WHITESPACE.sub(" ", text).strip()
+        digest = hashlib.sha256(f"{self.embedding_model}\x00{normalized}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts, None where there is no entry"""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = self.make_key(text)
+                row = self._index.get(key)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+
+                self._index.move_to_end(key)
+                self.hits += 1
+                # Copy, since the row may be reused for another text
+                results.append(np.array(self._vectors[row]))
+        return results
+
+    def put_many(self, texts: List[str], embeddings: List[np.ndarray]) -> int:
+        """Store embeddings for texts, skipping zero-vector fallbacks"""
+        stored = 0
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                if is_zero_vector(embedding) or len(embedding) != self.embedding_dimension:
+                    continue
+
+                key = self.make_key(text)
+                row = self._index.get(key)
+                if row is None:
+                    if self._free_rows:
+                        row = self._free_rows.pop()
+                    else:
+                        _, row = self._index.popitem(last=False)
+                        self.evictions += 1
+                self._index[key] = row
+                self._index.move_to_end(key)
+                # Clear the digest first, so a crash mid-write leaves a row no key matches
+                self._keys[row] = 0
+                self._vectors[row] = np.asarray(embedding, dtype=np.float32)
+                self._keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                stored += 1
+            if stored:
+                self._unflushed += stored
+                if self._unflushed_since is None:
+                    self._unflushed_since = time.monotonic()
+        return stored
+
+    def flush_due(self) -> bool:
+        """Whether enough entries or time have accumulated since the last flush"""
+        if self._unflushed_since is None:
+            return False
+        return (
+            self._unflushed >= self.flush_every
+            or time.monotonic() - self._unflushed_since >= self.flush_interval_seconds
+        )
+
+    def flush(self) -> None:
+        """Persist vectors and the sidecar index to disk"""
+        with self._flush_lock:
+            with self._lock:
+                if self._unflushed_since is None:
+                    return
+                self._vectors.flush()
+                self._keys.flush()
+                entries = list(self._index.items())
+                self._unflushed = 0
+                self._unflushed_since = None
+
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self._index_path)
+
+    def close(self) -> None:
+        """Flush and release the store for other processes"""
+        self.flush()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for health and monitoring"""
+        return {
+            "embedding_model": self.embedding_model,
+            "store": self._vectors_path,
+            "entries": len(self._index),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
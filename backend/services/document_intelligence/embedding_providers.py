@@ -0,0 +1,211 @@
+"""
+Embedding backends: the Gemini API and local CPU models
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google import genai
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingProvider:
+    """
+    Turns batches of texts into float32 vectors
+
+    EmbeddingService adds caching, batching, scheduling and failure
+    handling around a provider, so a provider only runs one batch. model_id
+    is recorded in DocumentChunk.embedding_model for every vector it
+    produces; vectors from different model ids are not comparable.
+    """
+
+    # Short backend name, used in configuration and metric labels
+    backend = ""
+    # Whether requests count against an external rate limit
+    rate_limited = False
+
+    def __init__(self, model_id: str, batch_size: int, max_concurrency: int):
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed one batch, in input order; raises on failure"""
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """Prepare the backend ahead of the first request"""
+
+    def shutdown(self) -> None:
+        """Release threads or models held by the backend"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "model": self.model_id}
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """gemini-embedding-001 through the google-genai async client"""
+
+    backend = "gemini"
+    rate_limited = True
+
+    def __init__(self, genai_client: genai.Client, embedding_model: str = "gemini-embedding-001"):
+        super().__init__(
+            embedding_model,
+            # Gemini accepts up to 100 contents per request
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "100")),
+            max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+        )
+        self.genai_client = genai_client
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        response = await self.genai_client.aio.models.embed_content(
+            model=self.model_id,
+            contents=texts
+        )
+        embeddings = response.embeddings or []
+        if len(embeddings) != len(texts):
+            raise Exception(
+                f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+            )
+        return [np.asarray(embedding.values, dtype=np.float32) for embedding in embeddings]
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    A sentence-transformers model run on CPU in this process
+
+    Requires the backend's local extra, sentence-transformers with ONNX
+    Runtime (uv sync --extra local). With int8 quantization the
+    ONNX runtime loads a pre-quantized model file, and the torch runtime
+    applies dynamic quantization to the linear layers. Batches run on one
+    dedicated thread, so the embedding scheduler decides which batch goes
+    next and queries are not stuck behind a long ingestion backlog.
+
+    Vectors are L2-normalized and zero-padded to output_dimension, the
+    width of the embedding column; padding leaves cosine similarity
+    unchanged. Models of at most EMBEDDING_REDUCED_DIMENSION dimensions fit
+    whole in the reduced column, so the indexed candidate search is exact.
+    """
+
+    backend = "local"
+
+    def __init__(self, output_dimension: int):
+        self.model_name = os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        # onnx or torch
+        self.runtime = os.getenv("EMBEDDING_LOCAL_RUNTIME", "onnx")
+        # int8 or none
+        self.quantization = os.getenv("EMBEDDING_LOCAL_QUANTIZATION", "int8").lower()
+        # Pre-quantized weights shipped with sentence-transformers models; pick the file for the CPU
+        self.onnx_file = os.getenv("EMBEDDING_LOCAL_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+        model_id = f"local:{self.model_name}"
+        if self.quantization == "int8":
+            model_id += ":int8"
+        super().__init__(
+            model_id,
+            batch_size=int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "32")),
+            # Matches the single inference thread
+            max_concurrency=1
+        )
+        self.output_dimension = output_dimension
+
+        self.dimension: Optional[int] = None
+        self.batches = 0
+        self._model: Optional[Any] = None
+        self._load_error: Optional[str] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-embedding")
+
+    def _load_model(self) -> Any:
+        if self._model is None and self._load_error is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                start_time = time.time()
+                model_kwargs = {}
+                if self.runtime == "onnx" and self.quantization == "int8":
+                    model_kwargs["file_name"] = self.onnx_file
+                model = SentenceTransformer(
+                    self.model_name, device="cpu", backend=self.runtime, model_kwargs=model_kwargs or None
+                )
+                if self.runtime == "torch" and self.quantization == "int8":
+                    import torch
+
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+                dimension = model.get_sentence_embedding_dimension()
+                if dimension > self.output_dimension:
+                    raise ValueError(
+                        f"{self.model_name} produces {dimension}-dimensional embeddings, "
+                        f"more than the {self.output_dimension}-dimensional embedding column"
+                    )
+                self._model = model
+                self.dimension = dimension
+                logger.info(
+                    f"Loaded embedding model {self.model_id} ({self.runtime}, {dimension} dimensions) "
+                    f"in {time.time() - start_time:.1f}s"
+                )
+            except ImportError as e:
+                self._load_error = f"{str(e)} - install the backend's local extra (uv sync --extra local)"
+                logger.error(f"Local embedding model unavailable: {self._load_error}")
+            except Exception as e:
+                # Don't retry the load on every batch
+                self._load_error = str(e)
+                logger.error(f"Local embedding model unavailable: {str(e)}")
+        if self._model is None:
+            raise RuntimeError(f"Local embedding model not loaded: {self._load_error}")
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        model = self._load_model()
+        vectors = model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        padded = np.zeros((len(texts), self.output_dimension), dtype=np.float32)
+        padded[:, :vectors.shape[1]] = vectors
+        return padded
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts)
+        self.batches += 1
+        return list(vectors)
+
+    async def warm_up(self) -> None:
+        """Load the model ahead of the first request, logging rather than raising on failure"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._load_model)
+        except RuntimeError:
+            pass
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "runtime": self.runtime,
+            "quantization": self.quantization,
+            "loaded": self._model is not None,
+            "dimension": self.dimension,
+            "batches": self.batches
+        }
+
+def create_embedding_provider(
+    backend: str,
+    output_dimension: int,
+    genai_client: Optional[genai.Client] = None
+) -> EmbeddingProvider:
+    """Build the provider for an EMBEDDING_BACKEND value"""
+    if backend == GeminiEmbeddingProvider.backend:
+        if genai_client is None:
+            raise ValueError("The gemini embedding backend needs a google-genai client")
+        return GeminiEmbeddingProvider(genai_client)
+    if backend == LocalEmbeddingProvider.backend:
+        return LocalEmbeddingProvider(output_dimension)
+    raise ValueError(f"Unknown embedding backend: {backend}")
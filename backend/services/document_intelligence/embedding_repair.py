@@ -0,0 +1,179 @@
+"""
+Background re-embedding of chunks stored without embeddings
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .embedding_scheduler import CircuitBreaker, Priority
+from .embedding_service import EmbeddingService, reduce_embedding
+from .models import DocumentChunk, EmbeddingStatus
+from .storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingRepairWorker:
+    """
+    Re-embeds chunks whose embedding failed during ingestion
+
+    Such chunks are stored with embedding_status 'pending' and no vectors,
+    so search skips them. Every interval the worker fetches the oldest
+    pending chunks in batches, embeds them in the bulk lane of their
+    workspace's embedding backend and writes the vectors back, which also
+    adds them to the in-process index and invalidates cached searches.
+
+    Only the embedding columns of rows that are still pending with the same
+    content_hash are written, so a document reprocessed meanwhile keeps its
+    new chunks. Chunks are left pending while their backend's circuit
+    breaker is open or refuses the batch; when it half-opens, the first
+    repair batch is the probe. Each failed attempt is counted, and chunks
+    reaching EMBEDDING_REPAIR_MAX_ATTEMPTS are marked failed until their
+    document is reprocessed.
+    """
+
+    def __init__(self, storage: StorageService, embedder_for: Callable[[str], EmbeddingService]):
+        self.storage = storage
+        self.embedder_for = embedder_for
+        self.enabled = os.getenv("EMBEDDING_REPAIR_ENABLED", "true").lower() == "true"
+        self.interval_seconds = float(os.getenv("EMBEDDING_REPAIR_INTERVAL_SECONDS", "30"))
+        self.batch_size = int(os.getenv("EMBEDDING_REPAIR_BATCH_SIZE", "200"))
+        # Upper bound on batches per round, so one round can't run indefinitely
+        self.max_batches = int(os.getenv("EMBEDDING_REPAIR_MAX_BATCHES", "50"))
+        self.max_attempts = int(os.getenv("EMBEDDING_REPAIR_MAX_ATTEMPTS", "5"))
+
+        self.repaired = 0
+        self.failed = 0
+        self.deferred = 0
+        # Rows changed by reprocessing while their repair was in flight
+        self.skipped = 0
+        # Chunks that reached max_attempts and were marked failed
+        self.gave_up = 0
+        # Pending chunks as of the last count, None until the first round
+        self.backlog: Optional[int] = None
+        self.last_round_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        metrics.EMBED_PENDING_CHUNKS.set_function(lambda: self.backlog or 0)
+
+    def start(self) -> None:
+        """Start the repair loop - must be called from a running event loop"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="embedding-repair")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.repair_once()
+            except Exception as e:
+                logger.error(f"Error repairing pending embeddings: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def repair_once(self) -> int:
+        """Re-embed pending chunks until none are left or a batch fails, returning how many were repaired"""
+        self.last_round_at = time.time()
+        backlog = await self.storage.count_pending_chunks()
+        if backlog is not None:
+            self.backlog = backlog
+        if not backlog:
+            return 0
+
+        repaired = 0
+        gave_up_total = 0
+        for _ in range(self.max_batches):
+            chunks = await self.storage.get_pending_chunks(self.batch_size)
+            if not chunks:
+                break
+
+            groups: Dict[str, Tuple[EmbeddingService, List[DocumentChunk]]] = {}
+            for chunk in chunks:
+                embedder = self.embedder_for(chunk.workspace_id)
+                groups.setdefault(embedder.backend, (embedder, []))[1].append(chunk)
+
+            ready: List[DocumentChunk] = []
+            failed: List[DocumentChunk] = []
+            deferred = 0
+            for embedder, group in groups.values():
+                if embedder.breaker.state == CircuitBreaker.OPEN:
+                    deferred += len(group)
+                    continue
+
+                embeddings, refused = await embedder.embed_texts_or_defer(
+                    [chunk.chunk_text for chunk in group], priority=Priority.BULK
+                )
+                for chunk, embedding, was_refused in zip(group, embeddings, refused):
+                    if was_refused:
+                        deferred += 1
+                    elif embedding is None:
+                        failed.append(chunk)
+                    else:
+                        chunk.embedding = embedding
+                        chunk.embedding_reduced = reduce_embedding(embedding, embedder.reduced_dimension)
+                        chunk.embedding_model = embedder.embedding_model
+                        chunk.embedding_status = EmbeddingStatus.READY
+                        ready.append(chunk)
+
+            if deferred:
+                logger.info(f"Embedding circuit breaker open, deferring repair of {deferred} pending chunks")
+
+            stored = 0
+            skipped = 0
+            if ready:
+                updated = await self.storage.complete_chunk_embeddings(ready)
+                if updated is None:
+                    # Nothing was written; the chunks stay pending for the next round
+                    deferred += len(ready)
+                else:
+                    stored = len(updated)
+                    skipped = len(ready) - stored
+
+            gave_up = await self.storage.record_chunk_embedding_failures(
+                [chunk.id for chunk in failed], self.max_attempts
+            )
+            if gave_up:
+                logger.warning(
+                    f"Giving up on {gave_up} chunks after {self.max_attempts} failed embedding attempts"
+                )
+
+            repaired += stored
+            gave_up_total += gave_up
+            self.repaired += stored
+            self.failed += len(failed)
+            self.deferred += deferred
+            self.skipped += skipped
+            self.gave_up += gave_up
+            metrics.EMBED_REPAIRED.inc(stored, result="repaired")
+            metrics.EMBED_REPAIRED.inc(len(failed), result="failed")
+            metrics.EMBED_REPAIRED.inc(deferred, result="deferred")
+            metrics.EMBED_REPAIRED.inc(skipped, result="skipped")
+
+            # Deferred chunks stay at the head of the queue and failed chunks
+            # move behind those with fewer attempts; either way wait a round,
+            # so one round spends at most one attempt per chunk
+            if not ready or deferred or failed or len(chunks) < self.batch_size:
+                break
+
+        self.backlog = max(0, backlog - repaired - gave_up_total)
+        if repaired:
+            logger.info(f"Re-embedded {repaired} pending chunks, {self.backlog} left")
+        return repaired
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backlog": self.backlog,
+            "repaired": self.repaired,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "skipped": self.skipped,
+            "gave_up": self.gave_up,
+            "last_round_at": self.last_round_at
+        }
@@ -0,0 +1,277 @@
+"""
+Rate-limit-aware scheduling of embedding API requests
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Scheduling lanes, lower values are served first"""
+    INTERACTIVE = 0
+    BULK = 1
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an embedding API error is a 429 / RESOURCE_EXHAUSTED response"""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+class TokenBucket:
+    """Per-minute budget that refills continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def refill(self, now: float, rate_scale: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60 * rate_scale)
+        self._updated = now
+
+    def seconds_until(self, amount: float, reserve: float, rate_scale: float) -> float:
+        """Seconds until amount can be taken while leaving reserve in the bucket"""
+        # A request larger than the bucket would never fit; let it drain the bucket instead
+        needed = min(amount, max(0.0, self.capacity - reserve)) + reserve - self.level
+        if needed <= 0:
+            return 0.0
+        return needed / (self.capacity / 60 * rate_scale)
+
+class CircuitBreaker:
+    """
+    Stops calling the embedding API after repeated failures
+
+    After failure_threshold consecutive failed batches the breaker opens and
+    requests fail fast for reset_seconds. It then half-opens: one request is
+    let through as a probe, and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, backend: str = "gemini"):
+        self.backend = backend
+        self.failure_threshold = int(os.getenv("EMBEDDING_BREAKER_FAILURES", "5"))
+        self.reset_seconds = float(os.getenv("EMBEDDING_BREAKER_RESET_SECONDS", "30"))
+
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        metrics.EMBED_BREAKER_OPEN.set_function(lambda: 1.0 if self.state == self.OPEN else 0.0, backend=backend)
+
+    @property
+    def state(self) -> str:
+        if self.consecutive_failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        # A probe that never reported back (e.g. cancelled) is replaced after reset_seconds
+        if state == self.HALF_OPEN and (not self._probing or time.monotonic() - self._probe_started > self.reset_seconds):
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+        return False
+
+    def on_success(self) -> None:
+        if self.consecutive_failures >= self.failure_threshold:
+            logger.info(f"Embedding backend {self.backend} recovered, closing circuit breaker")
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._probing or self.consecutive_failures == self.failure_threshold:
+            self.opened += 1
+            logger.warning(
+                f"Embedding backend {self.backend} failed {self.consecutive_failures} times in a row, "
+                f"opening circuit breaker for {self.reset_seconds:g}s"
+            )
+        if self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened
+        }
+
+class EmbeddingScheduler:
+    """
+    Shared gate for embedding API requests
+
+    Requests wait in two priority lanes: interactive query embeddings are
+    always dispatched before bulk ingestion batches. A request is sent once
+    a concurrency slot is free and both the requests-per-minute and
+    tokens-per-minute buckets can cover it. Bulk requests must leave a
+    reserve in each bucket for interactive ones, so backfills cannot
+    exhaust the quota searches need.
+
+    A 429 pauses dispatch and halves the effective rate; each success then
+    recovers it gradually. Backends without rate limits (local models) only
+    get the priority lanes and the concurrency limit.
+    """
+
+    def __init__(self, max_concurrency: int, backend: str = "gemini", rate_limited: bool = True):
+        self.max_concurrency = max_concurrency
+        self.backend = backend
+        # 0 disables a limit
+        self.requests_per_minute = float(os.getenv("EMBEDDING_RPM_LIMIT", "3000")) if rate_limited else 0.0
+        self.tokens_per_minute = float(os.getenv("EMBEDDING_TPM_LIMIT", "1000000")) if rate_limited else 0.0
+        # Share of each bucket bulk requests may not use
+        self.interactive_reserve = float(os.getenv("EMBEDDING_INTERACTIVE_RESERVE", "0.1"))
+        self.chars_per_token = float(os.getenv("EMBEDDING_CHARS_PER_TOKEN", "4"))
+        self.rate_limit_backoff_seconds = float(os.getenv("EMBEDDING_RATE_LIMIT_BACKOFF_SECONDS", "2"))
+        self.min_rate_scale = float(os.getenv("EMBEDDING_MIN_RATE_SCALE", "0.1"))
+        self.rate_recovery_step = float(os.getenv("EMBEDDING_RATE_RECOVERY_STEP", "0.02"))
+
+        self._buckets: List[Tuple[TokenBucket, str]] = []
+        if self.requests_per_minute > 0:
+            self._buckets.append((TokenBucket(self.requests_per_minute), "requests"))
+        if self.tokens_per_minute > 0:
+            self._buckets.append((TokenBucket(self.tokens_per_minute), "tokens"))
+
+        self.rate_scale = 1.0
+        self.rate_limited = 0
+        self._paused_until = 0.0
+        self._in_flight = 0
+        # (priority, arrival order) of waiting requests; the head is served next
+        self._waiting: List[Tuple[int, int]] = []
+        self._order = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+
+        # Per lane: (requests dispatched, total seconds waited)
+        self._waits: Dict[Priority, List[float]] = {priority: [0, 0.0] for priority in Priority}
+        for priority in Priority:
+            metrics.EMBED_QUEUE_DEPTH.set_function(
+                lambda priority=priority: self.depth(priority), backend=backend, lane=priority.name.lower()
+            )
+        metrics.EMBED_RATE_SCALE.set_function(lambda: self.rate_scale, backend=backend)
+
+    def estimate_tokens(self, texts: List[str]) -> int:
+        return int(sum(len(text) for text in texts) / self.chars_per_token) + 1
+
+    def depth(self, priority: Optional[Priority] = None) -> int:
+        return sum(1 for waiting_priority, _ in self._waiting if priority is None or waiting_priority == priority)
+
+    def _seconds_until_ready(self, priority: Priority, tokens: int) -> float:
+        now = time.monotonic()
+        delay = max(0.0, self._paused_until - now)
+        for bucket, kind in self._buckets:
+            bucket.refill(now, self.rate_scale)
+            reserve = bucket.capacity * self.interactive_reserve if priority == Priority.BULK else 0.0
+            amount = 1 if kind == "requests" else tokens
+            delay = max(delay, bucket.seconds_until(amount, reserve, self.rate_scale))
+        return delay
+
+    def _take(self, tokens: int) -> None:
+        for bucket, kind in self._buckets:
+            bucket.level -= min(bucket.level, 1 if kind == "requests" else tokens)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, tokens: int) -> AsyncIterator[None]:
+        """Wait for this request's turn, rate budget and a concurrency slot"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        condition = self._condition
+
+        ticket = (int(priority), next(self._order))
+        start = time.perf_counter()
+        async with condition:
+            heapq.heappush(self._waiting, ticket)
+            # A new head of the queue must be re-evaluated by the others
+            condition.notify_all()
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket and self._in_flight < self.max_concurrency:
+                        timeout = self._seconds_until_ready(priority, tokens)
+                        if timeout <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self._take(tokens)
+            self._in_flight += 1
+            condition.notify_all()
+
+        waited = time.perf_counter() - start
+        metrics.EMBED_QUEUE_WAIT.observe(waited, backend=self.backend, lane=priority.name.lower())
+        self._waits[priority][0] += 1
+        self._waits[priority][1] += waited
+
+        try:
+            yield
+        finally:
+            async with condition:
+                self._in_flight -= 1
+                condition.notify_all()
+
+    def on_success(self) -> None:
+        self.rate_scale = min(1.0, self.rate_scale + self.rate_recovery_step)
+
+    def on_rate_limited(self, attempt: int = 0) -> float:
+        """Back off after a 429, returning the pause in seconds"""
+        self.rate_limited += 1
+        metrics.EMBED_RATE_LIMITED.inc(backend=self.backend)
+        self.rate_scale = max(self.min_rate_scale, self.rate_scale / 2)
+        pause = self.rate_limit_backoff_seconds * 2 ** attempt
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        # The server says the quota is spent: keep only the interactive reserve
+        for bucket, _ in self._buckets:
+            bucket.level = min(bucket.level, bucket.capacity * self.interactive_reserve)
+        logger.warning(f"Embedding API rate limited, pausing {pause:.1f}s at {self.rate_scale:.0%} of the configured rate")
+        return pause
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "rate_scale": round(self.rate_scale, 3),
+            "rate_limited": self.rate_limited,
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "in_flight": self._in_flight,
+            "lanes": {
+                priority.name.lower(): {
+                    "waiting": self.depth(priority),
+                    "dispatched": int(count),
+                    "mean_wait_ms": round(total / count * 1000, 2) if count else 0.0
+                }
+                for priority, (count, total) in self._waits.items()
+            }
+        }
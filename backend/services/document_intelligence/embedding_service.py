@@ -0,0 +1,284 @@
+"""
+Embedding service for batched, concurrent embedding generation
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import metrics
+from .embedding_cache import EmbeddingCache
+from .embedding_providers import EmbeddingProvider
+from .embedding_scheduler import CircuitBreaker, EmbeddingScheduler, Priority, is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+def reduce_embedding(embedding: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Reduce an embedding to its first `dimension` values, L2-normalized
+
+    gemini-embedding-001 is trained with Matryoshka representation learning,
+    so the normalized prefix matches what output_dimensionality would return
+    without a second API call.
+    """
+    prefix = np.asarray(embedding, dtype=np.float32)[:dimension]
+    norm = np.linalg.norm(prefix)
+    if norm == 0:
+        return prefix.copy()
+    return prefix / norm
+
+class EmbeddingService:
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        embedding_dimension: int = 3072,
+        scheduler: Optional[EmbeddingScheduler] = None
+    ):
+        self.provider = provider
+        self.backend = provider.backend
+        # Recorded on every chunk this service embeds
+        self.embedding_model = provider.model_id
+        self.embedding_dimension = embedding_dimension
+        # Size of the indexed embedding_reduced column
+        self.reduced_dimension = int(os.getenv("EMBEDDING_REDUCED_DIMENSION", "768"))
+
+        # Batching configuration comes from the backend
+        self.batch_size = provider.batch_size
+        self.max_concurrency = provider.max_concurrency
+        # Retries of a batch rejected with 429, after the scheduler's backoff
+        self.max_rate_limit_retries = int(os.getenv("EMBEDDING_RATE_LIMIT_RETRIES", "3"))
+
+        # Limits requests in flight and per minute, serving queries before ingestion
+        self.scheduler = scheduler or EmbeddingScheduler(
+            self.max_concurrency, backend=self.backend, rate_limited=provider.rate_limited
+        )
+        # Fails requests fast while the backend is down, instead of queueing them
+        self.breaker = CircuitBreaker(self.backend)
+
+        # Ingestion requests from concurrent documents are merged into shared
+        # batches; a partial batch waits this long for more texts
+        self.coalesce_seconds = float(os.getenv("EMBEDDING_COALESCE_MS", "20")) / 1000
+        self._coalesce_pending: List[Tuple[str, asyncio.Future]] = []
+        self._coalesce_timer: Optional[asyncio.TimerHandle] = None
+        self._coalesce_tasks: Set[asyncio.Task] = set()
+
+        # Local cache so identical chunk text is only embedded once
+        cache_enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(self.embedding_model, embedding_dimension) if cache_enabled else None
+        )
+
+    async def embed_texts(
+        self,
+        texts: List[str],
+        coalesce: bool = False,
+        priority: Priority = Priority.BULK
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Generate embeddings for a list of texts
+
+        Texts are grouped into multi-content requests and up to
+        max_concurrency batches are sent at once. With coalesce=True, texts
+        share batches with other concurrent coalesced calls, which fills
+        batches when many small documents are ingested at once. Requests are
+        scheduled in the given priority lane. The returned float32 vectors
+        are in the same order as the input texts; texts whose request failed,
+        or was refused by the open circuit breaker, get None.
+        """
+        if not texts:
+            return []
+
+        with metrics.EMBED_CALL_DURATION.time(backend=self.backend):
+            return await self._embed_texts(texts, coalesce, priority)
+
+    async def _embed_texts(self, texts: List[str], coalesce: bool, priority: Priority) -> List[Optional[np.ndarray]]:
+        if self.cache is not None:
+            results = self.cache.get_many(texts)
+        else:
+            results = [None] * len(texts)
+
+        # Embed each distinct uncached text once, even if it repeats
+        pending: Dict[str, List[int]] = {}
+        for i, (text, embedding) in enumerate(zip(texts, results)):
+            if embedding is None:
+                pending.setdefault(text, []).append(i)
+
+        cached_count = len(texts) - sum(len(indexes) for indexes in pending.values())
+        if self.cache is not None:
+            metrics.EMBED_CACHE.inc(cached_count, result="hit")
+            metrics.EMBED_CACHE.inc(len(texts) - cached_count, result="miss")
+        if cached_count:
+            logger.info(f"Embedding cache hit for {cached_count}/{len(texts)} texts")
+
+        if pending:
+            missing = list(pending)
+            if coalesce and self.coalesce_seconds > 0:
+                embeddings = await self._embed_coalesced(missing)
+            else:
+                embeddings = await self._embed_uncached(missing, priority)
+
+            for text, embedding in zip(missing, embeddings):
+                for i in pending[text]:
+                    results[i] = embedding
+
+            if self.cache is not None:
+                self.cache.put_many(missing, embeddings)
+                if self.cache.flush_due():
+                    await asyncio.to_thread(self.cache.flush)
+
+        return results
+
+    async def _embed_uncached(self, texts: List[str], priority: Priority) -> List[Optional[np.ndarray]]:
+        """Embed texts through the backend in concurrent batches"""
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        logger.info(
+            f"Embedding {len(texts)} texts in {len(batches)} batches "
+            f"(batch_size={self.batch_size}, concurrency={self.max_concurrency})"
+        )
+
+        # gather preserves input order, so results line up with chunk_index
+        batch_results = await asyncio.gather(
+            *(self._embed_batch(batch, priority) for batch in batches)
+        )
+        return [embedding for batch in batch_results for embedding in batch]
+
+    async def _embed_coalesced(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Queue texts into shared batches and wait for their embeddings"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        self._coalesce_pending.extend(zip(texts, futures))
+
+        # Full batches go out immediately, a remainder waits for the timer
+        while len(self._coalesce_pending) >= self.batch_size:
+            self._send_coalesced(self._coalesce_pending[:self.batch_size])
+            self._coalesce_pending = self._coalesce_pending[self.batch_size:]
+
+        if self._coalesce_pending and self._coalesce_timer is None:
+            self._coalesce_timer = loop.call_later(self.coalesce_seconds, self._flush_coalesced)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush_coalesced(self) -> None:
+        """Send whatever is waiting when the coalescing window closes"""
+        self._coalesce_timer = None
+        pending, self._coalesce_pending = self._coalesce_pending, []
+        for i in range(0, len(pending), self.batch_size):
+            self._send_coalesced(pending[i:i + self.batch_size])
+
+    def _send_coalesced(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        async def send() -> None:
+            try:
+                embeddings = await self._embed_batch([text for text, _ in batch], Priority.BULK)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+        task = asyncio.create_task(send())
+        # Hold a reference so the task isn't garbage collected mid-flight
+        self._coalesce_tasks.add(task)
+        task.add_done_callback(self._coalesce_tasks.discard)
+
+    async def embed_texts_or_defer(
+        self,
+        texts: List[str],
+        priority: Priority = Priority.BULK
+    ) -> Tuple[List[Optional[np.ndarray]], List[bool]]:
+        """
+        Embed texts, also reporting which were refused by the circuit breaker
+
+        Returns the embeddings (None where missing) and, per text, whether it
+        was refused rather than failed. Refused texts were never sent, so
+        they should not count against a retry budget. Bypasses the cache and
+        coalescing.
+        """
+        if not texts:
+            return [], []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._try_embed_batch(batch, priority) for batch in batches))
+        embeddings = [embedding for batch_embeddings, _ in results for embedding in batch_embeddings]
+        refused = [
+            batch_refused
+            for (batch_embeddings, batch_refused) in results
+            for _ in batch_embeddings
+        ]
+        return embeddings, refused
+
+    async def _embed_batch(self, texts: List[str], priority: Priority) -> List[Optional[np.ndarray]]:
+        embeddings, _ = await self._try_embed_batch(texts, priority)
+        return embeddings
+
+    async def _try_embed_batch(
+        self,
+        texts: List[str],
+        priority: Priority
+    ) -> Tuple[List[Optional[np.ndarray]], bool]:
+        """
+        Embed a single batch with the backend, once the scheduler lets it through
+
+        Returns the embeddings, or Nones if the batch failed, and whether the
+        circuit breaker refused to send it.
+        """
+        if not self.breaker.allow():
+            metrics.EMBED_FAILED_TEXTS.inc(len(texts), backend=self.backend)
+            return [None] * len(texts), True
+
+        tokens = self.scheduler.estimate_tokens(texts)
+        try:
+            for attempt in range(self.max_rate_limit_retries + 1):
+                async with self.scheduler.slot(priority, tokens):
+                    try:
+                        embeddings = await self._request_embeddings(texts)
+                    except Exception as e:
+                        if not is_rate_limit_error(e) or attempt == self.max_rate_limit_retries:
+                            raise
+                        # The scheduler holds back every lane until the pause ends
+                        self.scheduler.on_rate_limited(attempt)
+                        continue
+
+                self.scheduler.on_success()
+                self.breaker.on_success()
+                return embeddings, False
+
+        except Exception as e:
+            logger.error(f"Error generating embeddings for batch of {len(texts)}: {str(e)}")
+            metrics.EMBED_FAILED_TEXTS.inc(len(texts), backend=self.backend)
+            self.breaker.on_failure()
+            # Callers store these chunks as pending for the repair worker
+            return [None] * len(texts), False
+
+    async def _request_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        metrics.EMBED_TEXTS.inc(len(texts), backend=self.backend)
+        metrics.EMBED_BATCH_SIZE.observe(len(texts), backend=self.backend)
+        with (
+            metrics.EMBED_REQUESTS_IN_PROGRESS.track_in_progress(backend=self.backend),
+            metrics.EMBED_BATCH_DURATION.time(backend=self.backend)
+        ):
+            return await self.provider.embed(texts)
+
+    def shutdown(self) -> None:
+        """Persist cached embeddings not yet flushed and release the backend"""
+        if self.cache is not None:
+            self.cache.close()
+        self.provider.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.provider.stats(),
+            "batch_size": self.batch_size,
+            "max_concurrency": self.max_concurrency,
+            "scheduler": self.scheduler.stats(),
+            "breaker": self.breaker.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
@@ -0,0 +1,158 @@
+"""
+Ingestion job queue for asynchronous document processing
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from . import metrics
+from .models import (
+    IngestionJob,
+    JobStatus,
+    ProcessDocumentRequest,
+    ProcessDocumentResponse,
+    ProcessingStage,
+    ProcessingStatus
+)
+
+logger = logging.getLogger(__name__)
+
+# Approximate share of the pipeline completed when each stage starts
+STAGE_PROGRESS = {
+    ProcessingStage.QUEUED: 0.0,
+    ProcessingStage.CONVERTING: 0.05,
+    ProcessingStage.CHUNKING: 0.4,
+    ProcessingStage.EMBEDDING: 0.5,
+    ProcessingStage.STORING: 0.85,
+    ProcessingStage.DONE: 1.0
+}
+
+ProcessFn = Callable[[ProcessDocumentRequest, Optional[IngestionJob]], Awaitable[ProcessDocumentResponse]]
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more jobs"""
+
+class IngestionJobQueue:
+    def __init__(self, process_fn: ProcessFn):
+        self.process_fn = process_fn
+
+        self.num_workers = int(os.getenv("INGEST_WORKERS", "4"))
+        self.max_queue_size = int(os.getenv("INGEST_MAX_QUEUE", "1000"))
+        # Finished jobs stay queryable for this long
+        self.retention_seconds = int(os.getenv("INGEST_JOB_RETENTION_SECONDS", "86400"))
+
+        self.jobs: Dict[UUID, IngestionJob] = {}
+        self._finished_at: Dict[UUID, float] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the worker tasks - must be called from a running event loop"""
+        if self._workers:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ingest-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} ingestion workers")
+
+    async def stop(self) -> None:
+        """Cancel worker tasks"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, request: ProcessDocumentRequest) -> IngestionJob:
+        """Enqueue a document for processing and return its job"""
+        if self._queue is None:
+            raise RuntimeError("Ingestion job queue has not been started")
+
+        self._prune_finished()
+
+        job = IngestionJob(
+            job_id=uuid4(),
+            document_id=request.metadata.document_id,
+            created_at=datetime.now(timezone.utc)
+        )
+
+        try:
+            self._queue.put_nowait((job, request))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Ingestion queue is full ({self.max_queue_size} jobs)")
+
+        self.jobs[job.job_id] = job
+        logger.info(f"Queued job {job.job_id} for document {job.document_id} (depth {self.depth})")
+        return job
+
+    def submit_many(self, requests: List[ProcessDocumentRequest]) -> List[IngestionJob]:
+        """
+        Enqueue documents all together or not at all
+
+        Raises QueueFullError without queueing anything if the queue lacks
+        room for every request. Nothing awaits between the check and the
+        puts, so concurrent submitters can't take the room in between.
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingestion job queue has not been started")
+
+        available = self.max_queue_size - self.depth
+        if len(requests) > available:
+            raise QueueFullError(f"Ingestion queue has room for {available} jobs, {len(requests)} requested")
+        return [self.submit(request) for request in requests]
+
+    def get(self, job_id: UUID) -> Optional[IngestionJob]:
+        """Look up a job by id"""
+        return self.jobs.get(job_id)
+
+    def _prune_finished(self) -> None:
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id in [job_id for job_id, finished in self._finished_at.items() if finished < cutoff]:
+            self.jobs.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+
+    async def _worker(self, worker_id: int) -> None:
+        """Drain the queue, processing one document at a time"""
+        while True:
+            job, request = await self._queue.get()
+            metrics.INGEST_WORKERS_BUSY.inc()
+            try:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                logger.info(f"Worker {worker_id} started job {job.job_id}")
+
+                result = await self.process_fn(request, job)
+
+                job.chunks_created = result.chunks_created
+                job.message = result.message
+                if result.status == ProcessingStatus.PROCESSED:
+                    job.status = JobStatus.COMPLETED
+                    job.stage = ProcessingStage.DONE
+                    job.progress = 1.0
+                else:
+                    job.status = JobStatus.FAILED
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {str(e)}")
+                job.status = JobStatus.FAILED
+                job.message = str(e)
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                self._finished_at[job.job_id] = time.monotonic()
+                metrics.INGEST_WORKERS_BUSY.dec()
+                self._queue.task_done()
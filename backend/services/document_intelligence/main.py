@@ -2,16 +2,27 @@
 FastAPI application for Document Intelligence Service
 """
 
+import json
 import logging
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from uuid import UUID
+import numpy as np
 import uvicorn
 
 from .service import DocumentIntelligenceService
+from .job_queue import QueueFullError
+from .bulk_ingest import load_manifest
+from .storage_service import resolve_chunk_fields
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
 from .models import (
+    BulkIngestRequest,
+    BulkIngestResponse,
+    IngestionJob,
+    ProcessDocumentJobResponse,
     ProcessDocumentRequest,
-    ProcessDocumentResponse,
     SearchRequest,
     SearchResponse
 )
@@ -43,6 +54,16 @@ app.add_middleware(
 # Initialize service
 intelligence_service = DocumentIntelligenceService()
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background ingestion workers"""
+    intelligence_service.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and pools"""
+    await intelligence_service.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -62,32 +83,117 @@ async def health_check():
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Service unhealthy")
 
-@app.post("/documents/process", response_model=ProcessDocumentResponse)
-async def process_document(
-    request: ProcessDocumentRequest,
-    background_tasks: BackgroundTasks
-):
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency, throughput and utilization metrics in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/documents/process", response_model=ProcessDocumentJobResponse, status_code=202)
+async def process_document(request: ProcessDocumentRequest):
     """
-    Process a document through the complete intelligence pipeline
+    Queue a document for processing through the complete intelligence pipeline
     
-    This endpoint:
+    Returns immediately with a job id. A background worker then:
     1. Converts the document (PDF) to Markdown
     2. Chunks the content for optimal retrieval
     3. Generates embeddings for each chunk
     4. Stores chunks with embeddings in vector database
+    
+    Poll /jobs/{job_id} for per-stage progress.
     """
     try:
         logger.info(f"Received document processing request for {request.metadata.document_id}")
         
-        # Process document
-        result = await intelligence_service.process_document(request)
+        # Queue document for background processing
+        job = intelligence_service.job_queue.submit(request)
         
-        return result
+        return ProcessDocumentJobResponse(
+            job_id=job.job_id,
+            document_id=job.document_id,
+            status=job.status,
+            status_url=f"/jobs/{job.job_id}"
+        )
         
+    except QueueFullError as e:
+        logger.warning(f"Rejected document processing request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Document processing failed: {str(e)}")
+        logger.error(f"Failed to queue document processing: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
+@app.post("/documents/bulk", response_model=BulkIngestResponse, status_code=202)
+async def bulk_process_documents(request: BulkIngestRequest):
+    """
+    Queue many documents for processing in one call
+    
+    Documents come from the request body, from a server-side manifest
+    (directory or JSONL file), or both. The batch is accepted only if the
+    ingestion queue has room for all of it; each document gets its own job.
+    Documents whose record could not be created are not queued and are
+    listed in failed_document_ids.
+    """
+    try:
+        requests = list(request.requests)
+        if request.manifest_path:
+            requests.extend(load_manifest(request.manifest_path, request.workspace_id, request.user_id))
+        
+        if not requests:
+            raise HTTPException(status_code=400, detail="No documents to process")
+        
+        job_queue = intelligence_service.job_queue
+        # Fail fast before creating records; submit_many checks again atomically
+        available = job_queue.max_queue_size - job_queue.depth
+        if len(requests) > available:
+            raise QueueFullError(f"Ingestion queue has room for {available} jobs, {len(requests)} requested")
+        
+        logger.info(f"Received bulk processing request for {len(requests)} documents")
+        
+        written = await intelligence_service.storage.upsert_documents(
+            [document_request.metadata for document_request in requests]
+        )
+        # Jobs for documents without a record would fail on their first status update
+        failed_document_ids = [
+            document_request.metadata.document_id
+            for document_request in requests
+            if document_request.metadata.document_id not in written
+        ]
+        if failed_document_ids:
+            logger.warning(f"Could not create document records for {len(failed_document_ids)} documents")
+        
+        jobs = [
+            ProcessDocumentJobResponse(
+                job_id=job.job_id,
+                document_id=job.document_id,
+                status=job.status,
+                status_url=f"/jobs/{job.job_id}"
+            )
+            for job in job_queue.submit_many([
+                document_request for document_request in requests
+                if document_request.metadata.document_id in written
+            ])
+        ]
+        
+        return BulkIngestResponse(jobs=jobs, total_jobs=len(jobs), failed_document_ids=failed_document_ids)
+        
+    except HTTPException:
+        raise
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest: {str(e)}")
+    except QueueFullError as e:
+        logger.warning(f"Rejected bulk processing request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue bulk processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Bulk processing failed: {str(e)}")
+
+@app.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_job_status(job_id: UUID):
+    """Get status and per-stage progress of an ingestion job"""
+    job = intelligence_service.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
 @app.post("/documents/search", response_model=SearchResponse)
 async def search_documents(request: SearchRequest):
     """
@@ -95,8 +201,9 @@ async def search_documents(request: SearchRequest):
     
     This endpoint:
     1. Generates embedding for the search query
-    2. Performs vector similarity search
-    3. Returns ranked results with similarity scores
+    2. Performs vector similarity search (plus full-text search when
+       search_mode is "hybrid", merged by reciprocal rank fusion)
+    3. Returns ranked results with similarity scores and per-stage timings
     """
     try:
         logger.info(f"Received search request: '{request.query}' for workspace {request.workspace_id}")
@@ -110,15 +217,54 @@ async def search_documents(request: SearchRequest):
         logger.error(f"Search failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+def _serialize_chunk_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a raw chunk row JSON-serializable (vectors become lists)"""
+    return {
+        key: value.tolist() if isinstance(value, np.ndarray) else value
+        for key, value in row.items()
+    }
+
 @app.get("/documents/{document_id}/chunks")
-async def get_document_chunks(document_id: UUID):
-    """Get all chunks for a specific document"""
+async def get_document_chunks(
+    document_id: UUID,
+    cursor: int = Query(-1, description="Return chunks with chunk_index greater than this"),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, or * for all (embeddings are excluded by default)"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Get the chunks of a document, paginated by chunk_index
+    
+    format=json returns one page and a next_cursor (null on the last page).
+    format=ndjson streams every chunk after cursor, one JSON object per
+    line, fetching limit rows at a time.
+    """
+    try:
+        columns = resolve_chunk_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    storage = intelligence_service.storage
+    
+    if format == "ndjson":
+        async def stream_rows() -> AsyncIterator[str]:
+            try:
+                async for rows in storage.iter_document_chunk_pages(document_id, cursor, columns, limit):
+                    yield "".join(json.dumps(_serialize_chunk_row(row)) + "\n" for row in rows)
+            except Exception as e:
+                # Headers are already sent, so end the stream with an error line
+                logger.error(f"Failed to stream chunks for document {document_id}: {str(e)}")
+                yield json.dumps({"error": f"Failed to get chunks: {str(e)}"}) + "\n"
+        
+        return StreamingResponse(stream_rows(), media_type="application/x-ndjson")
+    
     try:
-        chunks = await intelligence_service.get_document_chunks(document_id)
+        rows = await storage.get_document_chunk_page(document_id, cursor, limit, columns)
         return {
             "document_id": document_id,
-            "chunks": chunks,
-            "total_chunks": len(chunks)
+            "chunks": [_serialize_chunk_row(row) for row in rows],
+            "count": len(rows),
+            "next_cursor": rows[-1]["chunk_index"] if len(rows) == limit else None
         }
         
     except Exception as e:
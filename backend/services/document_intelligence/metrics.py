@@ -0,0 +1,243 @@
+"""
+Prometheus-style metrics for the Document Intelligence Service
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format by the /metrics endpoint.
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from fast cache hits to multi-minute conversions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry: List["_Metric"] = []
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """Read the value from function whenever metrics are rendered"""
+        with self._lock:
+            self._callbacks[self._key(labels)] = function
+
+    @contextmanager
+    def track_in_progress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = list(self._callbacks.items())
+        for key, function in callbacks:
+            try:
+                values[key] = float(function())
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: (bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+# Ingestion pipeline
+STAGE_DURATION = Histogram(
+    "di_stage_duration_seconds", "Time spent in a pipeline stage, per stage run", ["stage"]
+)
+STAGE_WAIT = Histogram(
+    "di_stage_wait_seconds", "Time waiting for a pipeline stage concurrency slot", ["stage"]
+)
+DOCUMENT_DURATION = Histogram(
+    "di_document_duration_seconds", "End-to-end document processing time", ["status"]
+)
+DOCUMENTS = Counter("di_documents_total", "Documents processed", ["status"])
+CHUNKS = Counter("di_chunks_total", "Chunks produced by chunking", ["strategy"])
+CHUNK_TOKENS = Counter("di_chunk_tokens_total", "Tokens in produced chunks", ["strategy"])
+CHUNKS_UNCHANGED = Counter("di_chunks_unchanged_total", "Chunks skipped by incremental reprocessing")
+INGEST_QUEUE_DEPTH = Gauge("di_ingest_queue_depth", "Ingestion jobs waiting for a worker")
+INGEST_WORKERS_BUSY = Gauge("di_ingest_workers_busy", "Ingestion workers processing a job")
+
+# Conversion
+CONVERSIONS_IN_PROGRESS = Gauge("di_conversions_in_progress", "Documents being converted")
+CONVERSION_POOL_SIZE = Gauge("di_conversion_pool_size", "Conversion worker processes (0 = in-process)")
+CONVERSION_CACHE = Counter("di_conversion_cache_total", "Conversion cache lookups", ["result"])
+CONVERSION_SHARDS = Counter("di_conversion_shards_total", "Page ranges of large PDFs converted in parallel")
+CONVERSION_DURATION = Histogram(
+    "di_conversion_duration_seconds", "Conversion time excluding cache hits, per conversion profile", ["profile"]
+)
+
+# Embedding, per backend (gemini or local)
+EMBED_BATCH_DURATION = Histogram(
+    "di_embed_batch_duration_seconds", "Latency of one embedding API request or local batch", ["backend"]
+)
+EMBED_CALL_DURATION = Histogram("di_embed_call_duration_seconds", "Latency of one embed_texts call", ["backend"])
+EMBED_BATCH_SIZE = Histogram(
+    "di_embed_batch_size", "Texts per embedding request", ["backend"], buckets=(1, 5, 10, 25, 50, 75, 100, 250)
+)
+EMBED_REQUESTS_IN_PROGRESS = Gauge("di_embed_requests_in_progress", "Embedding requests in flight", ["backend"])
+EMBED_CONCURRENCY_LIMIT = Gauge("di_embed_concurrency_limit", "Maximum embedding requests in flight", ["backend"])
+EMBED_TEXTS = Counter("di_embed_texts_total", "Texts sent to an embedding backend", ["backend"])
+EMBED_CACHE = Counter("di_embedding_cache_total", "Embedding cache lookups", ["result"])
+EMBED_QUEUE_WAIT = Histogram(
+    "di_embed_queue_wait_seconds", "Time an embedding request waited for rate budget and a slot", ["backend", "lane"]
+)
+EMBED_QUEUE_DEPTH = Gauge("di_embed_queue_depth", "Embedding requests waiting to be sent", ["backend", "lane"])
+EMBED_RATE_LIMITED = Counter("di_embed_rate_limited_total", "Embedding requests rejected with 429", ["backend"])
+EMBED_RATE_SCALE = Gauge(
+    "di_embed_rate_scale", "Share of the configured embedding rate limits in use after 429 backoff", ["backend"]
+)
+EMBED_FAILED_TEXTS = Counter(
+    "di_embed_failed_texts_total", "Texts left without an embedding because the request failed or was refused", ["backend"]
+)
+EMBED_BREAKER_OPEN = Gauge("di_embed_breaker_open", "1 while the embedding circuit breaker is open", ["backend"])
+EMBED_PENDING_CHUNKS = Gauge("di_embed_pending_chunks", "Stored chunks waiting to be re-embedded, as of the last repair round")
+EMBED_REPAIRED = Counter("di_embed_repaired_chunks_total", "Pending chunks handled by the repair worker, by result", ["result"])
+
+# Storage
+STORE_BATCH_DURATION = Histogram("di_store_batch_duration_seconds", "Latency of one chunk upsert request")
+STORE_ROWS = Counter("di_store_rows_total", "Chunk rows upserted")
+STORE_RETRIES = Counter("di_store_retries_total", "Chunk upsert batches retried")
+STORE_FAILURES = Counter("di_store_failures_total", "Chunk upsert batches that failed after all retries")
+STORAGE_REQUESTS_IN_PROGRESS = Gauge("di_storage_requests_in_progress", "Supabase HTTP requests in flight")
+STORAGE_POOL_SIZE = Gauge("di_storage_pool_size", "Supabase HTTP connection pool size")
+SEARCH_RPC_DURATION = Histogram(
+    "di_search_rpc_duration_seconds", "Latency of a search database function", ["function"]
+)
+
+# Search
+SEARCH_DURATION = Histogram("di_search_duration_seconds", "End-to-end search latency", ["mode"])
+SEARCH_STAGE_DURATION = Histogram("di_search_stage_duration_seconds", "Time spent in a search stage", ["stage"])
+SEARCH_CACHE = Counter("di_search_cache_total", "Search result cache lookups", ["result"])
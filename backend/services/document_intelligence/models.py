@@ -3,11 +3,13 @@ Pydantic models for the Document Intelligence Service
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict
 from uuid import UUID
 from datetime import datetime
 from enum import Enum
 
+from .vectors import Vector
+
 class ChunkType(str, Enum):
     TEXT = "text"
     TABLE = "table"
@@ -20,6 +22,41 @@ class ProcessingStatus(str, Enum):
     PROCESSED = "processed"
     FAILED = "failed"
 
+class ProcessingStage(str, Enum):
+    QUEUED = "queued"
+    CONVERTING = "converting"
+    CHUNKING = "chunking"
+    EMBEDDING = "embedding"
+    STORING = "storing"
+    DONE = "done"
+
+class ConversionProfile(str, Enum):
+    # Born-digital PDF: text layer only, no OCR or table model
+    TEXT = "text"
+    # Born-digital PDF with tables: FAST table structure, no OCR
+    TABLES = "tables"
+    # Scanned PDF: OCR and ACCURATE table structure
+    FULL = "full"
+    # DOCX, HTML or Markdown: declarative converter, no models
+    SIMPLE = "simple"
+
+class EmbeddingStatus(str, Enum):
+    READY = "ready"
+    # Embedding request failed; queued for the repair worker
+    PENDING = "pending"
+    # Repair gave up after EMBEDDING_REPAIR_MAX_ATTEMPTS; retried on reprocessing
+    FAILED = "failed"
+
+class SearchMode(str, Enum):
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class DocumentMetadata(BaseModel):
     document_id: UUID
     workspace_id: str
@@ -32,6 +69,12 @@ class DocumentMetadata(BaseModel):
     file_type: str
     file_extension: str
 
+class DocumentBlock(BaseModel):
+    block_type: str
+    text: str
+    level: int = 0
+    page_no: Optional[int] = None
+
 class DocumentChunk(BaseModel):
     id: Optional[UUID] = None
     document_id: UUID
@@ -42,9 +85,14 @@ class DocumentChunk(BaseModel):
     chunk_type: ChunkType = ChunkType.TEXT
     token_count: Optional[int] = None
     character_count: Optional[int] = None
-    embedding: Optional[List[float]] = None
+    # float32 arrays; serialized as lists of floats in JSON
+    embedding: Optional[Vector] = None
+    embedding_reduced: Optional[Vector] = None
     embedding_model: str = "gemini-embedding-001"
+    embedding_status: EmbeddingStatus = EmbeddingStatus.READY
+    embedding_attempts: int = 0
     chunking_strategy: str = "token"
+    content_hash: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -52,18 +100,76 @@ class ProcessDocumentRequest(BaseModel):
     file_path: str
     metadata: DocumentMetadata
 
+class ConversionReport(BaseModel):
+    profile: ConversionProfile
+    page_count: Optional[int] = None
+    # Pre-pass findings, for PDFs
+    text_chars_per_page: Optional[float] = None
+    figure_line_ratio: Optional[float] = None
+    has_text_layer: Optional[bool] = None
+    tables_likely: Optional[bool] = None
+    inspection_seconds: float = 0.0
+    conversion_seconds: float = 0.0
+    cached: bool = False
+
 class ProcessDocumentResponse(BaseModel):
     document_id: UUID
     status: ProcessingStatus
     chunks_created: int
     processing_time_seconds: float
     message: str
+    conversion: Optional[ConversionReport] = None
+
+class IngestionJob(BaseModel):
+    job_id: UUID
+    document_id: UUID
+    status: JobStatus = JobStatus.QUEUED
+    stage: ProcessingStage = ProcessingStage.QUEUED
+    progress: float = 0.0
+    chunks_created: int = 0
+    message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ProcessDocumentJobResponse(BaseModel):
+    job_id: UUID
+    document_id: UUID
+    status: JobStatus
+    status_url: str
+
+class BulkIngestRequest(BaseModel):
+    requests: List[ProcessDocumentRequest] = Field(default_factory=list)
+    manifest_path: Optional[str] = None
+    workspace_id: Optional[str] = None
+    user_id: Optional[str] = None
+
+class BulkIngestResponse(BaseModel):
+    jobs: List[ProcessDocumentJobResponse]
+    total_jobs: int
+    # Documents whose record could not be created; no job was queued for them
+    failed_document_ids: List[UUID] = Field(default_factory=list)
+
+class BulkIngestReport(BaseModel):
+    total_documents: int
+    processed: int
+    skipped: int
+    failed: int
+    chunks_created: int
+    elapsed_seconds: float
+    documents_per_minute: float
+    chunks_per_second: float
+    failures: Dict[str, str] = Field(default_factory=dict)
 
 class SearchRequest(BaseModel):
     query: str
     workspace_id: str
     similarity_threshold: float = Field(default=0.7, ge=0.0, le=1.0)
     max_results: int = Field(default=10, ge=1, le=100)
+    # hybrid fuses full-text and vector rankings with reciprocal rank fusion
+    search_mode: SearchMode = SearchMode.VECTOR
+    # Rerank candidates with the local cross-encoder; None uses the server default
+    rerank: Optional[bool] = None
 
 class SearchResult(BaseModel):
     id: UUID
@@ -71,9 +177,13 @@ class SearchResult(BaseModel):
     chunk_text: str
     chunk_type: ChunkType
     similarity: float
+    # Reranker score when reranked, otherwise the fused rank score in hybrid mode
+    score: Optional[float] = None
 
 class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
     total_results: int
     search_time_seconds: float
+    # Seconds spent in each search stage, e.g. embedding, vector_search
+    timings: Dict[str, float] = Field(default_factory=dict)
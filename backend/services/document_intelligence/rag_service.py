@@ -3,30 +3,156 @@ RAG Service for chunking, embedding, and retrieval operations
 """
 
 import os
+import re
 import time
-from typing import List, Optional
+import hashlib
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 from uuid import UUID
 import logging
 
+import numpy as np
 from chonkie import TokenChunker
 from google import genai
 from dotenv import load_dotenv
 
-from .models import DocumentChunk, DocumentMetadata, ChunkType, SearchRequest, SearchResult
+from .models import (
+    DocumentBlock,
+    DocumentChunk,
+    DocumentMetadata,
+    ChunkType,
+    EmbeddingStatus,
+    ProcessingStage,
+    SearchMode,
+    SearchRequest,
+    SearchResult
+)
 from .storage_service import StorageService
+from .embedding_service import EmbeddingService, reduce_embedding
+from .embedding_providers import GeminiEmbeddingProvider, create_embedding_provider
+from .embedding_scheduler import Priority
+from .vectors import is_zero_vector
+from .vector_index import VectorIndexManager
+from .search_cache import SearchCache
+from .reranker import Reranker
+from . import metrics
+from .structure_chunker import StructureChunker
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Wraps each pipeline stage, e.g. to report progress or apply concurrency limits
+StageContext = Callable[[ProcessingStage], AsyncContextManager[None]]
+
+@asynccontextmanager
+async def _untracked_stage(stage: ProcessingStage) -> AsyncIterator[None]:
+    yield
+
+_HEADING_LINE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+# Sections shorter than this are merged with the next one
+MIN_SECTION_CHARS = 2000
+
+async def iter_markdown_sections(markdown_content: str) -> AsyncIterator[str]:
+    """Yield Markdown in heading-delimited sections"""
+    starts = [match.start() for match in _HEADING_LINE.finditer(markdown_content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(markdown_content))
+    
+    section_start = 0
+    for boundary in starts[1:]:
+        if boundary - section_start < MIN_SECTION_CHARS and boundary != len(markdown_content):
+            continue
+        section = markdown_content[section_start:boundary]
+        section_start = boundary
+        if section.strip():
+            yield section
+        # Let other requests run between sections
+        await asyncio.sleep(0)
+
+def content_hash(chunk_text: str) -> str:
+    """Hash of chunk text, used to detect unchanged chunks on reprocessing"""
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+T = TypeVar("T")
+
+async def _timed(timings: Dict[str, float], stage: str, awaitable: Awaitable[T]) -> T:
+    """Await and record how long it took under timings[stage]"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 4)
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[SearchResult]],
+    k: int = 60,
+    limit: Optional[int] = None
+) -> List[SearchResult]:
+    """
+    Merge rankings with reciprocal rank fusion
+
+    Each result scores the sum of 1 / (k + rank) over the lists it appears
+    in, so rankings with unrelated score scales can be combined.
+    """
+    scores: Dict[UUID, float] = {}
+    by_id: Dict[UUID, SearchResult] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            scores[result.id] = scores.get(result.id, 0.0) + 1.0 / (k + rank)
+            by_id.setdefault(result.id, result)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [by_id[result_id].model_copy(update={"score": round(scores[result_id], 6)}) for result_id in ranked]
+
+def parse_workspace_backends(value: str) -> Dict[str, str]:
+    """Parse "workspace_id=backend,..." into a mapping"""
+    backends = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        workspace_id, separator, backend = entry.partition("=")
+        if not separator or not workspace_id.strip() or not backend.strip():
+            raise ValueError(f"Invalid EMBEDDING_WORKSPACE_BACKENDS entry: {entry!r}")
+        backends[workspace_id.strip()] = backend.strip()
+    return backends
+
+class _ExistingChunks:
+    """Rows already stored for a document, indexed for incremental reprocessing"""
+    
+    def __init__(self, chunks: List[DocumentChunk]):
+        self.by_index = {chunk.chunk_index: chunk for chunk in chunks}
+        self.by_hash = {}
+        for chunk in chunks:
+            # Rows stored before content_hash existed are hashed here
+            chunk.content_hash = chunk.content_hash or content_hash(chunk.chunk_text)
+            if not is_zero_vector(chunk.embedding):
+                self.by_hash.setdefault((chunk.content_hash, chunk.embedding_model), chunk)
+
 class RAGService:
-    def __init__(self):
-        # Initialize Google GenAI client
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.google_api_key:
-            raise ValueError("Missing GOOGLE_API_KEY in environment variables")
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        genai_client: Optional[genai.Client] = None,
+        embedding_dimension: int = 3072
+    ):
+        # Embedding backend for the deployment ("gemini" or "local"), and
+        # per-workspace overrides as "workspace_id=backend,..."
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", GeminiEmbeddingProvider.backend)
+        self.workspace_backends = parse_workspace_backends(os.getenv("EMBEDDING_WORKSPACE_BACKENDS", ""))
+        backends = {self.embedding_backend, *self.workspace_backends.values()}
         
-        self.genai_client = genai.Client(api_key=self.google_api_key)
+        # Initialize Google GenAI client when Gemini is used, unless one is injected (e.g. a local stand-in)
+        if genai_client is None and GeminiEmbeddingProvider.backend in backends:
+            self.google_api_key = os.getenv("GOOGLE_API_KEY")
+            if not self.google_api_key:
+                raise ValueError("Missing GOOGLE_API_KEY in environment variables")
+            genai_client = genai.Client(api_key=self.google_api_key)
+        
+        self.genai_client = genai_client
         
         # Initialize chunker with optimal settings for RAG
         self.chunker = TokenChunker(
@@ -34,63 +160,348 @@ class RAGService:
             chunk_overlap=64,  # 12.5% overlap for context continuity
         )
         
-        # Initialize storage service
-        self.storage = StorageService()
+        # Chunker that follows the Docling document structure, same token budget
+        self.structure_chunker = StructureChunker(
+            count_tokens=self.chunker.tokenizer.count_tokens,
+            split_text=self._chunk_content,
+            chunk_size=512
+        )
+        
+        # Only embed and store chunks that changed when a document is reprocessed
+        self.incremental = os.getenv("INCREMENTAL_REPROCESSING", "true").lower() == "true"
+        
+        # Streaming pipeline configuration
+        self.store_batch_size = int(os.getenv("STORE_BATCH_SIZE", "200"))
+        self.pipeline_depth = int(os.getenv("INGEST_PIPELINE_DEPTH", "4"))
+        
+        # Storage is shared with the caller when given, so one connection pool serves everything
+        self.storage = storage or StorageService()
+        
+        # Width of the embedding column (gemini-embedding-001 dimensions);
+        # only local stand-ins with smaller vectors pass anything else
+        self.embedding_dimension = embedding_dimension
+        
+        # Batched, concurrent embedding generation, one service per backend in use
+        self.embedders: Dict[str, EmbeddingService] = {
+            backend: EmbeddingService(
+                create_embedding_provider(backend, self.embedding_dimension, self.genai_client),
+                embedding_dimension=self.embedding_dimension
+            )
+            for backend in sorted(backends)
+        }
+        self.embedder = self.embedders[self.embedding_backend]
+        self.embedding_model = self.embedder.embedding_model
+        
+        # Optional in-process search tier for hot workspaces
+        self.vector_index = VectorIndexManager(
+            self.storage,
+            reduced_dimension=self.embedder.reduced_dimension,
+            full_dimension=self.embedding_dimension
+        )
+        
+        # Query embedding and search result caches
+        self.search_cache = SearchCache()
         
-        # Embedding model configuration
-        self.embedding_model = "gemini-embedding-001" 
-        self.embedding_dimension = 3072  # gemini-embedding-001 dimensions
+        # Hybrid search: candidates fetched per retriever, and the RRF constant
+        self.hybrid_candidate_multiplier = int(os.getenv("SEARCH_HYBRID_CANDIDATE_MULTIPLIER", "3"))
+        self.rrf_k = int(os.getenv("SEARCH_RRF_K", "60"))
+        
+        # Optional cross-encoder second stage over an over-fetched candidate set
+        self.reranker = Reranker()
+        
+        # Keep derived search state in step with newly stored chunks
+        self.storage.on_chunks_stored(self.vector_index.add_chunks)
+        self.storage.on_chunks_stored(self._invalidate_search_cache)
+    
+    def embedder_for(self, workspace_id: str) -> EmbeddingService:
+        """
+        The embedding service for a workspace
+        
+        Every chunk and query of a workspace must use the same backend, since
+        vectors from different models are not comparable. After changing a
+        workspace's backend, reprocess its documents: chunks recorded with
+        another embedding_model are re-embedded.
+        """
+        return self.embedders[self.workspace_backends.get(workspace_id, self.embedding_backend)]
+    
+    async def warm_up(self) -> None:
+        """Load local embedding models and the reranker ahead of the first request"""
+        await asyncio.gather(
+            *(embedder.provider.warm_up() for embedder in self.embedders.values()),
+            self.reranker.warm_up()
+        )
+    
+    async def shutdown(self) -> None:
+        await self.vector_index.shutdown()
+        for embedder in self.embedders.values():
+            embedder.shutdown()
+        self.reranker.shutdown()
     
     async def process_content(
         self, 
         markdown_content: str, 
-        metadata: DocumentMetadata
+        metadata: DocumentMetadata,
+        stage: StageContext = _untracked_stage
     ) -> List[DocumentChunk]:
         """
         Process markdown content into chunks with embeddings
         """
+        document_chunks: List[DocumentChunk] = []
+        await self.process_sections(
+            iter_markdown_sections(markdown_content),
+            metadata,
+            stage=stage,
+            on_stored=document_chunks.extend
+        )
+        return document_chunks
+    
+    async def process_sections(
+        self,
+        sections: AsyncIterator[str],
+        metadata: DocumentMetadata,
+        stage: StageContext = _untracked_stage,
+        on_stored: Optional[Callable[[List[DocumentChunk]], None]] = None
+    ) -> int:
+        """
+        Chunk, embed and store a stream of Markdown sections with TokenChunker
+        """
+        async def token_chunks() -> AsyncIterator[Tuple[str, ChunkType]]:
+            async for section in sections:
+                async with stage(ProcessingStage.CHUNKING):
+                    section_chunks = self._chunk_content(section)
+                for chunk_text in section_chunks:
+                    # Determine chunk type (basic heuristics)
+                    yield chunk_text, self._determine_chunk_type(chunk_text)
+        
+        return await self.process_chunk_stream(
+            token_chunks(), metadata, "token", stage=stage, on_stored=on_stored
+        )
+    
+    async def process_blocks(
+        self,
+        blocks: List[DocumentBlock],
+        metadata: DocumentMetadata,
+        stage: StageContext = _untracked_stage,
+        on_stored: Optional[Callable[[List[DocumentChunk]], None]] = None
+    ) -> int:
+        """
+        Chunk, embed and store Docling blocks with the structure-aware chunker
+        """
+        async def structure_chunks() -> AsyncIterator[Tuple[str, ChunkType]]:
+            chunks = self.structure_chunker.chunk(blocks)
+            while True:
+                async with stage(ProcessingStage.CHUNKING):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        
+        return await self.process_chunk_stream(
+            structure_chunks(), metadata, "structure", stage=stage, on_stored=on_stored
+        )
+    
+    async def process_chunk_stream(
+        self,
+        chunks: AsyncIterator[Tuple[str, ChunkType]],
+        metadata: DocumentMetadata,
+        chunking_strategy: str,
+        stage: StageContext = _untracked_stage,
+        on_stored: Optional[Callable[[List[DocumentChunk]], None]] = None
+    ) -> int:
+        """
+        Embed and store a stream of (chunk_text, chunk_type) pairs
+        
+        Chunking, embedding and storage overlap: chunks are produced as the
+        input arrives, full batches are embedded while later chunks are still
+        being produced, and embedded chunks are flushed to storage in batches.
+        At most pipeline_depth embedding batches are buffered, so memory does
+        not grow with document size.
+        
+        In incremental mode, chunks whose content hash matches the row already
+        stored at the same chunk_index are skipped, and moved chunks reuse
+        their stored embedding. Rows past the new end of the document are
+        deleted. Returns the number of chunks in the document.
+        """
         logger.info(f"Processing content for document {metadata.document_id}")
+        embedder = self.embedder_for(metadata.workspace_id)
         
-        try:
-            # 1. Chunk the content
-            chunks = self._chunk_content(markdown_content)
-            logger.info(f"Created {len(chunks)} chunks")
-            
-            # 2. Create DocumentChunk objects
-            document_chunks = []
-            for i, chunk_text in enumerate(chunks):
-                # Generate embedding for this chunk
-                embedding = await self._generate_embedding(chunk_text)
+        existing = None
+        if self.incremental:
+            stored_chunks = await self.storage.get_document_chunks(metadata.document_id)
+            if stored_chunks:
+                existing = _ExistingChunks(stored_chunks)
+                logger.info(f"Reprocessing incrementally against {len(stored_chunks)} stored chunks")
+        
+        # Each entry is an in-flight embedding task; None marks the end
+        embedded_batches: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_depth)
+        stored_count = 0
+        unchanged_count = 0
+        total_chunks = 0
+        
+        async def produce(tg: asyncio.TaskGroup) -> None:
+            nonlocal total_chunks
+            pending: List[Tuple[str, ChunkType]] = []
+            next_index = 0
+            
+            # 1. Chunks arrive from the chunker as the input is consumed
+            async for chunk in chunks:
+                pending.append(chunk)
+                
+                # 2. Start embedding every full batch (waits when the pipeline is full)
+                if len(pending) >= embedder.batch_size:
+                    await embedded_batches.put(tg.create_task(
+                        self._embed_chunks(pending, next_index, metadata, chunking_strategy, embedder, stage, existing)
+                    ))
+                    next_index += len(pending)
+                    pending = []
+            
+            if pending:
+                await embedded_batches.put(tg.create_task(
+                    self._embed_chunks(pending, next_index, metadata, chunking_strategy, embedder, stage, existing)
+                ))
+                next_index += len(pending)
+            total_chunks = next_index
+            await embedded_batches.put(None)
+        
+        async def consume() -> None:
+            nonlocal stored_count, unchanged_count
+            buffer: List[DocumentChunk] = []
+            
+            while True:
+                task = await embedded_batches.get()
+                if task is not None:
+                    changed_chunks, unchanged = await task
+                    buffer.extend(changed_chunks)
+                    unchanged_count += unchanged
                 
-                # Determine chunk type (basic heuristics)
-                chunk_type = self._determine_chunk_type(chunk_text)
+                # 3. Flush embedded chunks to storage in batches
+                while len(buffer) >= self.store_batch_size or (task is None and buffer):
+                    batch = buffer[:self.store_batch_size]
+                    buffer = buffer[self.store_batch_size:]
+                    async with stage(ProcessingStage.STORING):
+                        success = await self.storage.store_chunks(batch)
+                    if not success:
+                        raise Exception("Failed to store chunks in database")
+                    stored_count += len(batch)
+                    if on_stored is not None:
+                        on_stored(batch)
                 
-                document_chunk = DocumentChunk(
-                    document_id=metadata.document_id,
-                    workspace_id=metadata.workspace_id,
-                    user_id=metadata.user_id,
-                    chunk_text=chunk_text,
-                    chunk_index=i,
-                    chunk_type=chunk_type,
-                    token_count=len(chunk_text.split()),  # Rough token count
-                    character_count=len(chunk_text),
-                    embedding=embedding,
-                    embedding_model=self.embedding_model,
-                    chunking_strategy="token"
-                )
-                document_chunks.append(document_chunk)
+                if task is None:
+                    return
+        
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(produce(tg))
+                tg.create_task(consume())
             
-            # 3. Store chunks in database
-            success = await self.storage.store_chunks(document_chunks)
-            if not success:
-                raise Exception("Failed to store chunks in database")
+            # Drop rows left over from a longer earlier version of the document
+            stale_count = await self.storage.delete_chunks_from(metadata.document_id, total_chunks)
+            if stale_count:
+                self.vector_index.remove_chunks(metadata.workspace_id, str(metadata.document_id), total_chunks)
+                self.search_cache.invalidate_workspace(metadata.workspace_id)
             
-            logger.info(f"Successfully processed and stored {len(document_chunks)} chunks")
-            return document_chunks
+            logger.info(
+                f"Successfully processed {total_chunks} chunks: stored {stored_count}, "
+                f"unchanged {unchanged_count}, deleted {stale_count} stale"
+            )
+            return total_chunks
             
-        except Exception as e:
-            logger.error(f"Error processing content: {str(e)}")
-            raise
+        except ExceptionGroup as eg:
+            # Surface the first failing stage's error, not the group
+            error = eg.exceptions[0]
+            logger.error(f"Error processing content: {str(error)}")
+            raise error
+    
+    async def _embed_chunks(
+        self,
+        chunks: List[Tuple[str, ChunkType]],
+        start_index: int,
+        metadata: DocumentMetadata,
+        chunking_strategy: str,
+        embedder: EmbeddingService,
+        stage: StageContext,
+        existing: Optional[_ExistingChunks] = None
+    ) -> Tuple[List[DocumentChunk], int]:
+        """
+        Embed a batch of chunks and build DocumentChunk objects
+        
+        Returns the chunks that need storing and the number left unchanged.
+        """
+        metrics.CHUNKS.inc(len(chunks), strategy=chunking_strategy)
+        metrics.CHUNK_TOKENS.inc(sum(len(chunk_text.split()) for chunk_text, _ in chunks), strategy=chunking_strategy)
+        
+        # (chunk_index, text, type, hash, embedding or None if it must be embedded)
+        changed = []
+        for offset, (chunk_text, chunk_type) in enumerate(chunks):
+            chunk_index = start_index + offset
+            chunk_hash = content_hash(chunk_text)
+            embedding = None
+            
+            if existing is not None:
+                stored = existing.by_index.get(chunk_index)
+                if (
+                    stored is not None
+                    and stored.content_hash == chunk_hash
+                    and stored.chunk_type == chunk_type
+                    and stored.embedding_model == embedder.embedding_model
+                    and stored.chunking_strategy == chunking_strategy
+                    and stored.embedding_status == EmbeddingStatus.READY
+                    and not is_zero_vector(stored.embedding)
+                ):
+                    continue
+                
+                # Text that moved to a new position keeps its stored embedding
+                moved = existing.by_hash.get((chunk_hash, embedder.embedding_model))
+                if moved is not None:
+                    embedding = moved.embedding
+            
+            changed.append((chunk_index, chunk_text, chunk_type, chunk_hash, embedding))
+        
+        texts_to_embed = [chunk_text for _, chunk_text, _, _, embedding in changed if embedding is None]
+        if texts_to_embed:
+            async with stage(ProcessingStage.EMBEDDING):
+                new_embeddings = iter(await embedder.embed_texts(texts_to_embed, coalesce=True))
+        
+        document_chunks = []
+        pending_count = 0
+        for chunk_index, chunk_text, chunk_type, chunk_hash, embedding in changed:
+            if embedding is None:
+                embedding = next(new_embeddings)
+            
+            # Failed embeddings are stored without vectors and repaired later
+            status = EmbeddingStatus.READY if embedding is not None else EmbeddingStatus.PENDING
+            if status == EmbeddingStatus.PENDING:
+                pending_count += 1
+            
+            document_chunk = DocumentChunk(
+                document_id=metadata.document_id,
+                workspace_id=metadata.workspace_id,
+                user_id=metadata.user_id,
+                chunk_text=chunk_text,
+                chunk_index=chunk_index,
+                chunk_type=chunk_type,
+                token_count=len(chunk_text.split()),  # Rough token count
+                character_count=len(chunk_text),
+                embedding=embedding,
+                embedding_reduced=(
+                    reduce_embedding(embedding, embedder.reduced_dimension)
+                    if embedding is not None else None
+                ),
+                embedding_model=embedder.embedding_model,
+                embedding_status=status,
+                chunking_strategy=chunking_strategy,
+                content_hash=chunk_hash
+            )
+            document_chunks.append(document_chunk)
+        
+        if pending_count:
+            logger.warning(
+                f"Embedding failed for {pending_count} chunks of document {metadata.document_id}, "
+                f"storing them as pending"
+            )
+        
+        metrics.CHUNKS_UNCHANGED.inc(len(chunks) - len(changed))
+        return document_chunks, len(chunks) - len(changed)
     
     def _chunk_content(self, content: str) -> List[str]:
         """Chunk content using TokenChunker"""
@@ -141,40 +552,101 @@ class RAGService:
         # Default to text
         return ChunkType.TEXT
     
-    async def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using Gemini"""
-        try:
-            response = self.genai_client.models.embed_content(
-                model=self.embedding_model,
-                contents=text
-            )
-            
-            if response.embeddings and len(response.embeddings) > 0:
-                return response.embeddings[0].values
-            else:
-                raise Exception("No embedding returned from API")
-                
-        except Exception as e:
-            logger.error(f"Error generating embedding: {str(e)}")
-            # Return zero vector as fallback
-            return [0.0] * self.embedding_dimension
+    async def _generate_embedding(self, text: str, embedder: EmbeddingService) -> Optional[np.ndarray]:
+        """Generate embedding for a single text, ahead of queued ingestion batches"""
+        embeddings = await embedder.embed_texts([text], priority=Priority.INTERACTIVE)
+        return embeddings[0]
+    
+    def _invalidate_search_cache(self, chunks: List[DocumentChunk]) -> None:
+        """Drop cached search results for workspaces that received new chunks"""
+        for workspace_id in {chunk.workspace_id for chunk in chunks}:
+            self.search_cache.invalidate_workspace(workspace_id)
     
     async def search_similar_content(
         self, 
-        search_request: SearchRequest
+        search_request: SearchRequest,
+        timings: Optional[Dict[str, float]] = None
     ) -> List[SearchResult]:
-        """Search for similar content using vector similarity"""
+        """
+        Search for similar content using vector similarity
+        
+        In hybrid mode, full-text and vector candidates are fetched
+        concurrently and merged with reciprocal rank fusion. With reranking,
+        more candidates are retrieved and the local cross-encoder picks the
+        top max_results. Seconds spent in each stage are recorded in timings
+        when it is given.
+        """
+        timings = timings if timings is not None else {}
+        
         try:
-            # Generate embedding for the search query
-            query_embedding = await self._generate_embedding(search_request.query)
+            # Generate embedding for the search query with the workspace's backend
+            stage_start = time.perf_counter()
+            embedder = self.embedder_for(search_request.workspace_id)
+            query_embedding = self.search_cache.get_query_embedding(embedder.embedding_model, search_request.query)
+            if query_embedding is None:
+                query_embedding = await self._generate_embedding(search_request.query, embedder)
+                if query_embedding is None:
+                    logger.error(f"Could not embed query, returning no results: {search_request.query[:50]}...")
+                    return []
+                self.search_cache.put_query_embedding(embedder.embedding_model, search_request.query, query_embedding)
+            timings["embedding"] = round(time.perf_counter() - stage_start, 4)
             
-            # Search for similar chunks
-            results = await self.storage.search_similar_chunks(
-                query_embedding=query_embedding,
-                workspace_id=search_request.workspace_id,
-                similarity_threshold=search_request.similarity_threshold,
-                max_results=search_request.max_results
+            rerank = self.reranker.enabled if search_request.rerank is None else search_request.rerank
+            variant = search_request.search_mode.value + ("+rerank" if rerank else "")
+            retrieve_count = search_request.max_results * (self.reranker.candidate_multiplier if rerank else 1)
+            cached_results = self.search_cache.get_results(
+                search_request.workspace_id,
+                query_embedding,
+                search_request.similarity_threshold,
+                search_request.max_results,
+                variant
             )
+            if cached_results is not None:
+                logger.info(f"Search cache hit for query: {search_request.query[:50]}...")
+                metrics.SEARCH_CACHE.inc(result="hit")
+                return cached_results
+            metrics.SEARCH_CACHE.inc(result="miss")
+            
+            query_embedding_reduced = reduce_embedding(query_embedding, embedder.reduced_dimension)
+            
+            if search_request.search_mode == SearchMode.HYBRID:
+                candidate_count = retrieve_count * self.hybrid_candidate_multiplier
+                vector_results, lexical_results = await asyncio.gather(
+                    _timed(timings, "vector_search", self._vector_search(
+                        search_request, query_embedding, query_embedding_reduced, candidate_count
+                    )),
+                    _timed(timings, "lexical_search", self.storage.search_lexical_chunks(
+                        search_request.query, query_embedding, search_request.workspace_id, candidate_count
+                    ))
+                )
+                
+                stage_start = time.perf_counter()
+                results = reciprocal_rank_fusion(
+                    [vector_results, lexical_results], self.rrf_k, retrieve_count
+                )
+                timings["fusion"] = round(time.perf_counter() - stage_start, 4)
+            else:
+                results = await _timed(timings, "vector_search", self._vector_search(
+                    search_request, query_embedding, query_embedding_reduced, retrieve_count
+                ))
+            
+            reranked = False
+            if rerank:
+                results, reranked = await _timed(timings, "rerank", self.reranker.rerank(
+                    search_request.query, results, search_request.max_results
+                ))
+            
+            # Empty results may come from a swallowed storage error, and a
+            # reranking fallback is transient, so don't cache either
+            if results and reranked == rerank:
+                self.search_cache.put_results(
+                    search_request.workspace_id,
+                    query_embedding,
+                    search_request.similarity_threshold,
+                    search_request.max_results,
+                    results,
+                    variant
+                )
             
             logger.info(f"Found {len(results)} similar chunks for query: {search_request.query[:50]}...")
             return results
@@ -182,3 +654,32 @@ class RAGService:
         except Exception as e:
             logger.error(f"Error searching similar content: {str(e)}")
             return []
+    
+    async def _vector_search(
+        self,
+        search_request: SearchRequest,
+        query_embedding: np.ndarray,
+        query_embedding_reduced: np.ndarray,
+        max_results: int
+    ) -> List[SearchResult]:
+        """Vector search, from the in-process index when the workspace has one"""
+        results = await self.vector_index.search(
+            workspace_id=search_request.workspace_id,
+            query_embedding=query_embedding,
+            query_embedding_reduced=query_embedding_reduced,
+            similarity_threshold=search_request.similarity_threshold,
+            max_results=max_results,
+            candidate_multiplier=self.storage.search_candidate_multiplier
+        )
+        
+        if results is None:
+            # Search for similar chunks - the reduced vector drives the indexed first pass
+            results = await self.storage.search_similar_chunks(
+                query_embedding=query_embedding,
+                workspace_id=search_request.workspace_id,
+                similarity_threshold=search_request.similarity_threshold,
+                max_results=max_results,
+                query_embedding_reduced=query_embedding_reduced
+            )
+        
+        return results
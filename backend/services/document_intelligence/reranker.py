@@ -0,0 +1,129 @@
+"""
+Local CPU cross-encoder reranking for search results
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import SearchResult
+
+logger = logging.getLogger(__name__)
+
+class Reranker:
+    """
+    Reorders search candidates with a small cross-encoder on CPU
+
+    Uses sentence-transformers' CrossEncoder (RERANK_BACKEND=onnx runs it
+    through ONNX Runtime) from the backend's rerank extra. Candidates are
+    scored in batches on a dedicated thread; if scoring does not finish
+    within the latency budget, the original ranking is returned instead.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+        self.model_name = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.backend = os.getenv("RERANK_BACKEND", "torch")
+        self.batch_size = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        self.budget_seconds = float(os.getenv("RERANK_BUDGET_MS", "200")) / 1000
+        # Candidates retrieved per requested result when reranking
+        self.candidate_multiplier = int(os.getenv("RERANK_CANDIDATE_MULTIPLIER", "4"))
+        # Longer chunks are truncated to keep scoring time predictable
+        self.max_chars = int(os.getenv("RERANK_MAX_CHARS", "2000"))
+
+        self.reranked = 0
+        self.fallbacks = 0
+        self._model: Optional[Any] = None
+        self._load_error: Optional[str] = None
+        # One thread, so concurrent searches queue instead of oversubscribing the CPU
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    def _load_model(self) -> Any:
+        if self._model is None and self._load_error is None:
+            try:
+                from sentence_transformers import CrossEncoder
+
+                start_time = time.time()
+                self._model = CrossEncoder(self.model_name, device="cpu", backend=self.backend)
+                logger.info(f"Loaded reranker {self.model_name} ({self.backend}) in {time.time() - start_time:.1f}s")
+            except ImportError as e:
+                self._load_error = f"{str(e)} - install the backend's rerank extra (uv sync --extra rerank)"
+                logger.error(f"Reranker unavailable, keeping original ranking: {self._load_error}")
+            except Exception as e:
+                # Don't retry on every search
+                self._load_error = str(e)
+                logger.error(f"Reranker unavailable, keeping original ranking: {str(e)}")
+        return self._model
+
+    def _score_batch(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        model = self._load_model()
+        if model is None:
+            raise RuntimeError(f"Reranker model not loaded: {self._load_error}")
+        return [float(score) for score in model.predict(pairs, batch_size=self.batch_size)]
+
+    async def warm_up(self) -> None:
+        """Load the model ahead of the first search"""
+        if self.enabled:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._load_model)
+
+    async def rerank(
+        self,
+        query: str,
+        results: List[SearchResult],
+        max_results: int
+    ) -> Tuple[List[SearchResult], bool]:
+        """
+        Rerank results, returning (top max_results, whether reranking was applied)
+
+        Falls back to the first max_results in their original order when
+        the model is unavailable or the latency budget runs out.
+        """
+        if len(results) <= 1:
+            return results[:max_results], False
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget_seconds
+        scores: List[float] = []
+
+        try:
+            for i in range(0, len(results), self.batch_size):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+
+                pairs = [(query, result.chunk_text[:self.max_chars]) for result in results[i:i + self.batch_size]]
+                scores.extend(await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._score_batch, pairs),
+                    timeout=remaining
+                ))
+
+        except asyncio.TimeoutError:
+            self.fallbacks += 1
+            logger.warning(
+                f"Reranking exceeded {self.budget_seconds * 1000:.0f}ms after {len(scores)}/{len(results)} "
+                f"candidates, keeping original ranking"
+            )
+            return results[:max_results], False
+        except Exception as e:
+            self.fallbacks += 1
+            logger.error(f"Reranking failed, keeping original ranking: {str(e)}")
+            return results[:max_results], False
+
+        self.reranked += 1
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:max_results]
+        return [results[i].model_copy(update={"score": round(scores[i], 6)}) for i in order], True
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks
+        }
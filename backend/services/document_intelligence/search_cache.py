@@ -0,0 +1,149 @@
+"""
+Query embedding and search result caches with workspace-scoped invalidation
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .models import SearchResult
+from .vectors import is_zero_vector
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl_seconds"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class SearchCache:
+    """
+    Two-level cache for search_similar_content
+
+    Level 1 maps normalized query text to its embedding. Level 2 maps
+    (workspace_id, query embedding, threshold, max_results, variant) to
+    results, where variant names the search mode.
+    Every workspace has a generation number that is part of the level 2
+    key; storing chunks bumps it, so stale results are never served and
+    simply age out of the LRU.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+        ttl_seconds = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+        max_entries = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+        self.query_embeddings = TTLCache(max_entries, ttl_seconds)
+        self.results = TTLCache(max_entries, ttl_seconds)
+        self._generations: Dict[str, int] = {}
+
+    @staticmethod
+    def _query_key(embedding_model: str, query: str) -> Tuple[str, str]:
+        return embedding_model, _WHITESPACE.sub(" ", query).strip().lower()
+
+    def get_query_embedding(self, embedding_model: str, query: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        return self.query_embeddings.get(self._query_key(embedding_model, query))
+
+    def put_query_embedding(self, embedding_model: str, query: str, embedding: np.ndarray) -> None:
+        # Zero vectors are failed embeddings and must not be reused
+        if self.enabled and not is_zero_vector(embedding):
+            self.query_embeddings.put(self._query_key(embedding_model, query), embedding)
+
+    def _results_key(
+        self,
+        workspace_id: str,
+        query_embedding: np.ndarray,
+        similarity_threshold: float,
+        max_results: int,
+        variant: str
+    ) -> Tuple:
+        embedding_hash = hashlib.sha1(np.asarray(query_embedding, dtype=np.float32).tobytes()).hexdigest()
+        return (
+            workspace_id,
+            self._generations.get(workspace_id, 0),
+            embedding_hash,
+            similarity_threshold,
+            max_results,
+            variant
+        )
+
+    def get_results(
+        self,
+        workspace_id: str,
+        query_embedding: np.ndarray,
+        similarity_threshold: float,
+        max_results: int,
+        variant: str = "vector"
+    ) -> Optional[List[SearchResult]]:
+        if not self.enabled:
+            return None
+        results = self.results.get(
+            self._results_key(workspace_id, query_embedding, similarity_threshold, max_results, variant)
+        )
+        return list(results) if results is not None else None
+
+    def put_results(
+        self,
+        workspace_id: str,
+        query_embedding: np.ndarray,
+        similarity_threshold: float,
+        max_results: int,
+        results: List[SearchResult],
+        variant: str = "vector"
+    ) -> None:
+        if self.enabled:
+            self.results.put(
+                self._results_key(workspace_id, query_embedding, similarity_threshold, max_results, variant),
+                list(results)
+            )
+
+    def invalidate_workspace(self, workspace_id: str) -> None:
+        """Drop all cached results for a workspace"""
+        self._generations[workspace_id] = self._generations.get(workspace_id, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "query_embeddings": self.query_embeddings.stats(),
+            "results": self.results.stats()
+        }
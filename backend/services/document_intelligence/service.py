@@ -3,22 +3,32 @@ Document Intelligence Service - Main orchestrator
 Unified service for document conversion, chunking, embedding, and RAG operations
 """
 
+import os
 import time
+import asyncio
 import logging
-from typing import List
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import UUID
 
+from google import genai
+
 from .models import (
-    DocumentMetadata, 
+    ConversionReport,
+    IngestionJob,
     ProcessDocumentRequest, 
     ProcessDocumentResponse, 
+    ProcessingStage,
     ProcessingStatus,
     SearchRequest,
     SearchResponse
 )
 from .document_converter import DocumentConverter
-from .rag_service import RAGService
+from .embedding_repair import EmbeddingRepairWorker
+from .rag_service import RAGService, iter_markdown_sections
 from .storage_service import StorageService
+from .job_queue import IngestionJobQueue, STAGE_PROGRESS
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -34,23 +44,100 @@ class DocumentIntelligenceService:
     5. Similarity search & retrieval
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        genai_client: Optional[genai.Client] = None,
+        embedding_dimension: int = 3072
+    ):
         self.document_converter = DocumentConverter()
-        self.rag_service = RAGService()
-        self.storage = StorageService()
+        # A single storage service (and connection pool) shared with the RAG service
+        self.storage = storage or StorageService()
+        self.rag_service = RAGService(
+            storage=self.storage,
+            genai_client=genai_client,
+            embedding_dimension=embedding_dimension
+        )
+        
+        # Per-stage concurrency limits so CPU-bound conversion and
+        # network-bound embedding/storage don't starve each other
+        self.stage_limits: Dict[ProcessingStage, asyncio.Semaphore] = {
+            ProcessingStage.CONVERTING: asyncio.Semaphore(
+                int(os.getenv("INGEST_CONVERT_CONCURRENCY", str(max(1, self.document_converter.pool_size))))
+            ),
+            ProcessingStage.EMBEDDING: asyncio.Semaphore(int(os.getenv("INGEST_EMBED_CONCURRENCY", "2"))),
+            ProcessingStage.STORING: asyncio.Semaphore(int(os.getenv("INGEST_STORE_CONCURRENCY", "4")))
+        }
+        
+        # "structure" chunks the Docling document tree, "token" chunks Markdown
+        self.chunking_strategy = os.getenv("CHUNKING_STRATEGY", "structure")
+        
+        # Queue for asynchronous ingestion jobs
+        self.job_queue = IngestionJobQueue(self.process_document)
+        
+        # Re-embeds chunks stored as pending after embedding failures
+        self.embedding_repair = EmbeddingRepairWorker(self.storage, self.rag_service.embedder_for)
+        
+        # Gauges read at scrape time
+        metrics.INGEST_QUEUE_DEPTH.set_function(lambda: self.job_queue.depth)
+        metrics.CONVERSION_POOL_SIZE.set_function(lambda: self.document_converter.pool_size)
+        for backend, embedder in self.rag_service.embedders.items():
+            metrics.EMBED_CONCURRENCY_LIMIT.set_function(lambda embedder=embedder: embedder.max_concurrency, backend=backend)
+        metrics.STORAGE_POOL_SIZE.set_function(lambda: self.storage.pool_size)
     
-    async def process_document(self, request: ProcessDocumentRequest) -> ProcessDocumentResponse:
+    def start(self) -> None:
+        """Start background ingestion and embedding repair workers and load conversion and local models"""
+        self.job_queue.start()
+        self.embedding_repair.start()
+        # Loading models inside the first search or conversion would blow its latency budget
+        self._warm_up = asyncio.gather(self.rag_service.warm_up(), self.document_converter.warm_up())
+    
+    @asynccontextmanager
+    async def _track_stage(
+        self, 
+        document_id: UUID, 
+        stage: ProcessingStage, 
+        job: Optional[IngestionJob] = None,
+        report: bool = True
+    ) -> AsyncIterator[None]:
+        """Run a pipeline stage under its concurrency limit and report progress"""
+        limit = self.stage_limits.get(stage)
+        if limit is not None:
+            with metrics.STAGE_WAIT.time(stage=stage.value):
+                await limit.acquire()
+        try:
+            if report:
+                if job is not None:
+                    job.stage = stage
+                    job.progress = STAGE_PROGRESS[stage]
+                await self.storage.update_document_status(
+                    document_id, ProcessingStatus.PROCESSING.value, stage=stage.value
+                )
+            with metrics.STAGE_DURATION.time(stage=stage.value):
+                yield
+        finally:
+            if limit is not None:
+                limit.release()
+    
+    async def process_document(
+        self, 
+        request: ProcessDocumentRequest, 
+        job: Optional[IngestionJob] = None
+    ) -> ProcessDocumentResponse:
         """
         Process a document through the complete intelligence pipeline
         
         Args:
             request: ProcessDocumentRequest with file path and metadata
+            job: Optional ingestion job to report per-stage progress on
             
         Returns:
             ProcessDocumentResponse with processing results
         """
         start_time = time.time()
         document_id = request.metadata.document_id
+        # Filled in by the converter with the chosen profile and its timings
+        conversion_report: Dict[str, Any] = {}
         
         try:
             logger.info(f"Starting document processing for {document_id}")
@@ -58,29 +145,70 @@ class DocumentIntelligenceService:
             # Update document status to processing
             await self.storage.update_document_status(document_id, ProcessingStatus.PROCESSING.value)
             
-            # Step 1: Convert PDF to Markdown
-            logger.info("Step 1: Converting document to markdown")
-            markdown_content = await self.document_converter.convert_document(request.file_path)
+            # Stages overlap and repeat per batch, so only report each one when it first starts
+            reported_stages = set()
             
-            if not markdown_content.strip():
-                raise Exception("Document conversion resulted in empty content")
+            def stage(pipeline_stage: ProcessingStage):
+                report = pipeline_stage not in reported_stages
+                reported_stages.add(pipeline_stage)
+                return self._track_stage(document_id, pipeline_stage, job, report=report)
             
-            # Step 2: Process content through RAG pipeline
-            logger.info("Step 2: Processing content through RAG pipeline")
-            chunks = await self.rag_service.process_content(markdown_content, request.metadata)
+            if self.chunking_strategy == "structure":
+                # Step 1: Convert PDF to typed blocks from the Docling document tree
+                logger.info("Step 1: Converting document to blocks")
+                async with stage(ProcessingStage.CONVERTING):
+                    blocks = await self.document_converter.convert_document_blocks(
+                        request.file_path, 
+                        request.metadata.file_type, 
+                        request.metadata.file_extension, 
+                        conversion_report
+                    )
+                
+                if not blocks:
+                    raise Exception("Document conversion resulted in empty content")
+                
+                # Step 2: Chunk along the document structure and run the RAG pipeline
+                logger.info("Step 2: Processing content through RAG pipeline")
+                chunks_created = await self.rag_service.process_blocks(blocks, request.metadata, stage=stage)
+            else:
+                # Step 1: Convert PDF to Markdown
+                logger.info("Step 1: Converting document to markdown")
+                async with stage(ProcessingStage.CONVERTING):
+                    markdown_content = await self.document_converter.convert_document(
+                        request.file_path, 
+                        request.metadata.file_type, 
+                        request.metadata.file_extension, 
+                        conversion_report
+                    )
+                
+                if not markdown_content.strip():
+                    raise Exception("Document conversion resulted in empty content")
+                
+                # Step 2: Stream content through the RAG pipeline section by section
+                logger.info("Step 2: Processing content through RAG pipeline")
+                chunks_created = await self.rag_service.process_sections(
+                    iter_markdown_sections(markdown_content), request.metadata, stage=stage
+                )
             
-            # Step 3: Update document status to processed
+            # Step 3: Record how the document was converted and update its status
             logger.info("Step 3: Updating document status")
-            await self.storage.update_document_status(document_id, ProcessingStatus.PROCESSED.value)
+            conversion = ConversionReport(**conversion_report)
+            await self.storage.update_document_conversion(document_id, conversion)
+            await self.storage.update_document_status(
+                document_id, ProcessingStatus.PROCESSED.value, stage=ProcessingStage.DONE.value
+            )
             
             processing_time = time.time() - start_time
+            metrics.DOCUMENT_DURATION.observe(processing_time, status=ProcessingStatus.PROCESSED.value)
+            metrics.DOCUMENTS.inc(status=ProcessingStatus.PROCESSED.value)
             
             response = ProcessDocumentResponse(
                 document_id=document_id,
                 status=ProcessingStatus.PROCESSED,
-                chunks_created=len(chunks),
+                chunks_created=chunks_created,
                 processing_time_seconds=round(processing_time, 2),
-                message=f"Successfully processed document with {len(chunks)} chunks"
+                message=f"Successfully processed document with {chunks_created} chunks",
+                conversion=conversion
             )
             
             logger.info(f"Document processing completed in {processing_time:.2f}s")
@@ -91,6 +219,8 @@ class DocumentIntelligenceService:
             await self.storage.update_document_status(document_id, ProcessingStatus.FAILED.value)
             
             processing_time = time.time() - start_time
+            metrics.DOCUMENT_DURATION.observe(processing_time, status=ProcessingStatus.FAILED.value)
+            metrics.DOCUMENTS.inc(status=ProcessingStatus.FAILED.value)
             error_message = f"Document processing failed: {str(e)}"
             logger.error(error_message)
             
@@ -99,7 +229,8 @@ class DocumentIntelligenceService:
                 status=ProcessingStatus.FAILED,
                 chunks_created=0,
                 processing_time_seconds=round(processing_time, 2),
-                message=error_message
+                message=error_message,
+                conversion=ConversionReport(**conversion_report) if "profile" in conversion_report else None
             )
     
     async def search_documents(self, search_request: SearchRequest) -> SearchResponse:
@@ -113,20 +244,28 @@ class DocumentIntelligenceService:
             SearchResponse with matching chunks
         """
         start_time = time.time()
+        timings = {}
         
         try:
-            logger.info(f"Searching for: '{search_request.query}' in workspace {search_request.workspace_id}")
+            logger.info(
+                f"Searching for: '{search_request.query}' in workspace {search_request.workspace_id} "
+                f"({search_request.search_mode.value})"
+            )
             
             # Perform similarity search
-            results = await self.rag_service.search_similar_content(search_request)
+            results = await self.rag_service.search_similar_content(search_request, timings)
             
             search_time = time.time() - start_time
+            metrics.SEARCH_DURATION.observe(search_time, mode=search_request.search_mode.value)
+            for search_stage, seconds in timings.items():
+                metrics.SEARCH_STAGE_DURATION.observe(seconds, stage=search_stage)
             
             response = SearchResponse(
                 query=search_request.query,
                 results=results,
                 total_results=len(results),
-                search_time_seconds=round(search_time, 3)
+                search_time_seconds=round(search_time, 3),
+                timings=timings
             )
             
             logger.info(f"Search completed in {search_time:.3f}s, found {len(results)} results")
@@ -141,7 +280,8 @@ class DocumentIntelligenceService:
                 query=search_request.query,
                 results=[],
                 total_results=0,
-                search_time_seconds=round(search_time, 3)
+                search_time_seconds=round(search_time, 3),
+                timings=timings
             )
     
     async def get_document_chunks(self, document_id: UUID) -> List:
@@ -152,11 +292,23 @@ class DocumentIntelligenceService:
             logger.error(f"Error getting document chunks: {str(e)}")
             return []
     
+    async def shutdown(self) -> None:
+        """Stop ingestion workers and release worker and connection pools held by the service"""
+        await self.job_queue.stop()
+        await self.embedding_repair.stop()
+        self.document_converter.shutdown()
+        await self.rag_service.shutdown()
+        await self.storage.close()
+    
     async def health_check(self) -> dict:
         """Service health check"""
         try:
             # Test document converter
             converter_status = "ok"
+            conversion_cache = (
+                self.document_converter.cache.stats()
+                if self.document_converter.cache is not None else None
+            )
             
             # Test storage connection
             # Simple test - try to query an empty result
@@ -170,6 +322,17 @@ class DocumentIntelligenceService:
                     "rag_service": "ok",
                     "storage": storage_status
                 },
+                "conversion_cache": conversion_cache,
+                "ingestion_queue": {
+                    "depth": self.job_queue.depth,
+                    "workers": self.job_queue.num_workers
+                },
+                "search_cache": self.rag_service.search_cache.stats(),
+                "reranker": self.rag_service.reranker.stats(),
+                "embedding": {
+                    backend: embedder.stats() for backend, embedder in self.rag_service.embedders.items()
+                },
+                "embedding_repair": self.embedding_repair.stats(),
                 "timestamp": time.time()
             }
             
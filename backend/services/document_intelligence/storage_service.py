@@ -3,18 +3,78 @@ Storage service for Supabase operations
 """
 
 import os
-from typing import List, Optional
+import time
+import random
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
 from uuid import UUID
-from supabase import create_client, Client
+import httpx
+import numpy as np
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 from dotenv import load_dotenv
 import logging
 
-from .models import DocumentChunk, SearchResult
+from .models import ConversionReport, DocumentChunk, DocumentMetadata, EmbeddingStatus, SearchResult
+from .vectors import decode_vector, encode_vector
+from . import metrics
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Columns of document_chunks that can be requested with a projection
+CHUNK_FIELDS = (
+    "id", "document_id", "workspace_id", "user_id", "chunk_text", "chunk_index",
+    "chunk_type", "token_count", "character_count", "embedding", "embedding_reduced",
+    "embedding_model", "embedding_status", "embedding_attempts", "chunking_strategy", "content_hash", "created_at", "updated_at"
+)
+VECTOR_FIELDS = {"embedding", "embedding_reduced"}
+# Embeddings are by far the largest columns and are left out unless requested
+DEFAULT_CHUNK_FIELDS = tuple(field for field in CHUNK_FIELDS if field not in VECTOR_FIELDS)
+
+def _chunk_from_row(row: Dict[str, Any]) -> DocumentChunk:
+    """Build a chunk from a document_chunks row selected with CHUNK_FIELDS"""
+    return DocumentChunk(
+        id=row["id"],
+        document_id=row["document_id"],
+        workspace_id=row["workspace_id"],
+        user_id=row["user_id"],
+        chunk_text=row["chunk_text"],
+        chunk_index=row["chunk_index"],
+        chunk_type=row["chunk_type"],
+        token_count=row["token_count"],
+        character_count=row["character_count"],
+        embedding=row["embedding"],
+        embedding_reduced=row.get("embedding_reduced"),
+        embedding_model=row["embedding_model"],
+        embedding_status=row.get("embedding_status") or EmbeddingStatus.READY,
+        embedding_attempts=row.get("embedding_attempts") or 0,
+        chunking_strategy=row["chunking_strategy"],
+        content_hash=row.get("content_hash"),
+        created_at=row["created_at"],
+        updated_at=row["updated_at"]
+    )
+
+def resolve_chunk_fields(fields: Optional[str]) -> List[str]:
+    """Parse a comma-separated fields= projection; "*" selects every column"""
+    if not fields:
+        return list(DEFAULT_CHUNK_FIELDS)
+    if fields.strip() == "*":
+        return list(CHUNK_FIELDS)
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in CHUNK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown chunk fields: {', '.join(unknown)}")
+    return requested
+
+class _InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that tracks requests in flight for the pool utilization gauge"""
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with metrics.STORAGE_REQUESTS_IN_PROGRESS.track_in_progress():
+            return await super().handle_async_request(request)
+
 class StorageService:
     def __init__(self):
         self.supabase_url = os.getenv("SUPABASE_URL")
@@ -23,10 +83,93 @@ class StorageService:
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("Missing Supabase configuration in environment variables")
         
-        self.client: Client = create_client(self.supabase_url, self.supabase_key)
+        # One async client with a keep-alive connection pool is shared by
+        # every request; it is created on first use inside the event loop
+        self.pool_size = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+        self.keepalive_seconds = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "30"))
+        self.request_timeout = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+        self.connect_timeout = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
+        self._client: Optional[AsyncClient] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
+        
+        # Bulk insert configuration
+        self.insert_batch_size = int(os.getenv("STORE_INSERT_BATCH_SIZE", "100"))
+        self.insert_concurrency = int(os.getenv("STORE_INSERT_CONCURRENCY", "4"))
+        self.insert_max_retries = int(os.getenv("STORE_INSERT_MAX_RETRIES", "3"))
+        self.insert_retry_base_delay = float(os.getenv("STORE_INSERT_RETRY_BASE_DELAY", "0.5"))
+        self._insert_semaphore = asyncio.Semaphore(self.insert_concurrency)
+        
+        # Two-stage search: HNSW over embedding_reduced, then rerank on the full embedding
+        self.use_hybrid_search = os.getenv("SEARCH_USE_HYBRID", "true").lower() == "true"
+        self.search_candidate_multiplier = int(os.getenv("SEARCH_CANDIDATE_MULTIPLIER", "3"))
+        
+        # Rows per request when reading chunks page by page
+        self.chunk_page_size = int(os.getenv("CHUNK_PAGE_SIZE", "500"))
+        
+        # Throughput of the most recent store_chunks call, in rows per second
+        self.last_insert_rows_per_second: Optional[float] = None
+        
+        # Called with the chunks after every successful store_chunks
+        self._chunk_listeners: List[Callable[[List[DocumentChunk]], None]] = []
+    
+    async def get_client(self) -> AsyncClient:
+        """Get the shared async Supabase client, creating it on first use"""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._http_client = httpx.AsyncClient(
+                        transport=_InstrumentedTransport(limits=httpx.Limits(
+                            max_connections=self.pool_size,
+                            max_keepalive_connections=self.pool_size,
+                            keepalive_expiry=self.keepalive_seconds
+                        )),
+                        timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+                        follow_redirects=True
+                    )
+                    self._client = await acreate_client(
+                        self.supabase_url,
+                        self.supabase_key,
+                        options=AsyncClientOptions(
+                            httpx_client=self._http_client,
+                            auto_refresh_token=False,
+                            persist_session=False
+                        )
+                    )
+                    logger.info(f"Created Supabase client (pool size {self.pool_size})")
+        return self._client
+    
+    async def close(self) -> None:
+        """Close pooled connections"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._client = None
+        self._http_client = None
+    
+    def on_chunks_stored(self, listener: Callable[[List[DocumentChunk]], None]) -> None:
+        """Register a callback for newly stored chunks, e.g. to update caches"""
+        self._chunk_listeners.append(listener)
+    
+    def _notify_chunks_stored(self, chunks: List[DocumentChunk]) -> None:
+        for listener in self._chunk_listeners:
+            try:
+                listener(chunks)
+            except Exception as e:
+                logger.error(f"Error in chunk listener: {str(e)}")
     
     async def store_chunks(self, chunks: List[DocumentChunk]) -> bool:
-        """Store document chunks in the database"""
+        """
+        Store document chunks in the database
+        
+        Rows are upserted on (document_id, chunk_index) in batches of
+        insert_batch_size, with up to insert_concurrency batches in flight
+        and per-batch retries, so reprocessing never creates duplicates.
+        """
+        if not chunks:
+            return True
+        
+        start_time = time.time()
+        
         try:
             # Convert chunks to dict format for Supabase
             chunk_data = []
@@ -40,31 +183,142 @@ class StorageService:
                     "chunk_type": chunk.chunk_type.value,
                     "token_count": chunk.token_count,
                     "character_count": chunk.character_count,
-                    "embedding": chunk.embedding,
+                    # pgvector text literals, far smaller than JSON float arrays
+                    "embedding": encode_vector(chunk.embedding),
+                    "embedding_reduced": encode_vector(chunk.embedding_reduced),
                     "embedding_model": chunk.embedding_model,
-                    "chunking_strategy": chunk.chunking_strategy
+                    "embedding_status": chunk.embedding_status.value,
+                    "embedding_attempts": chunk.embedding_attempts,
+                    "chunking_strategy": chunk.chunking_strategy,
+                    "content_hash": chunk.content_hash
                 }
                 chunk_data.append(data)
             
-            # Insert chunks in batch
-            result = self.client.table("document_chunks").insert(chunk_data).execute()
+            batches = [
+                chunk_data[i:i + self.insert_batch_size]
+                for i in range(0, len(chunk_data), self.insert_batch_size)
+            ]
+            results = await asyncio.gather(*(self._upsert_batch(batch) for batch in batches))
             
-            if result.data:
-                logger.info(f"Successfully stored {len(chunk_data)} chunks")
-                return True
-            else:
-                logger.error("Failed to store chunks - no data returned")
+            elapsed = max(time.time() - start_time, 1e-6)
+            self.last_insert_rows_per_second = len(chunk_data) / elapsed
+            
+            # Copy database ids back onto the stored chunks
+            chunks_by_key = {(str(chunk.document_id), chunk.chunk_index): chunk for chunk in chunks}
+            for stored_rows in results:
+                for row in stored_rows or []:
+                    chunk = chunks_by_key.get((str(row["document_id"]), row["chunk_index"]))
+                    if chunk is not None:
+                        chunk.id = UUID(str(row["id"]))
+            
+            failed_batches = results.count(None)
+            if failed_batches:
+                logger.error(f"Failed to store {failed_batches}/{len(batches)} chunk batches")
                 return False
+            
+            logger.info(
+                f"Successfully stored {len(chunk_data)} chunks in {len(batches)} batches "
+                f"({self.last_insert_rows_per_second:.1f} rows/s)"
+            )
+            
+            self._notify_chunks_stored(chunks)
+            return True
                 
         except Exception as e:
             logger.error(f"Error storing chunks: {str(e)}")
             return False
     
-    async def update_document_status(self, document_id: UUID, status: str) -> bool:
-        """Update document processing status"""
+    async def _upsert_batch(self, rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Upsert one batch of chunk rows, retrying with exponential backoff
+        
+        Returns the stored rows, or None if every attempt failed.
+        """
+        first_index = rows[0]["chunk_index"]
+        last_index = rows[-1]["chunk_index"]
+        client = await self.get_client()
+        
+        async with self._insert_semaphore:
+            for attempt in range(self.insert_max_retries + 1):
+                try:
+                    with metrics.STORE_BATCH_DURATION.time():
+                        result = await client.table("document_chunks").upsert(
+                            rows, on_conflict="document_id,chunk_index"
+                        ).execute()
+                    if result.data:
+                        metrics.STORE_ROWS.inc(len(result.data))
+                        return result.data
+                    raise Exception("no data returned")
+                
+                except Exception as e:
+                    if attempt == self.insert_max_retries:
+                        metrics.STORE_FAILURES.inc()
+                        logger.error(
+                            f"Error storing chunks {first_index}-{last_index} "
+                            f"after {attempt + 1} attempts: {str(e)}"
+                        )
+                        return None
+                    
+                    metrics.STORE_RETRIES.inc()
+                    delay = self.insert_retry_base_delay * (2 ** attempt) * (1 + random.random())
+                    logger.warning(
+                        f"Storing chunks {first_index}-{last_index} failed ({str(e)}), "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+        
+        return None
+    
+    async def upsert_document(self, metadata: DocumentMetadata) -> bool:
+        """Create or update the documents row for a document"""
+        return metadata.document_id in await self.upsert_documents([metadata])
+    
+    async def upsert_documents(self, documents: List[DocumentMetadata]) -> Set[UUID]:
+        """
+        Create or update the documents rows for many documents, e.g. for bulk ingestion
+        
+        Rows are sent insert_batch_size per request. Returns the ids of the
+        documents whose rows were written; a failed request leaves its
+        batch out.
+        """
+        written: Set[UUID] = set()
+        for i in range(0, len(documents), self.insert_batch_size):
+            batch = documents[i:i + self.insert_batch_size]
+            try:
+                client = await self.get_client()
+                result = await client.table("documents").upsert([
+                    {
+                        "document_id": str(metadata.document_id),
+                        "workspace_id": metadata.workspace_id,
+                        "user_id": metadata.user_id,
+                        "original_name": metadata.original_name,
+                        "file_name": metadata.file_name,
+                        "file_path": metadata.file_path,
+                        "public_url": metadata.public_url,
+                        "file_size": metadata.file_size,
+                        "file_type": metadata.file_type,
+                        "file_extension": metadata.file_extension
+                    }
+                    for metadata in batch
+                ], on_conflict="document_id").execute()
+                written.update(UUID(row["document_id"]) for row in result.data or [])
+                
+            except Exception as e:
+                logger.error(f"Error upserting {len(batch)} documents: {str(e)}")
+        return written
+    
+    async def update_document_status(
+        self, 
+        document_id: UUID, 
+        status: str, 
+        stage: Optional[str] = None
+    ) -> bool:
+        """Update document processing status and current pipeline stage"""
         try:
-            result = self.client.table("documents").update({
+            client = await self.get_client()
+            result = await client.table("documents").update({
                 "processing_status": status,
+                "processing_stage": stage,
                 "processed_at": "now()" if status == "processed" else None
             }).eq("document_id", str(document_id)).execute()
             
@@ -74,22 +328,58 @@ class StorageService:
             logger.error(f"Error updating document status: {str(e)}")
             return False
     
+    async def update_document_conversion(self, document_id: UUID, report: ConversionReport) -> bool:
+        """Record the conversion profile and timings chosen for a document"""
+        try:
+            client = await self.get_client()
+            result = await client.table("documents").update({
+                "conversion_profile": report.profile.value,
+                "conversion_report": report.model_dump(mode="json")
+            }).eq("document_id", str(document_id)).execute()
+            
+            return len(result.data) > 0
+            
+        except Exception as e:
+            logger.error(f"Error recording conversion for document {document_id}: {str(e)}")
+            return False
+    
     async def search_similar_chunks(
         self, 
-        query_embedding: List[float], 
+        query_embedding: np.ndarray, 
         workspace_id: str,
         similarity_threshold: float = 0.7,
-        max_results: int = 10
+        max_results: int = 10,
+        query_embedding_reduced: Optional[np.ndarray] = None
     ) -> List[SearchResult]:
-        """Search for similar chunks using vector similarity"""
+        """
+        Search for similar chunks using vector similarity
+        
+        When a reduced query embedding is given, uses the two-stage
+        search_similar_chunks_hybrid function (indexed candidate search on
+        embedding_reduced, reranked on the full embedding). Otherwise falls
+        back to the sequential-scan search_similar_chunks function.
+        """
         try:
-            # Use the stored function for similarity search
-            result = self.client.rpc("search_similar_chunks", {
-                "query_embedding": query_embedding,
-                "workspace_filter": workspace_id,
-                "similarity_threshold": similarity_threshold,
-                "match_count": max_results
-            }).execute()
+            client = await self.get_client()
+            if self.use_hybrid_search and query_embedding_reduced is not None:
+                with metrics.SEARCH_RPC_DURATION.time(function="search_similar_chunks_hybrid"):
+                    result = await client.rpc("search_similar_chunks_hybrid", {
+                        "query_embedding_full": encode_vector(query_embedding, "float32"),
+                        "query_embedding_reduced": encode_vector(query_embedding_reduced, "float32"),
+                        "workspace_filter": workspace_id,
+                        "similarity_threshold": similarity_threshold,
+                        "match_count": max_results,
+                        "candidate_multiplier": self.search_candidate_multiplier
+                    }).execute()
+            else:
+                # Use the stored function for similarity search
+                with metrics.SEARCH_RPC_DURATION.time(function="search_similar_chunks"):
+                    result = await client.rpc("search_similar_chunks", {
+                        "query_embedding": encode_vector(query_embedding, "float32"),
+                        "workspace_filter": workspace_id,
+                        "similarity_threshold": similarity_threshold,
+                        "match_count": max_results
+                    }).execute()
             
             if result.data:
                 search_results = []
@@ -111,38 +401,265 @@ class StorageService:
             logger.error(f"Error searching similar chunks: {str(e)}")
             return []
     
+    async def search_lexical_chunks(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        workspace_id: str,
+        max_results: int = 10
+    ) -> List[SearchResult]:
+        """
+        Full-text search over chunk_text, ranked by ts_rank_cd
+        
+        Uses the search_chunks_lexical function. Results carry their cosine
+        similarity to the query embedding so they can be fused with vector
+        results.
+        """
+        try:
+            client = await self.get_client()
+            with metrics.SEARCH_RPC_DURATION.time(function="search_chunks_lexical"):
+                result = await client.rpc("search_chunks_lexical", {
+                    "query_text": query,
+                    "query_embedding_full": encode_vector(query_embedding, "float32"),
+                    "workspace_filter": workspace_id,
+                    "match_count": max_results
+                }).execute()
+            
+            return [
+                SearchResult(
+                    id=row["id"],
+                    document_id=row["document_id"],
+                    chunk_text=row["chunk_text"],
+                    chunk_type=row["chunk_type"],
+                    similarity=row["similarity"]
+                )
+                for row in result.data or []
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error searching chunks by text: {str(e)}")
+            return []
+    
+    async def get_document_chunk_page(
+        self,
+        document_id: UUID,
+        after_index: int = -1,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one page of a document's chunks as raw rows
+        
+        Keyset pagination on chunk_index: returns up to limit rows with
+        chunk_index > after_index, selecting only the requested columns.
+        Vector columns are decoded to float32 arrays.
+        """
+        columns = list(fields or DEFAULT_CHUNK_FIELDS)
+        if "chunk_index" not in columns:
+            # The cursor for the next page
+            columns.append("chunk_index")
+        
+        client = await self.get_client()
+        result = await client.table("document_chunks").select(",".join(columns)).eq(
+            "document_id", str(document_id)
+        ).gt("chunk_index", after_index).order("chunk_index").limit(
+            limit or self.chunk_page_size
+        ).execute()
+        
+        rows = result.data or []
+        for row in rows:
+            for field in VECTOR_FIELDS.intersection(row):
+                row[field] = decode_vector(row[field])
+        return rows
+    
+    async def iter_document_chunk_pages(
+        self,
+        document_id: UUID,
+        after_index: int = -1,
+        fields: Optional[List[str]] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield a document's chunks page by page, so memory stays bounded by page_size"""
+        page_size = page_size or self.chunk_page_size
+        while True:
+            rows = await self.get_document_chunk_page(document_id, after_index, page_size, fields)
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            after_index = rows[-1]["chunk_index"]
+    
     async def get_document_chunks(self, document_id: UUID) -> List[DocumentChunk]:
         """Get all chunks for a specific document"""
         try:
-            result = self.client.table("document_chunks").select("*").eq(
-                "document_id", str(document_id)
-            ).order("chunk_index").execute()
+            chunks = []
+            async for rows in self.iter_document_chunk_pages(document_id, fields=list(CHUNK_FIELDS)):
+                chunks.extend(_chunk_from_row(row) for row in rows)
             
-            if result.data:
-                chunks = []
-                for row in result.data:
-                    chunk = DocumentChunk(
-                        id=row["id"],
-                        document_id=row["document_id"],
-                        workspace_id=row["workspace_id"],
-                        user_id=row["user_id"],
-                        chunk_text=row["chunk_text"],
-                        chunk_index=row["chunk_index"],
-                        chunk_type=row["chunk_type"],
-                        token_count=row["token_count"],
-                        character_count=row["character_count"],
-                        embedding=row["embedding"],
-                        embedding_model=row["embedding_model"],
-                        chunking_strategy=row["chunking_strategy"],
-                        created_at=row["created_at"],
-                        updated_at=row["updated_at"]
-                    )
-                    chunks.append(chunk)
-                
-                return chunks
-            else:
-                return []
+            return chunks
                 
         except Exception as e:
             logger.error(f"Error getting document chunks: {str(e)}")
             return []
+    
+    async def get_workspace_chunk_page(
+        self,
+        workspace_id: str,
+        after_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one page of a workspace's chunks as raw rows with every column
+        
+        Keyset pagination on id, whatever the processing status of the
+        chunks' documents. Vector columns are decoded to float32 arrays.
+        """
+        client = await self.get_client()
+        query = client.table("document_chunks").select(",".join(CHUNK_FIELDS)).eq("workspace_id", workspace_id)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        result = await query.order("id").limit(limit or self.chunk_page_size).execute()
+        
+        rows = result.data or []
+        for row in rows:
+            for field in VECTOR_FIELDS.intersection(row):
+                row[field] = decode_vector(row[field])
+        return rows
+    
+    async def iter_workspace_chunks(
+        self,
+        workspace_id: str,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[DocumentChunk]]:
+        """Yield every chunk stored for a workspace page by page; raises if a page can't be read"""
+        page_size = page_size or self.chunk_page_size
+        after_id = None
+        while True:
+            rows = await self.get_workspace_chunk_page(workspace_id, after_id, page_size)
+            if rows:
+                yield [_chunk_from_row(row) for row in rows]
+            if len(rows) < page_size:
+                return
+            after_id = str(rows[-1]["id"])
+    
+    async def delete_chunks_from(self, document_id: UUID, from_index: int) -> int:
+        """Delete a document's chunks with chunk_index >= from_index, returning how many"""
+        try:
+            client = await self.get_client()
+            result = await client.table("document_chunks").delete().eq(
+                "document_id", str(document_id)
+            ).gte("chunk_index", from_index).execute()
+            return len(result.data or [])
+            
+        except Exception as e:
+            logger.error(f"Error deleting stale chunks for document {document_id}: {str(e)}")
+            return 0
+    
+    async def get_pending_chunks(self, limit: int) -> List[DocumentChunk]:
+        """
+        Get chunks whose embedding is still pending, without vector columns
+        
+        Chunks with the fewest repair attempts come first, oldest first.
+        """
+        try:
+            client = await self.get_client()
+            result = await client.table("document_chunks").select(",".join(DEFAULT_CHUNK_FIELDS)).eq(
+                "embedding_status", EmbeddingStatus.PENDING.value
+            ).order("embedding_attempts").order("created_at").limit(limit).execute()
+            
+            return [DocumentChunk(**row) for row in result.data or []]
+            
+        except Exception as e:
+            logger.error(f"Error getting pending chunks: {str(e)}")
+            return []
+    
+    async def complete_chunk_embeddings(self, chunks: List[DocumentChunk]) -> Optional[List[DocumentChunk]]:
+        """
+        Store repaired embeddings for pending chunks
+        
+        Only the embedding columns are written, and only where the row is
+        still pending with the same content_hash, so a document reprocessed
+        in the meantime is not overwritten with stale text. Returns the
+        chunks that were updated, or None if the request failed.
+        """
+        if not chunks:
+            return []
+        
+        try:
+            client = await self.get_client()
+            result = await client.rpc("complete_chunk_embeddings", {
+                "updates": [
+                    {
+                        "id": str(chunk.id),
+                        "content_hash": chunk.content_hash,
+                        "embedding": encode_vector(chunk.embedding),
+                        "embedding_reduced": encode_vector(chunk.embedding_reduced),
+                        "embedding_model": chunk.embedding_model
+                    }
+                    for chunk in chunks
+                ]
+            }).execute()
+            
+            # SETOF uuid comes back as a JSON array of ids
+            updated_ids = {str(chunk_id) for chunk_id in result.data or []}
+            updated = [chunk for chunk in chunks if str(chunk.id) in updated_ids]
+            self._notify_chunks_stored(updated)
+            return updated
+            
+        except Exception as e:
+            logger.error(f"Error storing repaired embeddings: {str(e)}")
+            return None
+    
+    async def record_chunk_embedding_failures(self, chunk_ids: List[UUID], max_attempts: int) -> int:
+        """Count a failed repair attempt per chunk, returning how many reached max_attempts and were marked failed"""
+        if not chunk_ids:
+            return 0
+        
+        try:
+            client = await self.get_client()
+            result = await client.rpc("record_chunk_embedding_failures", {
+                "chunk_ids": [str(chunk_id) for chunk_id in chunk_ids],
+                "max_attempts": max_attempts
+            }).execute()
+            return int(result.data or 0)
+            
+        except Exception as e:
+            logger.error(f"Error recording embedding failures: {str(e)}")
+            return 0
+    
+    async def count_pending_chunks(self) -> Optional[int]:
+        """Count chunks whose embedding is still pending, or None if the count failed"""
+        try:
+            client = await self.get_client()
+            result = await client.table("document_chunks").select("id", count="exact").eq(
+                "embedding_status", EmbeddingStatus.PENDING.value
+            ).limit(1).execute()
+            return result.count or 0
+            
+        except Exception as e:
+            logger.error(f"Error counting pending chunks: {str(e)}")
+            return None
+    
+    async def get_chunk_watermark(self, workspace_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the number of chunks in a workspace and their latest updated_at
+        
+        Changes whenever chunks are stored, repaired or deleted, so a derived
+        copy recorded with a watermark can tell it has fallen behind. Returns
+        None if the request failed.
+        """
+        try:
+            client = await self.get_client()
+            result = await client.table("document_chunks").select("updated_at", count="exact").eq(
+                "workspace_id", workspace_id
+            ).order("updated_at", desc=True).limit(1).execute()
+            
+            rows = result.data or []
+            return {
+                "count": result.count or 0,
+                "updated_at": rows[0]["updated_at"] if rows else None
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting chunk watermark for workspace {workspace_id}: {str(e)}")
+            return None
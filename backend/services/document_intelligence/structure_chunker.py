@@ -0,0 +1,119 @@
+"""
+Structure-aware chunker driven by the Docling document tree
+"""
+
+import logging
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from .models import ChunkType, DocumentBlock
+
+logger = logging.getLogger(__name__)
+
+HEADING_BLOCK_TYPES = {"title", "section_header"}
+TABLE_BLOCK_TYPES = {"table"}
+
+class StructureChunker:
+    """
+    Groups Docling blocks into chunks within a token budget
+
+    Works in a single pass over the blocks in reading order:
+    - headings start a new chunk and stay attached to the body that follows,
+      and are repeated on each piece of a paragraph too long to fit
+    - tables are never merged with body text; a table that exceeds the
+      budget is split between rows with its header repeated
+    - paragraphs are packed together until the budget is reached
+    Chunk types come from the element types that make up each chunk.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        split_text: Callable[[str], List[str]],
+        chunk_size: int = 512
+    ):
+        self.count_tokens = count_tokens
+        self.split_text = split_text
+        self.chunk_size = chunk_size
+
+    def chunk(self, blocks: Iterable[DocumentBlock]) -> Iterator[Tuple[str, ChunkType]]:
+        """Yield (chunk_text, chunk_type) pairs"""
+        parts: List[str] = []
+        tokens = 0
+        has_body = False
+
+        def flush() -> Iterator[Tuple[str, ChunkType]]:
+            nonlocal parts, tokens, has_body
+            if parts:
+                chunk_type = ChunkType.PARAGRAPH if has_body else ChunkType.HEADING
+                yield "\n\n".join(parts), chunk_type
+            parts, tokens, has_body = [], 0, False
+
+        for block in blocks:
+            text = block.text.strip()
+            if not text:
+                continue
+            block_tokens = self.count_tokens(text)
+
+            if block.block_type in HEADING_BLOCK_TYPES:
+                # A heading closes the previous section's body
+                if has_body:
+                    yield from flush()
+                parts.append(f"{'#' * min(max(block.level, 1), 6)} {text}")
+                tokens += block_tokens
+                continue
+
+            if block.block_type in TABLE_BLOCK_TYPES:
+                # Keep the table with its heading(s) but not with body text
+                if has_body:
+                    yield from flush()
+                heading_prefix = "\n\n".join(parts)
+                heading_tokens = tokens
+                parts, tokens = [], 0
+
+                if heading_tokens + block_tokens <= self.chunk_size:
+                    yield "\n\n".join(filter(None, [heading_prefix, text])), ChunkType.TABLE
+                else:
+                    for piece in self._split_table(text, self.chunk_size - heading_tokens):
+                        yield "\n\n".join(filter(None, [heading_prefix, piece])), ChunkType.TABLE
+                continue
+
+            if tokens + block_tokens > self.chunk_size and has_body:
+                yield from flush()
+
+            if block_tokens > self.chunk_size:
+                # Oversized paragraph - fall back to token splitting, with
+                # any pending heading(s) carried on every piece
+                heading_prefix = "\n\n".join(parts)
+                parts, tokens = [], 0
+                for piece in self.split_text(text):
+                    yield "\n\n".join(filter(None, [heading_prefix, piece])), ChunkType.PARAGRAPH
+                continue
+
+            parts.append(text)
+            tokens += block_tokens
+            has_body = True
+
+        yield from flush()
+
+    def _split_table(self, table_markdown: str, budget: int) -> Iterator[str]:
+        """Split a Markdown table between rows, repeating the header row"""
+        lines = table_markdown.splitlines()
+        if len(lines) < 3:
+            yield from self.split_text(table_markdown)
+            return
+
+        header = lines[:2]
+        header_tokens = self.count_tokens("\n".join(header))
+        rows: List[str] = []
+        rows_tokens = 0
+
+        for line in lines[2:]:
+            line_tokens = self.count_tokens(line)
+            if rows and header_tokens + rows_tokens + line_tokens > budget:
+                yield "\n".join(header + rows)
+                rows, rows_tokens = [], 0
+            rows.append(line)
+            rows_tokens += line_tokens
+
+        if rows:
+            yield "\n".join(header + rows)
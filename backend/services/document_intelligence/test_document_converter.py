@@ -0,0 +1,86 @@
+"""
+Tests for page-range sharding: splitting page ranges and joining tables across shard boundaries
+"""
+
+import json
+import os
+import sys
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.document_converter import join_continued_table, merge_shards, split_page_range
+
+FIRST = "| Account | FY2024 |\n|---|---|\n| Cash | 1,200 |"
+
+def test_split_page_range_is_contiguous_and_near_equal():
+    assert split_page_range(10, 4) == [(1, 3), (4, 6), (7, 8), (9, 10)]
+    assert split_page_range(9, 3) == [(1, 3), (4, 6), (7, 9)]
+    assert split_page_range(7, 1) == [(1, 7)]
+
+def test_split_page_range_caps_shards_to_pages():
+    assert split_page_range(3, 8) == [(1, 1), (2, 2), (3, 3)]
+    assert split_page_range(5, 0) == [(1, 5)]
+
+def test_repeated_header_is_dropped():
+    second = "| Account | FY2024 |\n|---|---|\n| Debtors | 2 |"
+
+    assert join_continued_table(FIRST, second) == (
+        "| Account | FY2024 |\n|---|---|\n| Cash | 1,200 |\n| Debtors | 2 |"
+    )
+
+def test_data_row_taken_as_header_is_kept():
+    # Docling makes the first row of the fragment a header; it is shaped like the last row
+    second = "| Debtors | (300) |\n|---|---|\n| GST | 3 |"
+
+    assert join_continued_table(FIRST, second) == (
+        "| Account | FY2024 |\n|---|---|\n| Cash | 1,200 |\n| Debtors | (300) |\n| GST | 3 |"
+    )
+
+def test_unrelated_table_is_not_joined():
+    second = "| Name | Role |\n|---|---|\n| Alice | Partner |"
+
+    assert join_continued_table(FIRST, second) is None
+
+def test_row_shaped_like_the_header_is_not_joined():
+    # With a year in the header, a text-and-figure row could be a new table's header
+    first = "| Account | 2024 |\n|---|---|\n| Cash | 1,200 |"
+    second = "| Revenue | 2023 |\n|---|---|\n| Sales | 900 |"
+
+    assert join_continued_table(first, second) is None
+
+def test_column_count_mismatch_or_non_table_is_not_joined():
+    second = "| Debtors | 2 | 3 |\n|---|---|---|\n| GST | 3 | 4 |"
+
+    assert join_continued_table(FIRST, second) is None
+    assert join_continued_table(FIRST, "Notes to the accounts") is None
+
+def test_merge_markdown_shards_joins_boundary_table():
+    parts = [
+        "# Balance sheet\n\n" + FIRST,
+        "| Account | FY2024 |\n|---|---|\n| Debtors | 2 |\n\nSigned by the directors"
+    ]
+
+    assert merge_shards(parts, "markdown") == (
+        "# Balance sheet\n\n"
+        "| Account | FY2024 |\n|---|---|\n| Cash | 1,200 |\n| Debtors | 2 |\n\n"
+        "Signed by the directors"
+    )
+
+def test_merge_block_shards_joins_only_table_blocks():
+    first = [{"block_type": "text", "text": "Intro", "page_no": 1}, {"block_type": "table", "text": FIRST, "page_no": 2}]
+    second = [
+        {"block_type": "table", "text": "| Account | FY2024 |\n|---|---|\n| Debtors | 2 |", "page_no": 3},
+        {"block_type": "text", "text": "Outro", "page_no": 3}
+    ]
+    third = [{"block_type": "text", "text": FIRST, "page_no": 4}]
+
+    blocks = json.loads(merge_shards([json.dumps(first), json.dumps(second), json.dumps(third)], "blocks"))
+
+    assert [block["block_type"] for block in blocks] == ["text", "table", "text", "text"]
+    assert blocks[1] == {
+        "block_type": "table",
+        "text": "| Account | FY2024 |\n|---|---|\n| Cash | 1,200 |\n| Debtors | 2 |",
+        "page_no": 2
+    }
+    assert blocks[3]["text"] == FIRST
@@ -0,0 +1,67 @@
+"""
+Tests for the persistent embedding cache: row reuse across crashes and per-process stores
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.embedding_cache import EmbeddingCache
+
+def _vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    cache.put_many(["a", "b"], [_vector(1), _vector(2)])
+    cache.close()
+
+    reopened = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    a, b, c = reopened.get_many(["a", "b", "c"])
+
+    assert np.array_equal(a, _vector(1))
+    assert np.array_equal(b, _vector(2))
+    assert c is None
+    reopened.close()
+
+def test_row_reused_after_the_last_flush_is_not_served_after_a_crash(tmp_path):
+    cache = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=2)
+    cache.put_many(["a", "b"], [_vector(1), _vector(2)])
+    cache.flush()
+    # Evicts "a" and reuses its row; the saved index still maps "a" to it
+    cache.put_many(["c"], [_vector(3)])
+    # The process dies here: rows reach disk through the shared mapping, the index does not
+    cache._vectors.flush()
+    cache._keys.flush()
+    os.close(cache._lock_fd)
+    cache._lock_fd = None
+
+    reopened = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=2)
+    a, b = reopened.get_many(["a", "b"])
+
+    assert a is None
+    assert np.array_equal(b, _vector(2))
+    # The reused row is free again
+    assert reopened.put_many(["d"], [_vector(4)]) == 1
+    assert np.array_equal(reopened.get_many(["b"])[0], _vector(2))
+    reopened.close()
+
+def test_concurrent_caches_use_separate_stores(tmp_path):
+    first = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    second = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+
+    assert first.stats()["store"] != second.stats()["store"]
+
+    second.put_many(["a"], [_vector(1)])
+    assert first.get_many(["a"]) == [None]
+
+    first.close()
+    second.close()
+    # Once released, the first store is taken again
+    third = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    assert third.stats()["store"] == first.stats()["store"]
+    third.close()
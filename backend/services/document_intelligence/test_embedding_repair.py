@@ -0,0 +1,97 @@
+"""
+Tests for the background repair of chunks stored without embeddings
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.benchmarks.fakes import FakeGenAIClient, InMemoryStorageService
+from document_intelligence.embedding_providers import GeminiEmbeddingProvider
+from document_intelligence.embedding_repair import EmbeddingRepairWorker
+from document_intelligence.embedding_service import EmbeddingService
+from document_intelligence.models import EmbeddingStatus
+
+DIMENSION = 16
+REDUCED_DIMENSION = 8
+
+class OtherEmbeddingProvider(GeminiEmbeddingProvider):
+    """A second backend, so workspaces can be split between two breakers"""
+
+    backend = "other"
+
+def _environ(monkeypatch, breaker_failures: int = 1, max_attempts: int = 5) -> None:
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    monkeypatch.setenv("EMBEDDING_REDUCED_DIMENSION", str(REDUCED_DIMENSION))
+    monkeypatch.setenv("EMBEDDING_BREAKER_FAILURES", str(breaker_failures))
+    monkeypatch.setenv("EMBEDDING_REPAIR_MAX_ATTEMPTS", str(max_attempts))
+
+def _embedder(client: FakeGenAIClient, provider_class=GeminiEmbeddingProvider) -> EmbeddingService:
+    return EmbeddingService(provider_class(client), embedding_dimension=DIMENSION)
+
+def _pending_storage(*workspace_ids: str) -> InMemoryStorageService:
+    storage = InMemoryStorageService()
+    for seed, workspace_id in enumerate(workspace_ids):
+        storage.load_synthetic_chunks(workspace_id, 3, DIMENSION, REDUCED_DIMENSION, seed=seed)
+    for row in storage.rows.values():
+        row.update(embedding=None, embedding_reduced=None, embedding_status=EmbeddingStatus.PENDING.value)
+    return storage
+
+def _statuses(storage: InMemoryStorageService, workspace_id: str):
+    return [row["embedding_status"] for row in storage.rows.values() if row["workspace_id"] == workspace_id]
+
+def test_pending_chunks_are_embedded_and_completed(monkeypatch):
+    _environ(monkeypatch)
+    storage = _pending_storage("acme")
+    client = FakeGenAIClient(dimension=DIMENSION, latency_ms=0)
+    embedder = _embedder(client)
+    worker = EmbeddingRepairWorker(storage, lambda workspace_id: embedder)
+
+    repaired = asyncio.run(worker.repair_once())
+
+    assert repaired == 3
+    assert worker.backlog == 0
+    assert _statuses(storage, "acme") == ["ready"] * 3
+    for row in storage.rows.values():
+        assert row["embedding"].shape == (DIMENSION,)
+        assert row["embedding_reduced"].shape == (REDUCED_DIMENSION,)
+        assert row["embedding_model"] == embedder.embedding_model
+    assert asyncio.run(storage.count_pending_chunks()) == 0
+
+def test_backend_with_open_breaker_is_skipped(monkeypatch):
+    _environ(monkeypatch)
+    storage = _pending_storage("acme", "globex")
+    client = FakeGenAIClient(dimension=DIMENSION, latency_ms=0)
+    down_client = FakeGenAIClient(dimension=DIMENSION, latency_ms=0)
+    embedders = {"acme": _embedder(client), "globex": _embedder(down_client, OtherEmbeddingProvider)}
+    embedders["globex"].breaker.on_failure()
+    worker = EmbeddingRepairWorker(storage, embedders.__getitem__)
+
+    repaired = asyncio.run(worker.repair_once())
+
+    assert repaired == 3
+    assert worker.deferred == 3
+    assert _statuses(storage, "acme") == ["ready"] * 3
+    assert _statuses(storage, "globex") == ["pending"] * 3
+    # Deferred chunks were never sent and keep their attempts
+    assert down_client.requests == 0
+    assert all(row["embedding_attempts"] == 0 for row in storage.rows.values())
+
+def test_failed_chunks_are_given_up_after_max_attempts(monkeypatch):
+    _environ(monkeypatch, breaker_failures=10, max_attempts=2)
+    storage = _pending_storage("acme")
+    client = FakeGenAIClient(dimension=DIMENSION, latency_ms=0, failure_rate=1.0)
+    embedder = _embedder(client)
+    worker = EmbeddingRepairWorker(storage, lambda workspace_id: embedder)
+
+    assert asyncio.run(worker.repair_once()) == 0
+    assert _statuses(storage, "acme") == ["pending"] * 3
+    assert asyncio.run(worker.repair_once()) == 0
+
+    assert _statuses(storage, "acme") == ["failed"] * 3
+    assert worker.failed == 6
+    assert worker.gave_up == 3
+    assert worker.backlog == 0
@@ -0,0 +1,155 @@
+"""
+Tests for embedding request scheduling: priority lanes, token buckets and the circuit breaker
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence import embedding_scheduler
+from document_intelligence.embedding_scheduler import CircuitBreaker, EmbeddingScheduler, Priority, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_interactive_lane_is_served_before_bulk():
+    async def run():
+        scheduler = EmbeddingScheduler(max_concurrency=1, backend="test", rate_limited=False)
+        order = []
+
+        async def request(name: str, priority: Priority) -> None:
+            async with scheduler.slot(priority, tokens=1):
+                order.append(name)
+
+        async with scheduler.slot(Priority.BULK, tokens=1):
+            # Queued while the only slot is taken: bulk first, then interactive
+            bulk = asyncio.create_task(request("bulk", Priority.BULK))
+            await asyncio.sleep(0)
+            interactive = asyncio.create_task(request("interactive", Priority.INTERACTIVE))
+            await asyncio.sleep(0)
+            assert scheduler.depth(Priority.BULK) == 1
+            assert scheduler.depth(Priority.INTERACTIVE) == 1
+
+        await asyncio.gather(bulk, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "bulk"]
+
+def test_same_lane_is_first_come_first_served():
+    async def run():
+        scheduler = EmbeddingScheduler(max_concurrency=1, backend="test", rate_limited=False)
+        order = []
+
+        async def request(n: int) -> None:
+            async with scheduler.slot(Priority.BULK, tokens=1):
+                order.append(n)
+
+        async with scheduler.slot(Priority.BULK, tokens=1):
+            tasks = []
+            for n in range(3):
+                tasks.append(asyncio.create_task(request(n)))
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == [0, 1, 2]
+
+def test_token_bucket_refills_continuously_up_to_capacity():
+    bucket = TokenBucket(per_minute=60)
+    bucket.level = 0
+    start = bucket._updated
+
+    bucket.refill(start + 30, rate_scale=1.0)
+    assert bucket.level == 30
+
+    # A halved rate refills half as fast
+    bucket.refill(start + 40, rate_scale=0.5)
+    assert bucket.level == 35
+
+    bucket.refill(start + 600, rate_scale=1.0)
+    assert bucket.level == 60
+
+def test_token_bucket_wait_covers_amount_and_reserve():
+    bucket = TokenBucket(per_minute=60)
+    bucket.level = 10
+
+    assert bucket.seconds_until(5, reserve=0, rate_scale=1.0) == 0
+    # 5 more are needed to leave a reserve of 10, at one per second
+    assert bucket.seconds_until(5, reserve=10, rate_scale=1.0) == 5
+    assert bucket.seconds_until(5, reserve=10, rate_scale=0.5) == 10
+    # Larger than the bucket: wait until it is full, then drain it
+    assert bucket.seconds_until(600, reserve=0, rate_scale=1.0) == 50
+
+def test_bulk_requests_leave_the_interactive_reserve(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_RPM_LIMIT", "60")
+    monkeypatch.setenv("EMBEDDING_TPM_LIMIT", "0")
+    monkeypatch.setenv("EMBEDDING_INTERACTIVE_RESERVE", "0.5")
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_scheduler, "time", SimpleNamespace(monotonic=clock))
+
+    scheduler = EmbeddingScheduler(max_concurrency=1, backend="test")
+    bucket, _ = scheduler._buckets[0]
+    bucket.level = 30
+
+    # 30 of 60 requests left: interactive may take one, bulk has to wait for the reserve plus one
+    assert scheduler._seconds_until_ready(Priority.INTERACTIVE, tokens=1) == 0
+    assert scheduler._seconds_until_ready(Priority.BULK, tokens=1) == 1
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("EMBEDDING_BREAKER_RESET_SECONDS", "30")
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_scheduler, "time", SimpleNamespace(monotonic=clock))
+
+    breaker = CircuitBreaker(backend="test")
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.opened == 1
+
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe is let through
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.on_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+    assert breaker.allow()
+
+def test_failed_probe_reopens_the_breaker(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BREAKER_FAILURES", "1")
+    monkeypatch.setenv("EMBEDDING_BREAKER_RESET_SECONDS", "30")
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_scheduler, "time", SimpleNamespace(monotonic=clock))
+
+    breaker = CircuitBreaker(backend="test")
+    breaker.on_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+    # A probe that never reports back is replaced after reset_seconds
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 31
+    assert breaker.allow()
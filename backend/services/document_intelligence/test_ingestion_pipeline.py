@@ -0,0 +1,141 @@
+"""
+Tests for the streaming chunk, embed and store pipeline in the RAG service
+"""
+
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.benchmarks.fakes import FakeGenAIClient, InMemoryStorageService
+from document_intelligence.models import ChunkType, DocumentMetadata, EmbeddingStatus, ProcessingStage
+from document_intelligence.rag_service import RAGService
+
+DIMENSION = 16
+
+def _rag_service(monkeypatch, storage: InMemoryStorageService, **client_options) -> RAGService:
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    monkeypatch.setenv("EMBEDDING_REDUCED_DIMENSION", "8")
+    monkeypatch.setenv("EMBEDDING_BATCH_SIZE", "3")
+    monkeypatch.setenv("EMBEDDING_COALESCE_MS", "0")
+    monkeypatch.setenv("STORE_BATCH_SIZE", "4")
+    monkeypatch.setenv("INGEST_PIPELINE_DEPTH", "1")
+    return RAGService(
+        storage=storage,
+        genai_client=FakeGenAIClient(dimension=DIMENSION, latency_ms=0, **client_options),
+        embedding_dimension=DIMENSION
+    )
+
+def _metadata() -> DocumentMetadata:
+    return DocumentMetadata(
+        document_id=uuid4(),
+        workspace_id="acme",
+        user_id="user",
+        original_name="report.pdf",
+        file_name="report.pdf",
+        file_path="/tmp/report.pdf",
+        public_url="",
+        file_size=1,
+        file_type="application/pdf",
+        file_extension="pdf"
+    )
+
+async def _chunk_stream(texts, produced=None):
+    for text in texts:
+        if produced is not None:
+            produced.append(text)
+        yield text, ChunkType.PARAGRAPH
+        await asyncio.sleep(0)
+
+def _stored_texts(storage: InMemoryStorageService, metadata: DocumentMetadata):
+    return [chunk.chunk_text for chunk in storage.to_chunks(metadata.document_id)]
+
+def test_chunks_are_embedded_and_stored_in_order_across_batches(monkeypatch):
+    storage = InMemoryStorageService()
+    rag_service = _rag_service(monkeypatch, storage)
+    metadata = _metadata()
+    texts = [f"Paragraph {i} about revenue" for i in range(10)]
+    batches = []
+
+    total = asyncio.run(rag_service.process_chunk_stream(
+        _chunk_stream(texts), metadata, "structure", on_stored=batches.append
+    ))
+
+    assert total == 10
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    chunks = storage.to_chunks(metadata.document_id)
+    assert [chunk.chunk_index for chunk in chunks] == list(range(10))
+    assert [chunk.chunk_text for chunk in chunks] == texts
+    for chunk in chunks:
+        assert chunk.embedding_status == EmbeddingStatus.READY
+        assert chunk.embedding.shape == (DIMENSION,)
+        assert chunk.embedding_reduced.shape == (8,)
+
+def test_storing_starts_before_the_input_is_consumed(monkeypatch):
+    storage = InMemoryStorageService()
+    rag_service = _rag_service(monkeypatch, storage)
+    texts = [f"Paragraph {i}" for i in range(30)]
+    produced = []
+    produced_when_stored = []
+
+    asyncio.run(rag_service.process_chunk_stream(
+        _chunk_stream(texts, produced),
+        _metadata(),
+        "structure",
+        on_stored=lambda batch: produced_when_stored.append(len(produced))
+    ))
+
+    assert produced_when_stored[0] < len(texts)
+
+def test_stages_are_reported(monkeypatch):
+    storage = InMemoryStorageService()
+    rag_service = _rag_service(monkeypatch, storage)
+    stages = []
+
+    @asynccontextmanager
+    async def stage(name: ProcessingStage):
+        stages.append(name)
+        yield
+
+    asyncio.run(rag_service.process_chunk_stream(
+        _chunk_stream(["One", "Two", "Three", "Four"]), _metadata(), "structure", stage=stage
+    ))
+
+    assert stages.count(ProcessingStage.EMBEDDING) == 2
+    assert stages.count(ProcessingStage.STORING) == 1
+
+def test_failed_embeddings_are_stored_as_pending(monkeypatch):
+    storage = InMemoryStorageService()
+    rag_service = _rag_service(monkeypatch, storage, failure_rate=1.0)
+    metadata = _metadata()
+
+    total = asyncio.run(rag_service.process_chunk_stream(_chunk_stream(["One", "Two"]), metadata, "structure"))
+
+    assert total == 2
+    chunks = storage.to_chunks(metadata.document_id)
+    assert [chunk.embedding_status for chunk in chunks] == [EmbeddingStatus.PENDING] * 2
+    assert all(chunk.embedding is None for chunk in chunks)
+
+def test_reprocessing_stores_only_changed_chunks_and_drops_the_tail(monkeypatch):
+    storage = InMemoryStorageService()
+    rag_service = _rag_service(monkeypatch, storage)
+    metadata = _metadata()
+    asyncio.run(rag_service.process_chunk_stream(
+        _chunk_stream(["One", "Two", "Three", "Four"]), metadata, "structure"
+    ))
+    requests_before = rag_service.genai_client.requests
+    stored = []
+
+    total = asyncio.run(rag_service.process_chunk_stream(
+        _chunk_stream(["One", "Three", "Two"]), metadata, "structure", on_stored=stored.extend
+    ))
+
+    assert total == 3
+    assert _stored_texts(storage, metadata) == ["One", "Three", "Two"]
+    # "Three" and "Two" moved, so they are stored again but keep their embeddings
+    assert [chunk.chunk_text for chunk in stored] == ["Three", "Two"]
+    assert rag_service.genai_client.requests == requests_before
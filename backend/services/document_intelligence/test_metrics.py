@@ -0,0 +1,93 @@
+"""
+Tests for the metrics registry and its Prometheus text rendering
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence import metrics
+from document_intelligence.metrics import Counter, Gauge, Histogram, render_metrics
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    # Metrics created by a test register here instead of alongside the service's
+    monkeypatch.setattr(metrics, "_registry", [])
+
+def test_counter_renders_help_type_and_labelled_samples():
+    counter = Counter("test_total", "Things counted", ["result"])
+    counter.inc(result="hit")
+    counter.inc(2, result="hit")
+    counter.inc(result='say "hi"\n')
+
+    assert counter.render().splitlines() == [
+        "# HELP test_total Things counted",
+        "# TYPE test_total counter",
+        'test_total{result="hit"} 3.0',
+        'test_total{result="say \\"hi\\"\\n"} 1.0'
+    ]
+
+def test_labels_must_match_the_declared_names():
+    counter = Counter("test_total", "Things counted", ["result"])
+
+    with pytest.raises(ValueError):
+        counter.inc(outcome="hit")
+    with pytest.raises(ValueError):
+        counter.inc()
+
+def test_gauge_reads_callbacks_at_render_time():
+    gauge = Gauge("test_depth", "Queue depth", ["lane"])
+    depth = {"bulk": 1}
+    gauge.set_function(lambda: depth["bulk"], lane="bulk")
+    gauge.set_function(lambda: 1 / 0, lane="broken")
+    with gauge.track_in_progress(lane="interactive"):
+        depth["bulk"] = 5
+        in_progress = gauge.render()
+
+    assert 'test_depth{lane="interactive"} 1.0' in in_progress
+    assert 'test_depth{lane="bulk"} 5.0' in in_progress
+    # A failing callback is left out rather than breaking the scrape
+    assert "broken" not in in_progress
+    assert 'test_depth{lane="interactive"} 0.0' in gauge.render()
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Durations", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage="embed")
+
+    assert histogram.render().splitlines()[2:] == [
+        'test_seconds_bucket{stage="embed",le="0.1"} 1',
+        'test_seconds_bucket{stage="embed",le="1.0"} 3',
+        'test_seconds_bucket{stage="embed",le="+Inf"} 4',
+        'test_seconds_sum{stage="embed"} 4.05',
+        'test_seconds_count{stage="embed"} 4'
+    ]
+
+def test_histogram_times_blocks_that_raise():
+    histogram = Histogram("test_seconds", "Durations")
+
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError("failed")
+
+    assert "test_seconds_count 1" in histogram.render()
+
+def test_render_metrics_joins_every_registered_metric():
+    Counter("test_a_total", "A").inc()
+    Gauge("test_b", "B").set(2)
+
+    rendered = render_metrics()
+
+    assert rendered.endswith("\n")
+    assert rendered.splitlines() == [
+        "# HELP test_a_total A",
+        "# TYPE test_a_total counter",
+        "test_a_total 1.0",
+        "# HELP test_b B",
+        "# TYPE test_b gauge",
+        "test_b 2.0"
+    ]
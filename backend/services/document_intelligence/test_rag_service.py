@@ -0,0 +1,64 @@
+"""
+Tests for reciprocal rank fusion in the RAG service
+"""
+
+import os
+import sys
+from uuid import UUID, uuid4
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.models import ChunkType, SearchResult
+from document_intelligence.rag_service import reciprocal_rank_fusion
+
+DOCUMENT_ID = uuid4()
+
+def _result(n: int, similarity: float = 0.5) -> SearchResult:
+    return SearchResult(
+        id=UUID(int=n),
+        document_id=DOCUMENT_ID,
+        chunk_text=f"chunk {n}",
+        chunk_type=ChunkType.PARAGRAPH,
+        similarity=similarity
+    )
+
+def _ids(results):
+    return [result.id.int for result in results]
+
+def test_results_in_both_lists_rank_first():
+    vector = [_result(1), _result(2), _result(3)]
+    lexical = [_result(3), _result(4)]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+    assert _ids(fused) == [3, 1, 2, 4]
+    assert fused[0].score == round(1 / 63 + 1 / 61, 6)
+    assert fused[1].score == round(1 / 61, 6)
+
+def test_ties_keep_first_seen_order():
+    # Same rank in each list, so equal scores; the first list's result comes first
+    fused = reciprocal_rank_fusion([[_result(1)], [_result(2)]], k=60)
+
+    assert _ids(fused) == [1, 2]
+    assert fused[0].score == fused[1].score
+
+def test_limit_and_k():
+    vector = [_result(1), _result(2)]
+    lexical = [_result(2), _result(1)]
+
+    # Symmetric rankings tie, whatever k is
+    assert _ids(reciprocal_rank_fusion([vector, lexical], k=1)) == [1, 2]
+    assert _ids(reciprocal_rank_fusion([vector, lexical, [_result(2)]], k=1, limit=1)) == [2]
+    assert reciprocal_rank_fusion([], k=60) == []
+
+def test_keeps_the_first_copy_of_each_result():
+    vector = [_result(1, similarity=0.9)]
+    lexical = [_result(1, similarity=0.1)]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+    assert len(fused) == 1
+    assert fused[0].similarity == 0.9
+    # The inputs are not modified
+    assert vector[0].score is None
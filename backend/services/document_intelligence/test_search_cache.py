@@ -0,0 +1,94 @@
+"""
+Tests for the query embedding and search result caches
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence import search_cache
+from document_intelligence.benchmarks.fakes import FakeGenAIClient, InMemoryStorageService
+from document_intelligence.models import ChunkType, DocumentChunk, SearchResult
+from document_intelligence.rag_service import RAGService
+from document_intelligence.search_cache import SearchCache
+
+QUERY_EMBEDDING = np.arange(4, dtype=np.float32)
+
+def _result(n: int) -> SearchResult:
+    return SearchResult(
+        id=UUID(int=n),
+        document_id=UUID(int=0),
+        chunk_text=f"chunk {n}",
+        chunk_type=ChunkType.PARAGRAPH,
+        similarity=0.9
+    )
+
+def test_invalidate_workspace_drops_only_its_results():
+    cache = SearchCache()
+    cache.put_results("acme", QUERY_EMBEDDING, 0.7, 10, [_result(1)])
+    cache.put_results("globex", QUERY_EMBEDDING, 0.7, 10, [_result(2)])
+
+    cache.invalidate_workspace("acme")
+
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.7, 10) is None
+    assert cache.get_results("globex", QUERY_EMBEDDING, 0.7, 10) == [_result(2)]
+    # Results stored after the invalidation are served again
+    cache.put_results("acme", QUERY_EMBEDDING, 0.7, 10, [_result(3)])
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.7, 10) == [_result(3)]
+
+def test_results_are_keyed_by_search_parameters():
+    cache = SearchCache()
+    cache.put_results("acme", QUERY_EMBEDDING, 0.7, 10, [_result(1)])
+
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.7, 10) == [_result(1)]
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.5, 10) is None
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.7, 5) is None
+    assert cache.get_results("acme", QUERY_EMBEDDING + 1, 0.7, 10) is None
+    assert cache.get_results("acme", QUERY_EMBEDDING, 0.7, 10, variant="hybrid") is None
+
+def test_entries_expire_after_ttl(monkeypatch):
+    monkeypatch.setenv("SEARCH_CACHE_TTL_SECONDS", "60")
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(search_cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    cache = SearchCache()
+    cache.put_query_embedding("model", "Cash  at Bank", QUERY_EMBEDDING)
+
+    clock.now += 59
+    assert np.array_equal(cache.get_query_embedding("model", "cash at bank"), QUERY_EMBEDDING)
+    clock.now += 2
+    assert cache.get_query_embedding("model", "cash at bank") is None
+
+def test_zero_vector_query_embeddings_are_not_cached():
+    cache = SearchCache()
+    cache.put_query_embedding("model", "query", np.zeros(4, dtype=np.float32))
+
+    assert cache.get_query_embedding("model", "query") is None
+
+def test_storing_chunks_invalidates_their_workspace(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    storage = InMemoryStorageService()
+    rag_service = RAGService(
+        storage=storage,
+        genai_client=FakeGenAIClient(dimension=16, latency_ms=0),
+        embedding_dimension=16
+    )
+    rag_service.search_cache.put_results("acme", QUERY_EMBEDDING, 0.7, 10, [_result(1)])
+    chunk = DocumentChunk(
+        document_id=uuid4(),
+        workspace_id="acme",
+        user_id="user",
+        chunk_text="Cash at bank",
+        chunk_index=0,
+        embedding=np.ones(16, dtype=np.float32)
+    )
+
+    assert asyncio.run(storage.store_chunks([chunk]))
+
+    assert rag_service.search_cache.get_results("acme", QUERY_EMBEDDING, 0.7, 10) is None
@@ -0,0 +1,108 @@
+"""
+Tests for heading and table boundaries in the structure-aware chunker
+"""
+
+import os
+import sys
+from typing import List
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.models import ChunkType, DocumentBlock
+from document_intelligence.structure_chunker import StructureChunker
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+def _split_words(text: str) -> List[str]:
+    words = text.split()
+    return [" ".join(words[i:i + 5]) for i in range(0, len(words), 5)]
+
+def _chunker(chunk_size: int) -> StructureChunker:
+    return StructureChunker(_count_words, _split_words, chunk_size=chunk_size)
+
+def _heading(text: str, level: int = 1) -> DocumentBlock:
+    return DocumentBlock(block_type="section_header", text=text, level=level)
+
+def _paragraph(text: str) -> DocumentBlock:
+    return DocumentBlock(block_type="text", text=text)
+
+def _table(rows: int) -> DocumentBlock:
+    lines = ["| Account | Amount |", "|---|---|"] + [f"| Item{i} | {i} |" for i in range(rows)]
+    return DocumentBlock(block_type="table", text="\n".join(lines))
+
+def test_heading_starts_a_chunk_and_stays_with_its_body():
+    blocks = [
+        _heading("Assets"),
+        _paragraph("Cash at bank"),
+        _heading("Liabilities"),
+        _heading("Current", level=2),
+        _paragraph("Trade creditors")
+    ]
+
+    chunks = list(_chunker(100).chunk(blocks))
+
+    assert chunks == [
+        ("# Assets\n\nCash at bank", ChunkType.PARAGRAPH),
+        ("# Liabilities\n\n## Current\n\nTrade creditors", ChunkType.PARAGRAPH)
+    ]
+
+def test_trailing_heading_is_a_heading_chunk():
+    chunks = list(_chunker(100).chunk([_paragraph("Body text"), _heading("Notes")]))
+
+    assert chunks == [("Body text", ChunkType.PARAGRAPH), ("# Notes", ChunkType.HEADING)]
+
+def test_paragraphs_pack_up_to_the_budget():
+    blocks = [_paragraph("one two three"), _paragraph("four five six"), _paragraph("seven eight")]
+
+    chunks = list(_chunker(6).chunk(blocks))
+
+    assert [text for text, _ in chunks] == ["one two three\n\nfour five six", "seven eight"]
+
+def test_table_is_not_merged_with_body_text():
+    blocks = [
+        _heading("Balance sheet"),
+        _paragraph("Figures in dollars"),
+        _table(rows=2),
+        _paragraph("Approved by the board")
+    ]
+
+    chunks = list(_chunker(100).chunk(blocks))
+
+    assert [chunk_type for _, chunk_type in chunks] == [ChunkType.PARAGRAPH, ChunkType.TABLE, ChunkType.PARAGRAPH]
+    assert chunks[0][0] == "# Balance sheet\n\nFigures in dollars"
+    assert chunks[1][0].startswith("| Account | Amount |")
+    assert chunks[2][0] == "Approved by the board"
+
+def test_table_keeps_the_heading_before_it():
+    chunks = list(_chunker(100).chunk([_heading("Balance sheet"), _table(rows=1)]))
+
+    assert chunks == [("# Balance sheet\n\n| Account | Amount |\n|---|---|\n| Item0 | 0 |", ChunkType.TABLE)]
+
+def test_oversized_table_splits_between_rows_with_the_header_repeated():
+    # The heading is 2 words, header and separator 6, each row 5: two rows fit per chunk
+    chunks = list(_chunker(19).chunk([_heading("Ledger"), _table(rows=5)]))
+
+    assert all(chunk_type == ChunkType.TABLE for _, chunk_type in chunks)
+    assert len(chunks) == 3
+    for text, _ in chunks:
+        lines = text.split("\n\n")[1].splitlines()
+        assert lines[:2] == ["| Account | Amount |", "|---|---|"]
+        assert text.startswith("# Ledger\n\n")
+    rows = [line for text, _ in chunks for line in text.splitlines() if line.startswith("| Item")]
+    assert rows == [f"| Item{i} | {i} |" for i in range(5)]
+
+def test_heading_is_kept_on_each_piece_of_an_oversized_paragraph():
+    long_paragraph = " ".join(f"word{i}" for i in range(12))
+    blocks = [_paragraph("Intro"), _heading("Notes"), _heading("Revenue", level=2), _paragraph(long_paragraph)]
+
+    chunks = list(_chunker(8).chunk(blocks))
+
+    assert chunks == [
+        ("Intro", ChunkType.PARAGRAPH),
+        ("# Notes\n\n## Revenue\n\nword0 word1 word2 word3 word4", ChunkType.PARAGRAPH),
+        ("# Notes\n\n## Revenue\n\nword5 word6 word7 word8 word9", ChunkType.PARAGRAPH),
+        ("# Notes\n\n## Revenue\n\nword10 word11", ChunkType.PARAGRAPH)
+    ]
+    assert all(chunk_type != ChunkType.HEADING for _, chunk_type in chunks)
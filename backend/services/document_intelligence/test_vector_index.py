@@ -0,0 +1,139 @@
+"""
+Tests for the in-process vector index: builds, watermarks and recovery from unreadable files
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+# Add the parent directory to the path so we can import our service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_intelligence.benchmarks.fakes import FakeGenAIClient, InMemoryStorageService
+from document_intelligence.models import SearchRequest
+from document_intelligence.rag_service import RAGService
+from document_intelligence.vector_index import VectorIndexManager
+
+WORKSPACE_ID = "workspace"
+DIMENSION = 16
+REDUCED_DIMENSION = 8
+
+def _manager(monkeypatch, tmp_path, storage: InMemoryStorageService) -> VectorIndexManager:
+    monkeypatch.setenv("VECTOR_INDEX_ENABLED", "true")
+    monkeypatch.setenv("VECTOR_INDEX_DIR", str(tmp_path))
+    return VectorIndexManager(storage, REDUCED_DIMENSION, DIMENSION)
+
+def _storage() -> InMemoryStorageService:
+    storage = InMemoryStorageService()
+    storage.load_synthetic_chunks(WORKSPACE_ID, count=20, dimension=DIMENSION, reduced_dimension=REDUCED_DIMENSION)
+    return storage
+
+async def _search(manager: VectorIndexManager, row: dict):
+    return await manager.search(
+        WORKSPACE_ID,
+        query_embedding=row["embedding"],
+        query_embedding_reduced=row["embedding_reduced"],
+        similarity_threshold=0.5,
+        max_results=3,
+        candidate_multiplier=4
+    )
+
+async def _wait_for_builds(manager: VectorIndexManager) -> None:
+    await asyncio.gather(*list(manager._building.values()))
+
+def test_missing_index_returns_none_and_is_built(monkeypatch, tmp_path):
+    storage = _storage()
+    manager = _manager(monkeypatch, tmp_path, storage)
+    row = next(iter(storage.rows.values()))
+
+    async def run():
+        assert await _search(manager, row) is None
+        await _wait_for_builds(manager)
+        return await _search(manager, row)
+
+    results = asyncio.run(run())
+
+    assert results is not None
+    assert str(results[0].id) == row["id"]
+
+def test_build_includes_chunks_of_documents_still_processing(monkeypatch, tmp_path):
+    # Synthetic chunks have no documents row, like a document whose ingestion is still streaming
+    storage = _storage()
+    storage.chunk_page_size = 7
+    manager = _manager(monkeypatch, tmp_path, storage)
+
+    async def run():
+        await manager.search(WORKSPACE_ID, np.ones(DIMENSION), np.ones(REDUCED_DIMENSION), 0.5, 3, 4)
+        await _wait_for_builds(manager)
+        return manager._loaded[WORKSPACE_ID]
+
+    index = asyncio.run(run())
+
+    assert index.size == len(storage.rows)
+    assert index.read_watermark() == asyncio.run(storage.get_chunk_watermark(WORKSPACE_ID))
+
+def test_unreadable_index_falls_back_and_is_rebuilt(monkeypatch, tmp_path):
+    storage = _storage()
+    row = next(iter(storage.rows.values()))
+
+    async def build():
+        manager = _manager(monkeypatch, tmp_path, storage)
+        await _search(manager, row)
+        await _wait_for_builds(manager)
+        return manager._workspace_dir(WORKSPACE_ID)
+
+    index_dir = asyncio.run(build())
+    # A crash mid-append leaves the vector files shorter than rows.jsonl
+    with open(os.path.join(index_dir, "full.f16"), "r+b") as f:
+        f.truncate(10)
+
+    # A restarted process can't map the files, so search falls back and rebuilds
+    manager = _manager(monkeypatch, tmp_path, storage)
+
+    async def run():
+        assert await _search(manager, row) is None
+        await _wait_for_builds(manager)
+        return await _search(manager, row)
+
+    results = asyncio.run(run())
+
+    assert results is not None
+    assert str(results[0].id) == row["id"]
+
+def test_search_uses_the_rpc_until_the_index_is_built(monkeypatch, tmp_path):
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    monkeypatch.setenv("EMBEDDING_REDUCED_DIMENSION", str(REDUCED_DIMENSION))
+    monkeypatch.setenv("VECTOR_INDEX_ENABLED", "true")
+    monkeypatch.setenv("VECTOR_INDEX_DIR", str(tmp_path))
+    storage = _storage()
+    rag_service = RAGService(
+        storage=storage,
+        genai_client=FakeGenAIClient(dimension=DIMENSION, latency_ms=0),
+        embedding_dimension=DIMENSION
+    )
+    rpc_calls = []
+    rpc_search = storage.search_similar_chunks
+
+    async def search_similar_chunks(**kwargs):
+        rpc_calls.append(kwargs["workspace_id"])
+        return await rpc_search(**kwargs)
+
+    monkeypatch.setattr(storage, "search_similar_chunks", search_similar_chunks)
+    row = next(iter(storage.rows.values()))
+    request = SearchRequest(query="q", workspace_id=WORKSPACE_ID, similarity_threshold=0.5, max_results=3)
+
+    async def run():
+        search = lambda: rag_service._vector_search(request, row["embedding"], row["embedding_reduced"], 3)
+        from_rpc = await search()
+        await _wait_for_builds(rag_service.vector_index)
+        from_index = await search()
+        return from_rpc, from_index
+
+    from_rpc, from_index = asyncio.run(run())
+
+    # The first search had no index and went to the database; the second was answered locally
+    assert rpc_calls == [WORKSPACE_ID]
+    assert str(from_rpc[0].id) == row["id"]
+    assert [result.id for result in from_index] == [result.id for result in from_rpc]
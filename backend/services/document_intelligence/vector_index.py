@@ -0,0 +1,514 @@
+"""
+In-process vector index per workspace, used as a low-latency search tier
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from .models import DocumentChunk, SearchResult
+from .storage_service import StorageService
+from .embedding_service import reduce_embedding
+from .vectors import is_zero_vector
+
+logger = logging.getLogger(__name__)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class WorkspaceVectorIndex:
+    """
+    IVF-flat index over one workspace's chunk embeddings
+
+    Normalized reduced and full embeddings are stored as float16 in
+    append-only files (reduced.f16, full.f16) that are memory-mapped on load;
+    rows.jsonl holds chunk metadata and tombstones for replaced rows, and
+    watermark.json the storage watermark the files were last in step with.
+    Workspaces smaller than ivf_min_size are scanned exhaustively.
+
+    Not thread-safe; VectorIndexManager serializes access per workspace.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        reduced_dimension: int,
+        full_dimension: int,
+        ivf_min_size: int,
+        nprobe: int
+    ):
+        self.index_dir = index_dir
+        self.reduced_dimension = reduced_dimension
+        self.full_dimension = full_dimension
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+
+        self._reduced_path = os.path.join(index_dir, "reduced.f16")
+        self._full_path = os.path.join(index_dir, "full.f16")
+        self._rows_path = os.path.join(index_dir, "rows.jsonl")
+        self._watermark_path = os.path.join(index_dir, "watermark.json")
+
+        self.rows: List[dict] = []
+        self._row_by_key: Dict[tuple, int] = {}
+        self._deleted: Set[int] = set()
+        self._reduced: Optional[np.ndarray] = None
+        self._full: Optional[np.ndarray] = None
+
+        # IVF state - trained once the index is large enough
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._trained_size = 0
+
+        os.makedirs(index_dir, exist_ok=True)
+
+    @property
+    def size(self) -> int:
+        return len(self.rows) - len(self._deleted)
+
+    def load(self) -> bool:
+        """Load a persisted index; returns False if there is none"""
+        if not os.path.exists(self._rows_path):
+            return False
+
+        with open(self._rows_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "delete" in record:
+                    self._deleted.add(record["delete"])
+                else:
+                    self._track_row(record)
+
+        self._remap()
+        self._maybe_train()
+        return True
+
+    def clear(self) -> None:
+        """Delete any persisted files, e.g. left by an interrupted build"""
+        for path in (self._watermark_path, self._reduced_path, self._full_path, self._rows_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def read_watermark(self) -> Optional[Dict[str, Any]]:
+        """The storage watermark saved with the index, or None if there is none"""
+        if not os.path.exists(self._watermark_path):
+            return None
+        with open(self._watermark_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_watermark(self, watermark: Dict[str, Any]) -> None:
+        temp_path = f"{self._watermark_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(watermark, f)
+        os.replace(temp_path, self._watermark_path)
+
+    def _track_row(self, record: dict) -> None:
+        key = (record["document_id"], record["chunk_index"])
+        previous = self._row_by_key.get(key)
+        if previous is not None:
+            self._deleted.add(previous)
+        self._row_by_key[key] = len(self.rows)
+        self.rows.append(record)
+
+    def _remap(self) -> None:
+        """Memory-map the vector files at their current length"""
+        count = len(self.rows)
+        if count == 0:
+            self._reduced = np.zeros((0, self.reduced_dimension), dtype=np.float16)
+            self._full = np.zeros((0, self.full_dimension), dtype=np.float16)
+            return
+        self._reduced = np.memmap(self._reduced_path, dtype=np.float16, mode="r", shape=(count, self.reduced_dimension))
+        self._full = np.memmap(self._full_path, dtype=np.float16, mode="r", shape=(count, self.full_dimension))
+
+    def add(self, chunks: List[DocumentChunk]) -> None:
+        """
+        Append chunks, replacing earlier rows for the same (document_id, chunk_index)
+
+        Chunks without an embedding, e.g. stored as pending, only remove the
+        earlier row, since its text no longer matches what is stored.
+        """
+        unembedded = [chunk for chunk in chunks if is_zero_vector(chunk.embedding)]
+        for chunk in unembedded:
+            self._remove_key((str(chunk.document_id), chunk.chunk_index))
+
+        chunks = [chunk for chunk in chunks if chunk.id is not None and not is_zero_vector(chunk.embedding)]
+        if not chunks:
+            return
+
+        full = _normalize(np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32))
+        reduced = _normalize(np.asarray([
+            chunk.embedding_reduced if chunk.embedding_reduced is not None
+            else reduce_embedding(chunk.embedding, self.reduced_dimension)
+            for chunk in chunks
+        ], dtype=np.float32))
+
+        with open(self._reduced_path, "ab") as f:
+            f.write(reduced.astype(np.float16).tobytes())
+        with open(self._full_path, "ab") as f:
+            f.write(full.astype(np.float16).tobytes())
+
+        first_new_row = len(self.rows)
+        with open(self._rows_path, "a", encoding="utf-8") as f:
+            for chunk in chunks:
+                record = {
+                    "id": str(chunk.id),
+                    "document_id": str(chunk.document_id),
+                    "chunk_index": chunk.chunk_index,
+                    "chunk_type": chunk.chunk_type.value,
+                    "chunk_text": chunk.chunk_text
+                }
+                previous = self._row_by_key.get((record["document_id"], record["chunk_index"]))
+                if previous is not None:
+                    f.write(json.dumps({"delete": previous}) + "\n")
+                f.write(json.dumps(record) + "\n")
+                self._track_row(record)
+
+        self._remap()
+
+        if self._centroids is not None:
+            new_assignments = self._assign(np.asarray(self._reduced[first_new_row:], dtype=np.float32))
+            self._assignments = np.concatenate([self._assignments, new_assignments])
+        self._maybe_train()
+
+    def remove_document(self, document_id: str, from_index: int = 0) -> None:
+        """Tombstone a document's rows with chunk_index >= from_index"""
+        keys = [key for key in self._row_by_key if key[0] == document_id and key[1] >= from_index]
+        for key in keys:
+            self._remove_key(key)
+
+    def _remove_key(self, key: tuple) -> None:
+        row = self._row_by_key.pop(key, None)
+        if row is None:
+            return
+        self._deleted.add(row)
+        with open(self._rows_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"delete": row}) + "\n")
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _maybe_train(self) -> None:
+        """Train IVF centroids once large enough, retraining when the index doubles"""
+        count = len(self.rows)
+        if count < self.ivf_min_size or count < 2 * self._trained_size:
+            return
+
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample_rows = rng.choice(count, size=min(count, nlist * 64), replace=False)
+        sample = np.asarray(self._reduced[np.sort(sample_rows)], dtype=np.float32)
+
+        # Spherical k-means on a sample
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self._centroids = centroids
+        self._assignments = self._assign(np.asarray(self._reduced, dtype=np.float32))
+        self._trained_size = count
+        logger.info(f"Trained IVF index with {nlist} lists over {count} rows in {self.index_dir}")
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        query_embedding_reduced: np.ndarray,
+        similarity_threshold: float,
+        max_results: int,
+        candidate_multiplier: int
+    ) -> List[SearchResult]:
+        """Two-stage search: reduced vectors for candidates, full vectors to rerank"""
+        if self.size == 0:
+            return []
+
+        query_reduced = _normalize(np.asarray(query_embedding_reduced, dtype=np.float32))
+        query_full = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        candidate_rows = np.arange(len(self.rows))
+        if self._centroids is not None:
+            probes = np.argsort(self._centroids @ query_reduced)[-self.nprobe:]
+            candidate_rows = np.flatnonzero(np.isin(self._assignments, probes))
+        if self._deleted:
+            candidate_rows = candidate_rows[~np.isin(candidate_rows, list(self._deleted))]
+        if len(candidate_rows) == 0:
+            return []
+
+        # First pass on reduced vectors
+        scores = np.asarray(self._reduced[candidate_rows], dtype=np.float32) @ query_reduced
+        candidate_count = min(len(candidate_rows), max_results * candidate_multiplier)
+        top = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        candidate_rows = candidate_rows[top]
+
+        # Rerank on full vectors
+        similarities = np.asarray(self._full[candidate_rows], dtype=np.float32) @ query_full
+        order = np.argsort(-similarities)
+
+        results = []
+        for position in order[:max_results]:
+            similarity = float(similarities[position])
+            if similarity <= similarity_threshold:
+                break
+            row = self.rows[candidate_rows[position]]
+            results.append(SearchResult(
+                id=row["id"],
+                document_id=row["document_id"],
+                chunk_text=row["chunk_text"],
+                chunk_type=row["chunk_type"],
+                similarity=similarity
+            ))
+        return results
+
+class VectorIndexManager:
+    """
+    Loads, builds and caches WorkspaceVectorIndex instances
+
+    Loads, builds, updates and searches run in worker threads, one at a
+    time per workspace, so large indexes don't block the event loop. A
+    persisted index is only used while its watermark matches the chunk
+    watermark in storage, and is rebuilt otherwise.
+
+    Only one process may own VECTOR_INDEX_DIR. Chunks written by other
+    processes (the bulk_ingest CLI, other API replicas) are not applied to
+    an index that is already loaded, and an index written concurrently by
+    two processes is corrupted. Give each process its own directory, or
+    enable the index on a single replica.
+    """
+
+    def __init__(self, storage: StorageService, reduced_dimension: int, full_dimension: int):
+        self.storage = storage
+        self.reduced_dimension = reduced_dimension
+        self.full_dimension = full_dimension
+
+        self.enabled = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+        self.index_dir = os.getenv("VECTOR_INDEX_DIR", ".cache/vector_index")
+        self.ivf_min_size = int(os.getenv("VECTOR_INDEX_IVF_MIN_SIZE", "20000"))
+        self.nprobe = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+        self.max_loaded = int(os.getenv("VECTOR_INDEX_MAX_WORKSPACES", "32"))
+
+        # workspace_id -> index, least recently used first
+        self._loaded: "OrderedDict[str, WorkspaceVectorIndex]" = OrderedDict()
+        self._building: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Index updates from stored chunks, applied in the order they were stored
+        self._updates: Set[asyncio.Task] = set()
+        # Updates scheduled but not yet applied, per workspace
+        self._queued: Dict[str, int] = {}
+
+    def _workspace_dir(self, workspace_id: str) -> str:
+        digest = hashlib.sha256(workspace_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.index_dir, digest)
+
+    def _new_index(self, workspace_id: str) -> WorkspaceVectorIndex:
+        return WorkspaceVectorIndex(
+            self._workspace_dir(workspace_id),
+            self.reduced_dimension,
+            self.full_dimension,
+            self.ivf_min_size,
+            self.nprobe
+        )
+
+    def _lock(self, workspace_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(workspace_id, asyncio.Lock())
+
+    def _remember(self, workspace_id: str, index: WorkspaceVectorIndex) -> None:
+        self._loaded[workspace_id] = index
+        self._loaded.move_to_end(workspace_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    async def _get(self, workspace_id: str) -> Optional[WorkspaceVectorIndex]:
+        """
+        Return the loaded or persisted index for a workspace, if any
+
+        Must be called with the workspace lock held. A persisted index whose
+        watermark no longer matches storage, or that can't be read, is
+        deleted.
+        """
+        index = self._loaded.get(workspace_id)
+        if index is not None:
+            self._loaded.move_to_end(workspace_id)
+            return index
+
+        if workspace_id in self._building:
+            return None
+
+        index = self._new_index(workspace_id)
+        try:
+            watermark = await asyncio.to_thread(index.read_watermark)
+            if watermark is None:
+                # No index, or one left behind by an interrupted build
+                return None
+
+            current = await self.storage.get_chunk_watermark(workspace_id)
+            if current is None:
+                return None
+            if current != watermark:
+                logger.info(f"Vector index for workspace {workspace_id} is behind storage, discarding it")
+                await asyncio.to_thread(index.clear)
+                return None
+
+            if not await asyncio.to_thread(index.load):
+                return None
+
+        except Exception as e:
+            await self._discard(workspace_id, index, e)
+            return None
+
+        self._remember(workspace_id, index)
+        return index
+
+    async def _discard(self, workspace_id: str, index: WorkspaceVectorIndex, error: Exception) -> None:
+        """Forget and delete an index that failed, e.g. with files truncated by a crash, so it is rebuilt"""
+        logger.error(f"Vector index for workspace {workspace_id} is unusable, discarding it: {str(error)}")
+        if self._loaded.get(workspace_id) is index:
+            del self._loaded[workspace_id]
+        try:
+            await asyncio.to_thread(index.clear)
+        except OSError as e:
+            logger.error(f"Error deleting vector index for workspace {workspace_id}: {str(e)}")
+
+    async def search(
+        self,
+        workspace_id: str,
+        query_embedding: np.ndarray,
+        query_embedding_reduced: np.ndarray,
+        similarity_threshold: float,
+        max_results: int,
+        candidate_multiplier: int
+    ) -> Optional[List[SearchResult]]:
+        """
+        Search the workspace index, or return None when it isn't available
+
+        A missing index is built in the background so later queries for
+        the same workspace can be answered locally; one that fails to load
+        or search is deleted and rebuilt the same way.
+        """
+        if not self.enabled or workspace_id in self._building:
+            return None
+
+        async with self._lock(workspace_id):
+            index = await self._get(workspace_id)
+            if index is None:
+                self._schedule_build(workspace_id)
+                return None
+
+            try:
+                return await asyncio.to_thread(
+                    index.search,
+                    query_embedding,
+                    query_embedding_reduced,
+                    similarity_threshold,
+                    max_results,
+                    candidate_multiplier
+                )
+            except Exception as e:
+                await self._discard(workspace_id, index, e)
+                self._schedule_build(workspace_id)
+                return None
+
+    def _schedule_build(self, workspace_id: str) -> None:
+        if workspace_id in self._building:
+            return
+        task = asyncio.create_task(self._build(workspace_id))
+        self._building[workspace_id] = task
+        task.add_done_callback(lambda _: self._building.pop(workspace_id, None))
+
+    async def _build(self, workspace_id: str) -> None:
+        """
+        Build a workspace index from the chunks already in storage
+
+        Reads every chunk of the workspace, including those of documents
+        still being ingested, so the index covers what the watermark counts.
+        Holds the workspace lock throughout, so chunks stored meanwhile are
+        applied once the build is done, replacing whatever the build read.
+        """
+        async with self._lock(workspace_id):
+            try:
+                logger.info(f"Building vector index for workspace {workspace_id}")
+                index = self._new_index(workspace_id)
+                await asyncio.to_thread(index.clear)
+
+                # Taken before reading, so chunks another process stores
+                # meanwhile leave the persisted index marked as behind
+                watermark = await self.storage.get_chunk_watermark(workspace_id)
+                async for chunks in self.storage.iter_workspace_chunks(workspace_id):
+                    await asyncio.to_thread(index.add, chunks)
+
+                if watermark is not None:
+                    await asyncio.to_thread(index.save_watermark, watermark)
+                self._remember(workspace_id, index)
+                logger.info(f"Built vector index for workspace {workspace_id} with {index.size} chunks")
+
+            except Exception as e:
+                logger.error(f"Error building vector index for workspace {workspace_id}: {str(e)}")
+
+    async def _save_watermark(self, workspace_id: str, index: WorkspaceVectorIndex) -> None:
+        """Record the storage watermark the index is now in step with"""
+        watermark = await self.storage.get_chunk_watermark(workspace_id)
+        if watermark is not None:
+            await asyncio.to_thread(index.save_watermark, watermark)
+
+    def add_chunks(self, chunks: List[DocumentChunk]) -> None:
+        """Incrementally apply stored chunks to any index that exists for their workspace"""
+        if not self.enabled or not chunks:
+            return
+
+        by_workspace: Dict[str, List[DocumentChunk]] = {}
+        for chunk in chunks:
+            by_workspace.setdefault(chunk.workspace_id, []).append(chunk)
+
+        for workspace_id, workspace_chunks in by_workspace.items():
+            self._schedule_update(workspace_id, lambda index, chunks=workspace_chunks: index.add(chunks))
+
+    def remove_chunks(self, workspace_id: str, document_id: str, from_index: int = 0) -> None:
+        """Remove a document's chunks from the workspace index, if one exists"""
+        if not self.enabled:
+            return
+        self._schedule_update(workspace_id, lambda index: index.remove_document(document_id, from_index))
+
+    def _schedule_update(self, workspace_id: str, update: Callable[[WorkspaceVectorIndex], None]) -> None:
+        # Called from storage listeners, so the update runs as a task; tasks
+        # queue on the workspace lock in the order they were created
+        self._queued[workspace_id] = self._queued.get(workspace_id, 0) + 1
+        task = asyncio.create_task(self._update(workspace_id, update))
+        self._updates.add(task)
+        task.add_done_callback(self._updates.discard)
+
+    async def _update(self, workspace_id: str, update: Callable[[WorkspaceVectorIndex], None]) -> None:
+        async with self._lock(workspace_id):
+            index = None
+            try:
+                index = await self._get(workspace_id)
+                if index is None:
+                    return
+                await asyncio.to_thread(update, index)
+                # Refresh the watermark once per burst of updates
+                if self._queued[workspace_id] == 1:
+                    await self._save_watermark(workspace_id, index)
+
+            except Exception as e:
+                # A partly applied update leaves the files out of step with storage
+                if index is not None:
+                    await self._discard(workspace_id, index, e)
+                else:
+                    logger.error(f"Error updating vector index for workspace {workspace_id}: {str(e)}")
+            finally:
+                self._queued[workspace_id] -= 1
+                if not self._queued[workspace_id]:
+                    del self._queued[workspace_id]
+
+    async def shutdown(self) -> None:
+        """Wait for scheduled index updates to be applied"""
+        if self._updates:
+            await asyncio.gather(*self._updates, return_exceptions=True)
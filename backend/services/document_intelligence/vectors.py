@@ -0,0 +1,71 @@
+"""
+Compact embedding vectors for models and storage payloads
+
+Embeddings are held as contiguous float32 NumPy arrays instead of lists of
+Python floats (12 KB instead of ~100 KB for a 3072-dim vector) and are only
+converted to lists when a model is serialized to JSON.
+"""
+
+import os
+from typing import Annotated, Any, List, Optional
+
+import numpy as np
+from pydantic import PlainSerializer, PlainValidator, WithJsonSchema
+
+# Precision of vectors sent to the database: "float32" or "float16"
+STORAGE_PRECISION = os.getenv("EMBEDDING_STORAGE_PRECISION", "float32").lower()
+
+# Significant digits needed to round-trip each precision through text
+_SIGNIFICANT_DIGITS = {"float32": 7, "float16": 4}
+
+def as_vector(value: Any) -> Optional[np.ndarray]:
+    """Coerce a list, array or pgvector '[x,y,...]' string to a float32 array"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return decode_vector(value)
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.ndim != 1:
+        raise ValueError(f"Expected a 1-dimensional vector, got shape {vector.shape}")
+    return vector
+
+def is_zero_vector(vector: Optional[Any]) -> bool:
+    """True for missing vectors and zero-vector fallbacks from failed embedding calls"""
+    return vector is None or len(vector) == 0 or not np.any(vector)
+
+def encode_vector(vector: Optional[Any], precision: Optional[str] = None) -> Optional[str]:
+    """
+    Encode a vector as a pgvector text literal
+
+    PostgREST only accepts JSON, so the text literal is the most compact
+    form pgvector will parse. Values are written with just enough digits
+    for the storage precision, which is about half the size of
+    json.dumps on a list of floats.
+    """
+    if vector is None:
+        return None
+    precision = precision or STORAGE_PRECISION
+    array = np.asarray(vector, dtype=np.float32)
+    if precision == "float16":
+        array = array.astype(np.float16)
+    value_format = f"%.{_SIGNIFICANT_DIGITS.get(precision, 7)}g"
+    return "[" + ",".join(map(value_format.__mod__, array.tolist())) + "]"
+
+def decode_vector(value: Any) -> Optional[np.ndarray]:
+    """Decode a pgvector text literal (or list) returned by PostgREST"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), dtype=np.float32, sep=",")
+    return as_vector(value)
+
+def _to_list(vector: Optional[np.ndarray]) -> Optional[List[float]]:
+    return vector.tolist() if vector is not None else None
+
+# float32 vector field: validated by coercion, serialized to a list only for JSON
+Vector = Annotated[
+    np.ndarray,
+    PlainValidator(as_vector),
+    PlainSerializer(_to_list, when_used="json"),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}})
+]
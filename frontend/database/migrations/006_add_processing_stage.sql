@@ -0,0 +1,7 @@
+-- Track the current ingestion pipeline stage alongside processing_status
+-- processing_status keeps its coarse values; processing_stage reports
+-- queued / converting / chunking / embedding / storing / done while a job runs
+
+ALTER TABLE documents 
+ADD COLUMN IF NOT EXISTS processing_stage TEXT 
+CHECK (processing_stage IN ('queued', 'converting', 'chunking', 'embedding', 'storing', 'done'));
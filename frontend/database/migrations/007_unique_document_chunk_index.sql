@@ -0,0 +1,15 @@
+-- Make chunk storage idempotent on (document_id, chunk_index)
+-- StorageService.store_chunks upserts on this key, so reprocessing a document
+-- overwrites its existing chunks instead of inserting duplicates
+
+-- Remove duplicates left by earlier reprocessing, keeping the newest row
+DELETE FROM document_chunks dc
+USING document_chunks newer
+WHERE dc.document_id = newer.document_id
+  AND dc.chunk_index = newer.chunk_index
+  AND (dc.created_at, dc.id) < (newer.created_at, newer.id);
+
+-- Replace the plain lookup index with a unique one
+DROP INDEX IF EXISTS idx_document_chunks_chunk_index;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_document_chunks_chunk_index 
+ON document_chunks(document_id, chunk_index);
@@ -0,0 +1,112 @@
+-- Make the hybrid search candidate count configurable and backfill embedding_reduced
+-- Requires pgvector >= 0.7.0 for subvector() and l2_normalize(); workspace
+-- filtering keeps full recall only with pgvector >= 0.8.0 (see below)
+
+-- Backfill reduced embeddings for chunks stored before the backend populated them.
+-- gemini-embedding-001 is Matryoshka-trained, so the normalized 768-dim prefix
+-- is the reduced embedding.
+UPDATE document_chunks
+SET embedding_reduced = l2_normalize(subvector(embedding, 1, 768))::vector(768)
+WHERE embedding IS NOT NULL
+  AND embedding_reduced IS NULL;
+
+-- Replace the hybrid function with one that takes a candidate multiplier
+DROP FUNCTION IF EXISTS search_similar_chunks_hybrid(vector(3072), vector(768), text, float, int);
+
+CREATE OR REPLACE FUNCTION search_similar_chunks_hybrid(
+  query_embedding_full vector(3072),
+  query_embedding_reduced vector(768),
+  workspace_filter text DEFAULT NULL,
+  similarity_threshold float DEFAULT 0.7,
+  match_count int DEFAULT 10,
+  candidate_multiplier int DEFAULT 3
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  chunk_text text,
+  chunk_type text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  -- Workspaces up to this size are scanned exactly instead of through HNSW
+  exact_scan_max_rows constant int := 10000;
+  workspace_rows int;
+BEGIN
+  -- The HNSW scan returns at most ef_search rows, so widen it to cover every candidate
+  PERFORM set_config('hnsw.ef_search', GREATEST(40, match_count * candidate_multiplier)::text, true);
+
+  -- The workspace filter is applied to the rows the HNSW scan returns, so a
+  -- workspace holding a small share of the table would get only a few of
+  -- its candidates. Iterative scans (pgvector >= 0.8.0) keep scanning until
+  -- enough rows pass the filter, up to hnsw.max_scan_tuples. On older
+  -- pgvector the setting does not exist, and only the exact scan for small
+  -- workspaces keeps full recall; large workspaces that are a small share
+  -- of the table can still miss candidates there.
+  BEGIN
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  IF workspace_filter IS NOT NULL THEN
+    SELECT count(*) INTO workspace_rows
+    FROM (
+      SELECT 1 FROM document_chunks
+      WHERE workspace_id = workspace_filter
+      LIMIT exact_scan_max_rows + 1
+    ) workspace_sample;
+  END IF;
+
+  IF workspace_filter IS NOT NULL AND workspace_rows <= exact_scan_max_rows THEN
+    -- Small workspace: rank every row exactly, found through the workspace_id
+    -- index. Adding 0 to the distance keeps the planner off the HNSW index.
+    RETURN QUERY
+    SELECT
+      dc.id,
+      dc.document_id,
+      dc.chunk_text,
+      dc.chunk_type,
+      1 - (dc.embedding <=> query_embedding_full) as similarity
+    FROM (
+      SELECT * FROM document_chunks dc_inner
+      WHERE
+        dc_inner.workspace_id = workspace_filter
+        AND dc_inner.embedding_reduced IS NOT NULL
+      ORDER BY (dc_inner.embedding_reduced <=> query_embedding_reduced) + 0
+      LIMIT match_count * candidate_multiplier
+    ) dc
+    WHERE
+      dc.embedding IS NOT NULL
+      AND 1 - (dc.embedding <=> query_embedding_full) > similarity_threshold
+    ORDER BY dc.embedding <=> query_embedding_full
+    LIMIT match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT 
+    dc.id,
+    dc.document_id,
+    dc.chunk_text,
+    dc.chunk_type,
+    1 - (dc.embedding <=> query_embedding_full) as similarity
+  FROM (
+    -- First pass: Use reduced embeddings with index for fast filtering.
+    -- With relaxed_order the scan is only roughly ordered; the second pass re-sorts
+    SELECT * FROM document_chunks dc_inner
+    WHERE 
+      (workspace_filter IS NULL OR dc_inner.workspace_id = workspace_filter)
+      AND dc_inner.embedding_reduced IS NOT NULL
+    ORDER BY dc_inner.embedding_reduced <=> query_embedding_reduced
+    LIMIT match_count * candidate_multiplier
+  ) dc
+  WHERE 
+    dc.embedding IS NOT NULL
+    AND 1 - (dc.embedding <=> query_embedding_full) > similarity_threshold
+  ORDER BY dc.embedding <=> query_embedding_full
+  LIMIT match_count;
+END;
+$$;
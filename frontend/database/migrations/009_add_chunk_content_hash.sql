@@ -0,0 +1,6 @@
+-- Per-chunk content hash for incremental reprocessing
+-- The backend compares it against newly produced chunks so unchanged chunks
+-- are neither re-embedded nor rewritten. NULL rows are hashed on the fly.
+
+ALTER TABLE document_chunks 
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
@@ -0,0 +1,58 @@
+-- Full-text search over chunk_text for hybrid (lexical + vector) retrieval
+-- The 'simple' configuration does no stemming or stop-word removal, so account
+-- names, ABNs and figures are matched exactly as written
+
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+GENERATED ALWAYS AS (to_tsvector('simple', coalesce(chunk_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_chunk_tsv ON document_chunks
+USING gin (chunk_tsv);
+
+-- Lexical search: chunks matching any query term, ranked by cover density.
+-- Cosine similarity to the query embedding is returned alongside the rank so
+-- fused results keep a comparable similarity score.
+CREATE OR REPLACE FUNCTION search_chunks_lexical(
+  query_text text,
+  query_embedding_full vector(3072),
+  workspace_filter text DEFAULT NULL,
+  match_count int DEFAULT 10
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  chunk_text text,
+  chunk_type text,
+  similarity float,
+  lexical_rank float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  ts_query tsquery;
+BEGIN
+  -- plainto_tsquery ANDs the terms; OR them so partial matches still rank
+  ts_query := replace(plainto_tsquery('simple', query_text)::text, ' & ', ' | ')::tsquery;
+  IF ts_query IS NULL OR numnode(ts_query) = 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.chunk_text,
+    dc.chunk_type,
+    CASE
+      WHEN dc.embedding IS NULL THEN 0.0
+      ELSE 1 - (dc.embedding <=> query_embedding_full)
+    END as similarity,
+    ts_rank_cd(dc.chunk_tsv, ts_query)::float as lexical_rank
+  FROM document_chunks dc
+  WHERE
+    (workspace_filter IS NULL OR dc.workspace_id = workspace_filter)
+    AND dc.chunk_tsv @@ ts_query
+  ORDER BY ts_rank_cd(dc.chunk_tsv, ts_query) DESC
+  LIMIT match_count;
+END;
+$$;
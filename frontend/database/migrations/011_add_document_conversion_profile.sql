@@ -0,0 +1,11 @@
+-- Record how each document was converted
+-- conversion_profile is the pipeline chosen by the pre-pass (text / tables /
+-- full for PDFs, simple for DOCX, HTML and Markdown); conversion_report holds
+-- the pre-pass findings and timings
+
+ALTER TABLE documents 
+ADD COLUMN IF NOT EXISTS conversion_profile TEXT 
+CHECK (conversion_profile IN ('text', 'tables', 'full', 'simple'));
+
+ALTER TABLE documents 
+ADD COLUMN IF NOT EXISTS conversion_report JSONB;
@@ -0,0 +1,111 @@
+-- Deferred embeddings
+-- Chunks whose embedding request failed are stored with embedding_status
+-- 'pending' and NULL vectors instead of zero vectors; the backend repair
+-- worker re-embeds them and flips them to 'ready'. Chunks that still fail
+-- after the repair worker's attempt cap are marked 'failed' and wait for
+-- their document to be reprocessed.
+
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS embedding_status TEXT NOT NULL DEFAULT 'ready'
+CHECK (embedding_status IN ('ready', 'pending', 'failed'));
+
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS embedding_attempts INT NOT NULL DEFAULT 0;
+
+-- Repair queue order: fewest attempts first, so a chunk that keeps failing
+-- cannot hold up the rows behind it
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_pending
+ON document_chunks (embedding_attempts, created_at)
+WHERE embedding_status = 'pending';
+
+-- Zero-vector fallbacks stored before this migration are queued for repair
+UPDATE document_chunks
+SET embedding_status = 'pending', embedding = NULL, embedding_reduced = NULL
+WHERE embedding IS NOT NULL AND vector_norm(embedding) = 0;
+
+-- Lexical search skips pending chunks, as vector search already skips NULL embeddings
+CREATE OR REPLACE FUNCTION search_chunks_lexical(
+  query_text text,
+  query_embedding_full vector(3072),
+  workspace_filter text DEFAULT NULL,
+  match_count int DEFAULT 10
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  chunk_text text,
+  chunk_type text,
+  similarity float,
+  lexical_rank float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  ts_query tsquery;
+BEGIN
+  -- plainto_tsquery ANDs the terms; OR them so partial matches still rank
+  ts_query := replace(plainto_tsquery('simple', query_text)::text, ' & ', ' | ')::tsquery;
+  IF ts_query IS NULL OR numnode(ts_query) = 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.chunk_text,
+    dc.chunk_type,
+    1 - (dc.embedding <=> query_embedding_full) as similarity,
+    ts_rank_cd(dc.chunk_tsv, ts_query)::float as lexical_rank
+  FROM document_chunks dc
+  WHERE
+    (workspace_filter IS NULL OR dc.workspace_id = workspace_filter)
+    AND dc.embedding_status = 'ready'
+    AND dc.embedding IS NOT NULL
+    AND dc.chunk_tsv @@ ts_query
+  ORDER BY ts_rank_cd(dc.chunk_tsv, ts_query) DESC
+  LIMIT match_count;
+END;
+$$;
+
+-- Store repaired embeddings. Only the vector columns are written, and only
+-- for rows that are still pending with the content that was embedded, so a
+-- document reprocessed while the repair was in flight is left untouched.
+-- Returns the ids of the rows that were updated.
+CREATE OR REPLACE FUNCTION complete_chunk_embeddings(updates jsonb)
+RETURNS SETOF uuid
+LANGUAGE sql
+AS $$
+  UPDATE document_chunks dc
+  SET
+    embedding = (u->>'embedding')::vector(3072),
+    embedding_reduced = (u->>'embedding_reduced')::vector(768),
+    embedding_model = u->>'embedding_model',
+    embedding_status = 'ready',
+    updated_at = NOW()
+  FROM jsonb_array_elements(updates) u
+  WHERE dc.id = (u->>'id')::uuid
+    AND dc.embedding_status = 'pending'
+    AND dc.content_hash IS NOT DISTINCT FROM u->>'content_hash'
+  RETURNING dc.id;
+$$;
+
+-- Count a failed repair attempt; chunks reaching max_attempts are marked failed
+CREATE OR REPLACE FUNCTION record_chunk_embedding_failures(chunk_ids uuid[], max_attempts int)
+RETURNS int
+LANGUAGE sql
+AS $$
+  WITH failed AS (
+    UPDATE document_chunks
+    SET
+      embedding_attempts = embedding_attempts + 1,
+      embedding_status = CASE
+        WHEN embedding_attempts + 1 >= max_attempts THEN 'failed'
+        ELSE embedding_status
+      END
+    WHERE id = ANY(chunk_ids)
+      AND embedding_status = 'pending'
+    RETURNING embedding_status
+  )
+  SELECT count(*)::int FROM failed WHERE embedding_status = 'failed';
+$$;